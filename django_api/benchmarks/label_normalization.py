@@ -0,0 +1,82 @@
+from report_schema.raw_report.report_cleaner.cleaner import (
+    ten_k_excel_cleaning,
+    normalize_labels
+)
+from os.path import dirname, join, realpath
+import openpyxl as pyxl
+import pandas as pd
+import argparse
+import timeit
+
+"""
+Benchmarks the row label normalization of ten_k_workbook_to_dataframes_dict on the bundled 10-K-20 report, comparing
+the original per-row .loc loop with the vectorized regex pass.
+
+Run from the django_api directory:
+    python -m benchmarks.label_normalization --repeat 20
+"""
+
+REPORT = join(dirname(dirname(realpath(__file__))), 'downloaded_reports', '10-K-20.xlsx')
+
+
+def legacy_normalize_labels(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    :param df: a sheet's dataframe with an 'index' column
+    :return: the dataframe with its labels normalized the way ten_k_workbook_to_dataframes_dict used to
+    """
+    for loc in range(len(df['index'])):
+        df.loc[loc, 'index'] = str(df['index'][loc]).replace(' (loss)', '')
+        df.loc[loc, 'index'] = str(df['index'][loc]).replace(' (gain)', '')
+        df.loc[loc, 'index'] = str(df['index'][loc]).replace(' (benefit)', '')
+        df.loc[loc, 'index'] = str(df['index'][loc]).replace(' (losses)', '')
+        df.loc[loc, 'index'] = str(df['index'][loc]).replace(' (gains)', '')
+        df.loc[loc, 'index'] = str(df['index'][loc]).replace(' (expense)', '')
+    return df
+
+
+def vectorized_normalize_labels(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    :param df: a sheet's dataframe with an 'index' column
+    :return: the dataframe with its labels normalized by normalize_labels
+    """
+    df['index'] = normalize_labels(df['index'])
+    return df
+
+
+def sheet_frames(path: str) -> list:
+    """
+    :param path: path of a 10-K workbook
+    :return: the dataframes ten_k_workbook_to_dataframes_dict builds for each cleaned sheet, before normalization
+    """
+    cleaned, _ = ten_k_excel_cleaning(pyxl.load_workbook(path))
+    frames = []
+    for sheet in cleaned.worksheets:
+        data = sheet.values
+        cols = next(data)
+        frames.append(pd.DataFrame(list(data), columns=cols))
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--report', default=REPORT)
+    args = parser.parse_args()
+
+    frames = sheet_frames(args.report)
+    rows = sum(len(frame) for frame in frames)
+
+    for frame in frames:
+        legacy = legacy_normalize_labels(frame.copy())['index']
+        vectorized = vectorized_normalize_labels(frame.copy())['index']
+        assert legacy.tolist() == vectorized.tolist(), 'label normalization paths disagree'
+
+    print(f'{len(frames)} sheets, {rows} rows, best of {args.repeat}')
+    for name, normalize in [('legacy', legacy_normalize_labels), ('vectorized', vectorized_normalize_labels)]:
+        seconds = min(timeit.repeat(lambda: [normalize(frame.copy()) for frame in frames],
+                                    number=1, repeat=args.repeat))
+        print(f'{name:>10}: {seconds * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
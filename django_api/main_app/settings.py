@@ -135,6 +135,29 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Downloaded EDGAR workbooks are cached on disk by accession number
+# Set WORKBOOK_CACHE_DIR to an empty string to disable the cache
+WORKBOOK_CACHE_DIR = os.environ.get("WORKBOOK_CACHE_DIR", os.path.join(BASE_DIR, "downloaded_reports", "cache"))
+WORKBOOK_CACHE_MAX_BYTES = int(os.environ.get("WORKBOOK_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Memory usage of the merged reports' dataframes that each process keeps decoded
+MERGED_REPORT_CACHE_MAX_BYTES = int(os.environ.get("MERGED_REPORT_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+
+# Total length of the generated reports' JSON materialized from merged reports that each process keeps in memory
+MATERIALIZED_REPORT_CACHE_MAX_BYTES = int(os.environ.get("MATERIALIZED_REPORT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Queue missing raw reports for the run_ingestion_worker command instead of scraping them inside the request
+RAW_REPORT_ASYNC_INGESTION = os.environ.get("RAW_REPORT_ASYNC_INGESTION", "True") == "True"
+
+# Seconds a year EDGAR has no 10-K for is left out of ingestion, so requesting it does not scrape EDGAR every time
+UNAVAILABLE_REPORT_TTL = int(os.environ.get("UNAVAILABLE_REPORT_TTL", 24 * 60 * 60))
+
+# Number of processes cleaning a company's downloaded workbooks in parallel, one year per process
+RAW_REPORT_CLEANING_WORKERS = int(os.environ.get("RAW_REPORT_CLEANING_WORKERS", 1))
+
+# Backend reading downloaded workbooks for cleaning, "openpyxl" or the faster lxml based "xml" reader
+RAW_REPORT_WORKBOOK_READER = os.environ.get("RAW_REPORT_WORKBOOK_READER", "openpyxl")
+
 REST_FRAMEWORK = {
     # Use Django's standard `django.contrib.auth` permissions,
     # or allow read-only access for unauthenticated users.
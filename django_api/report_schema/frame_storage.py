@@ -0,0 +1,309 @@
+from collections.abc import Mapping
+import pandas as pd
+import numpy as np
+import json
+import struct
+
+"""
+This file contains the binary format the cleaned sheets of a raw report are
+stored in. A report is a dictionary of dataframes, the ones
+object_conversions.json_dict_to_dataframes_dict would build from its JSON, so
+both representations load into identical dataframes.
+
+The format is a small JSON header followed by the sheets' data:
+
+    MAGIC | header length (uint32) | header | padding | buffers
+
+The header holds, per sheet, its name, row and column labels and how its
+values are laid out. Sheets whose columns share one numeric dtype, which most
+statements do, are stored as a single column major buffer that loads back as a
+zero-copy view of the blob. Other sheets are stored column by column, numeric
+columns as buffers and object columns inside the header.
+
+Dataframes loaded from a blob share its memory, which is read only when the
+blob is bytes. Copy them before modifying their values in place.
+"""
+
+MAGIC = b'RRF1'
+_LENGTH = struct.Struct('<I')
+# Buffers start at multiples of this many bytes so they can be viewed in place.
+_ALIGNMENT = 8
+# Dtype kinds stored as raw buffers: float, int, unsigned int, bool, datetime.
+_BUFFER_KINDS = 'fiubM'
+
+
+class UnsupportedFrameError(TypeError):
+    """Raised when a dataframe holds labels or values the format cannot store."""
+
+
+def dumps(dataframes_dict: dict) -> bytes:
+    """
+    Args:
+        dataframes_dict: Dictionary of Pandas dataframes where key is the sheet
+            name of the dataframe while the value is the dataframe itself.
+
+    Returns:
+        The binary representation of the dataframes.
+
+    Raises:
+        UnsupportedFrameError: If a dataframe holds a label or value that is
+            not None, a bool, an int, a float, a str or a naive timestamp.
+    """
+    buffers = []
+    offset = 0
+
+    def add_buffer(array: np.ndarray) -> int:
+        nonlocal offset
+        start = offset
+        data = array.tobytes()
+        buffers.append(data + b'\0' * (-len(data) % _ALIGNMENT))
+        offset += len(buffers[-1])
+        return start
+
+    sheets = []
+    for sheet_name, df in dataframes_dict.items():
+        sheet = {
+            'name': sheet_name,
+            'index': _encode_index(df.index),
+            'columns': _encode_index(df.columns),
+        }
+
+        dtypes = set(df.dtypes)
+        if len(dtypes) == 1 and _is_buffer_dtype(df.dtypes.iloc[0]):
+            # Column major, so that the transposed view is the dataframe
+            sheet['block'] = {
+                'dtype': df.dtypes.iloc[0].str,
+                'offset': add_buffer(np.ascontiguousarray(df.to_numpy().T)),
+            }
+        else:
+            sheet['data'] = []
+            for idx in range(df.shape[1]):
+                column = df.iloc[:, idx]
+                if _is_buffer_dtype(column.dtype):
+                    sheet['data'].append({
+                        'dtype': column.dtype.str,
+                        'offset': add_buffer(column.to_numpy()),
+                    })
+                else:
+                    sheet['data'].append({
+                        'dtype': str(column.dtype),
+                        'values': _encode_values(column.tolist()),
+                    })
+
+        sheets.append(sheet)
+
+    header = json.dumps({'sheets': sheets}, ensure_ascii=False).encode()
+    prefix = MAGIC + _LENGTH.pack(len(header)) + header
+    prefix += b'\0' * (-len(prefix) % _ALIGNMENT)
+
+    return b''.join([prefix] + buffers)
+
+
+def loads(blob: bytes) -> dict:
+    """
+    Args:
+        blob: The binary representation of a dictionary of dataframes, as
+            returned by dumps. A memoryview of it works as well.
+
+    Returns:
+        Dictionary of Pandas dataframes where key is the sheet name of the
+        dataframe while the value is the dataframe itself.
+    """
+    frames = StoredFrames(blob)
+    return {name: frames[name] for name in frames}
+
+
+class StoredFrames(Mapping):
+    """
+    A dictionary of dataframes stored by dumps whose sheets are only loaded
+    the first time they are accessed. The row labels of a sheet are read from
+    the header without loading its values.
+
+    Fields:
+        self.blob: The binary representation of the dataframes.
+    """
+
+    def __init__(self, blob: bytes):
+        """
+        Args:
+            blob: The binary representation of a dictionary of dataframes, as
+                returned by dumps. A memoryview of it works as well.
+        """
+        if bytes(blob[:len(MAGIC)]) != MAGIC:
+            raise ValueError('Not a binary representation of dataframes')
+
+        header_length, = _LENGTH.unpack_from(blob, len(MAGIC))
+        header_start = len(MAGIC) + _LENGTH.size
+        header = json.loads(bytes(blob[header_start:header_start + header_length]))
+        data_start = header_start + header_length
+
+        self.blob = blob
+        self._data_start = data_start + -data_start % _ALIGNMENT
+        self._sheets = {sheet['name']: sheet for sheet in header['sheets']}
+        self._dataframes = {}
+
+    def __getitem__(self, name: str) -> pd.DataFrame:
+        if name not in self._dataframes:
+            self._dataframes[name] = self._load(self._sheets[name])
+        return self._dataframes[name]
+
+    def __iter__(self):
+        return iter(self._sheets)
+
+    def __len__(self) -> int:
+        return len(self._sheets)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns:
+            The size of the blob the dataframes are loaded from.
+        """
+        return memoryview(self.blob).nbytes
+
+    def index(self, name: str) -> pd.Index:
+        """
+        Args:
+            name: The name of a sheet.
+
+        Returns:
+            The row labels of the sheet, without loading its values.
+        """
+        return _decode_index(self._sheets[name]['index'])
+
+    def _load(self, sheet: dict) -> pd.DataFrame:
+        """
+        Args:
+            sheet: The header of a sheet.
+
+        Returns:
+            The dataframe of the sheet.
+        """
+        index = _decode_index(sheet['index'])
+        columns = _decode_index(sheet['columns'])
+
+        if 'block' in sheet:
+            values = np.frombuffer(
+                self.blob,
+                dtype=sheet['block']['dtype'],
+                count=len(index) * len(columns),
+                offset=self._data_start + sheet['block']['offset']
+            ).reshape(len(columns), len(index)).T
+            return pd.DataFrame(values, index=index, columns=columns, copy=False)
+
+        data = {}
+        for idx, column in enumerate(sheet['data']):
+            if 'offset' in column:
+                data[idx] = np.frombuffer(
+                    self.blob,
+                    dtype=column['dtype'],
+                    count=len(index),
+                    offset=self._data_start + column['offset']
+                )
+            else:
+                data[idx] = pd.Series(_decode_values(column['values']),
+                                      dtype=column['dtype']).to_numpy()
+
+        df = pd.DataFrame(data, index=range(len(index)),
+                          columns=range(len(columns)))
+        df.index = index
+        df.columns = columns
+        return df
+
+
+def _is_buffer_dtype(dtype: np.dtype) -> bool:
+    """
+    Args:
+        dtype: Dtype of a column.
+
+    Returns:
+        Whether columns of the dtype are stored as raw buffers.
+    """
+    return isinstance(dtype, np.dtype) and dtype.kind in _BUFFER_KINDS
+
+
+def _encode_index(index: pd.Index) -> dict:
+    """
+    Args:
+        index: Row or column index of a dataframe.
+
+    Returns:
+        JSON serializable representation of the index.
+    """
+    if isinstance(index, pd.MultiIndex):
+        raise UnsupportedFrameError('MultiIndex labels cannot be stored')
+
+    return {
+        'dtype': str(index.dtype),
+        'name': _encode_value(index.name),
+        'values': _encode_values(index.tolist()),
+    }
+
+
+def _decode_index(encoded: dict) -> pd.Index:
+    """
+    Args:
+        encoded: Representation of an index returned by _encode_index.
+
+    Returns:
+        The index.
+    """
+    return pd.Index(_decode_values(encoded['values']), dtype=encoded['dtype'],
+                    name=_decode_value(encoded['name']))
+
+
+def _encode_values(values: list) -> list:
+    """
+    Args:
+        values: Values of a column or an index.
+
+    Returns:
+        JSON serializable representation of the values.
+    """
+    return [_encode_value(value) for value in values]
+
+
+def _encode_value(value: object) -> object:
+    """
+    Args:
+        value: A label or a value of an object column.
+
+    Returns:
+        JSON serializable representation of the value. Timestamps are tagged
+        dictionaries, since labels and values are never dictionaries.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return _encode_value(value.item())
+    if isinstance(value, pd.Timestamp) and value.tz is None:
+        return {'ts': value.value}
+    if value is pd.NaT:
+        return {'ts': None}
+
+    raise UnsupportedFrameError(
+        f'{type(value).__name__} values cannot be stored')
+
+
+def _decode_values(values: list) -> list:
+    """
+    Args:
+        values: Representation of values returned by _encode_values.
+
+    Returns:
+        The values.
+    """
+    return [_decode_value(value) for value in values]
+
+
+def _decode_value(value: object) -> object:
+    """
+    Args:
+        value: Representation of a value returned by _encode_value.
+
+    Returns:
+        The value.
+    """
+    if isinstance(value, dict):
+        return pd.NaT if value['ts'] is None else pd.Timestamp(value['ts'])
+    return value
@@ -1,82 +1,297 @@
-from report_schema import object_conversions
+from report_schema import frame_storage, object_conversions
+from collections.abc import Mapping
 import pandas as pd
 import numpy as np
+import json
+import re
+
+# Words left out of sheet titles when aligning sheets across years, as filers add and drop them between years.
+SHEET_TITLE_STOP_WORDS = frozenset(('consolidated', 'condensed', 'the', 'of', 'and'))
 
 
 def join_pandas_dataframes(report_dict: dict) -> dict:
     """
-    :param report_dict: a dictionary of dictionaries
+    :param report_dict: a dictionary of dictionaries, or of dictionaries of dataframes already loaded with
+    RawReport.dataframes
     :return: It breaks them all up sheet by sheet and merges the dataframes together, returns merged report
     stored as dictionary of dataframes
     """
     dataframes_dict = {}
     for json in report_dict:
-        dataframes_dict[json] = object_conversions.json_dict_to_dataframes_dict(report_dict[json])
-    list_of_views = []
-    for df_dict in dataframes_dict.values():
-        list_of_views.append(list(df_dict.items()))
-    to_return = {}
-    for idx in range(len(list_of_views[0])):
-        to_return[list_of_views[0][idx][0]] = [list_of_views[0][idx][1]]
-        for other_df in list_of_views[1:]:
-            to_return[list_of_views[0][idx][0]].append(other_df[idx][1])
-
-    for keys in to_return:
-        to_return[keys] = pd.concat(
-           to_return[keys], axis=1).fillna(value=np.nan)
-        to_return[keys].columns = to_return[keys].columns.astype(str)
-
-    return normalize_frames(to_return)
-
-
-def normalize_frames(report_dict: dict) -> dict:
-    """
-    :param report_dict: takes a merged report dataframes dictionary
-    :return: a normalized report, where large empty strings are replaced with zeroes
-    """
-    skip_first = 0
-    for frame in report_dict:
-        if skip_first == 1:
-            report_dict[frame] = report_dict[frame].applymap(
-                lambda x: x.strip() if isinstance(x, str) else x).replace(to_replace='', value=0.0)
-            report_dict[frame] = report_dict[frame].fillna(value=0.0)
-        else:
-            skip_first = 1
-    for frame in report_dict:
-        dup_count = 1
-        # Rename columns that are duplicated to be able to track them for merging
-        while True in report_dict[frame].columns.duplicated():
-            report_dict[frame].columns = report_dict[frame].columns.where(
-                ~report_dict[frame].columns.duplicated(), report_dict[frame].columns + ' dp_' + str(dup_count))
-            dup_count += 1
-
-    return merge_duplicate_columns(report_dict)
-
-
-def merge_duplicate_columns(report_dict: dict) -> dict:
-    """
-    :param report_dict: takes the same report_dict as the above functions.
-    :return: A new report_dict where duplicated columns are removed and information between different formats from year
-    to year is merged correctly. Choses the most recent year for values which differ from past years. (only really
-    affects amortization values)
-    """
-    skip_first = 0
-    for frame in report_dict:
-        if skip_first == 1:
-            for idx, columns in enumerate(report_dict[frame].columns):
-                for column_dup in report_dict[frame].columns.to_list():
-                    if columns in column_dup and columns != column_dup:
-                        # columns will be from the most recent report, and not a dup, keep most recent values
-                        find_differences = report_dict[frame][columns].isin(pd.Series(data=np.zeros(
-                            shape=report_dict[frame][columns].shape), index=report_dict[frame][columns].index))
-                        report_dict[frame][column_dup].where(find_differences, report_dict[frame][columns],
-                                                             inplace=True)
-                        report_dict[frame][columns] = report_dict[frame][column_dup]
-                        report_dict[frame].drop(columns=column_dup, inplace=True)
+        if is_dataframes_dict(report_dict[json]):
+            dataframes_dict[json] = report_dict[json]
         else:
-            skip_first = 1
+            dataframes_dict[json] = object_conversions.json_dict_to_dataframes_dict(report_dict[json])
+    to_return = align_sheets(list(dataframes_dict.values()))
+
+    for position, keys in enumerate(to_return):
+        to_return[keys] = merge_sheet(to_return[keys], first=position == 0)
+
+    return to_return
+
+
+def merge_sheet(dataframes: list, first: bool) -> pd.DataFrame:
+    """
+    :param dataframes: the dataframes of a sheet in every year that has it, as aligned by align_sheets
+    :param first: whether it is the first sheet of the report, the cover page, which is not normalized
+    :return: the dataframes merged together and normalized, like join_pandas_dataframes merges each sheet
+    """
+    df = pd.concat(dataframes, axis=1).fillna(value=np.nan)
+    df.columns = df.columns.astype(str)
+
+    return normalize_frame(df, first)
+
+
+def normalize_sheet_title(title: str) -> str:
+    """
+    :param title: the title of a sheet, e.g. "CONSOLIDATED STATEMENTS OF STOCKHOLDERS' EQUITY (Parentheticals)"
+    :return: the title without case, punctuation, stop words and plurals, e.g. 'statement stockholder equity
+    parenthetical', so that the same statement is titled the same way every year
+    """
+    words = re.sub(r'[^a-z0-9]+', ' ', title.lower().replace('&', ' and ')).split()
+    return ' '.join(
+        word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word
+        for word in words if word not in SHEET_TITLE_STOP_WORDS
+    )
+
+
+def align_sheets(reports: list) -> dict:
+    """
+    :param reports: a list of dictionaries of dataframes, one per year
+    :return: a dictionary of the first report's sheet names as keys and, as values, the list of that sheet's
+    dataframes in every year that has it. A sheet is matched to the first report's sheet with the same normalized
+    title. The sheets left are then paired in order with the first report's sheets left, so that renamed statements
+    are still aligned. Sheets beyond those are left out, and a year whose report lacks a sheet is left out of that
+    sheet's list.
+    """
+    sheet_names = list(reports[0])
+    groups = {sheet_name: [reports[0][sheet_name]] for sheet_name in sheet_names}
+
+    positions_by_title = {}
+    for position, sheet_name in enumerate(sheet_names):
+        positions_by_title.setdefault(normalize_sheet_title(sheet_name), []).append(position)
+
+    for report in reports[1:]:
+        matched = {}
+        unmatched = []
+        for sheet_name, df in report.items():
+            candidates = [position for position in positions_by_title.get(normalize_sheet_title(sheet_name), [])
+                          if position not in matched]
+            if candidates:
+                matched[candidates[0]] = df
+            else:
+                unmatched.append(df)
+
+        # Renamed sheets are paired with the first report's unmatched sheets in order
+        unmatched_positions = [position for position in range(len(sheet_names)) if position not in matched]
+        matched.update(zip(unmatched_positions, unmatched))
+
+        for position, df in matched.items():
+            groups[sheet_names[position]].append(df)
+
+    return groups
+
+
+def is_dataframes_dict(report: object) -> bool:
+    """
+    :param report: a year of the report_dict given to join_pandas_dataframes
+    :return: whether it holds dataframes rather than their json representation
+    """
+    return isinstance(report, dict) and all(isinstance(sheet, pd.DataFrame) for sheet in report.values())
+
+
+def normalize_frame(df: pd.DataFrame, first: bool) -> pd.DataFrame:
+    """
+    :param df: a merged sheet
+    :param first: whether it is the first sheet of the report, the cover page, whose values are left as they are
+    :return: the normalized sheet, where large empty strings are replaced with zeroes and duplicated columns are merged
+    """
+    if not first:
+        df = df.applymap(lambda x: x.strip() if isinstance(x, str) else x).replace(to_replace='', value=0.0)
+        df = df.fillna(value=0.0)
+    # Rename columns that are duplicated to be able to track them for merging
+    df.columns = object_conversions.deduplicate_labels(df.columns)
+
+    if first:
+        return df
+    return merge_columns(df, duplicate_column_merges(df.columns))
+
+
+def duplicate_column_merges(columns: pd.Index) -> list:
+    """
+    :param columns: the columns of a merged sheet, the most recent year's first
+    :return: the (column, column_dup) pairs to merge, in the order they are merged. A column's duplicates are the
+    columns left whose label contains its label, e.g. 'Dec. 31, 2019 dp_1' for 'Dec. 31, 2019'. Every duplicate is
+    merged into one column only and then dropped.
+    """
+    remaining = columns.to_list()
+    merges = []
+    for column in columns:
+        for column_dup in list(remaining):
+            if column in column_dup and column != column_dup:
+                merges.append((column, column_dup))
+                remaining.remove(column_dup)
+
+    return merges
+
+
+def merge_columns(df: pd.DataFrame, merges: list) -> pd.DataFrame:
+    """
+    :param df: a merged sheet
+    :param merges: the (column, column_dup) pairs returned by duplicate_column_merges
+    :return: the sheet with every column_dup merged into its column and dropped. A column keeps its values, the most
+    recent ones, where they are not zero and takes its duplicate's values where they are.
+    """
+    if not merges:
+        return df
+
+    positions = {column: idx for idx, column in enumerate(df.columns)}
+    values = [df.iloc[:, idx].to_numpy() for idx in range(df.shape[1])]
+    dropped = set()
+    for column, column_dup in merges:
+        base, dup = values[positions[column]], values[positions[column_dup]]
+        values[positions[column]] = where_zero(base, dup)
+        dropped.add(positions[column_dup])
+
+    keep = [idx for idx in range(len(values)) if idx not in dropped]
+    merged = pd.DataFrame({pos: values[idx] for pos, idx in enumerate(keep)}, index=df.index)
+    merged.columns = df.columns[keep]
+    return merged
+
+
+def where_zero(base: np.ndarray, dup: np.ndarray) -> np.ndarray:
+    """
+    :param base: values of a column
+    :param dup: values of one of its duplicates
+    :return: the values of base, except where they are zero, where those of dup are taken
+    """
+    if base.dtype.kind in 'iuf' and (dup.dtype == base.dtype or dup.dtype == np.float64):
+        return np.where(base == 0, dup, base)
+
+    # Other columns, e.g. of strings, are compared and cast the way pandas does
+    zero = pd.Series(base).isin(np.zeros(1)).to_numpy()
+    merged = pd.Series(dup, copy=True)
+    merged.where(zero, base, inplace=True)
+    return merged.to_numpy()
+
 
-    return report_dict
+class DecodedSheets(Mapping):
+    """
+    A report whose sheets are only turned into dataframes the first time they are accessed.
+
+    Fields:
+        self.report: The dictionary equivalent of the JSON file the report
+            corresponds to, or a dictionary of dataframes loaded with
+            RawReport.dataframes or RawReport.sheets.
+    """
+
+    def __init__(self, report: dict):
+        """
+        :param report: a year of the report_dict given to join_pandas_dataframes, or a saved generated report
+        """
+        if not isinstance(report, Mapping):
+            report = json.loads(report)
+        self.report = report
+        self._dataframes = {}
+
+    def __getitem__(self, sheet: str) -> pd.DataFrame:
+        if sheet not in self._dataframes:
+            df = self.report[sheet]
+            if not isinstance(df, pd.DataFrame):
+                df = object_conversions.dict_to_dataframe(df)
+            self._dataframes[sheet] = df
+        return self._dataframes[sheet]
+
+    def __iter__(self):
+        return iter(self.report)
+
+    def __len__(self) -> int:
+        return len(self.report)
+
+    def row_index(self, sheet: str) -> pd.Index:
+        """
+        :param sheet: a sheet name of the report
+        :return: the row labels of the sheet, read without loading its values when the report is stored by
+        frame_storage
+        """
+        if sheet not in self._dataframes and isinstance(self.report, frame_storage.StoredFrames):
+            return self.report.index(sheet)
+        return self[sheet].index
+
+    def memory_usage(self) -> int:
+        """
+        :return: the bytes taken up by the sheets that are dataframes so far, or by the blob they are loaded from
+        when the report is stored by frame_storage
+        """
+        if isinstance(self.report, frame_storage.StoredFrames):
+            return self.report.nbytes
+
+        dataframes = {id(df): df for df in [*self.report.values(), *self._dataframes.values()]
+                      if isinstance(df, pd.DataFrame)}
+        return sum(int(df.memory_usage(index=True, deep=True).sum()) for df in dataframes.values())
+
+
+class MergedSheets(Mapping):
+    """
+    A merged report whose sheets are only decoded and merged the first time they are accessed. Sheets are aligned
+    across years by their names alone, so listing them decodes nothing.
+
+    Fields:
+        self.reports: The DecodedSheets of every year.
+
+        self.groups: A dictionary where keys are the sheet names of the merged
+            report while the values are the (year position, sheet name) pairs
+            of the sheets merged into it.
+    """
+
+    def __init__(self, report_dict: dict):
+        """
+        :param report_dict: the same report_dict join_pandas_dataframes takes
+        """
+        self.reports = [DecodedSheets(report) for report in report_dict.values()]
+        # Sheet names stand in for the dataframes, as align_sheets only looks at the names
+        self.groups = align_sheets([{sheet: (position, sheet) for sheet in report}
+                                    for position, report in enumerate(self.reports)])
+        self.first = next(iter(self.groups), None)
+        self._merged = {}
+
+    def __getitem__(self, sheet: str) -> pd.DataFrame:
+        if sheet not in self._merged:
+            self._merged[sheet] = merge_sheet(self.year_sheets(sheet), first=sheet == self.first)
+        return self._merged[sheet]
+
+    def __iter__(self):
+        return iter(self.groups)
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def year_sheets(self, sheet: str) -> list:
+        """
+        :param sheet: a sheet name of the merged report
+        :return: the dataframes of the sheet in every year that has it
+        """
+        return [self.reports[position][year_sheet] for position, year_sheet in self.groups[sheet]]
+
+    def row_labels(self, sheet: str) -> list:
+        """
+        :param sheet: a sheet name of the merged report
+        :return: the row labels of the merged sheet, joined like merge_sheet joins them but without merging any value
+        """
+        if sheet in self._merged:
+            return self._merged[sheet].index.to_list()
+
+        labels = [pd.DataFrame(index=self.reports[position].row_index(year_sheet))
+                  for position, year_sheet in self.groups[sheet]]
+        return pd.concat(labels, axis=1).index.to_list()
+
+    def memory_usage(self) -> int:
+        """
+        :return: the bytes taken up by the sheets merged so far and by the yearly reports they are merged from,
+        including the strings of their labels and object columns
+        """
+        merged = sum(int(df.memory_usage(index=True, deep=True).sum()) for df in self._merged.values())
+        return merged + sum(report.memory_usage() for report in self.reports)
 
 
 class ActiveReport:
@@ -84,12 +299,14 @@ class ActiveReport:
     A class representing the current report being requested the User.
 
     Fields:
-        self.json: The dictionary equivalent of the JSON file the report
-            corresponds to.
+        self.json_dict: The dictionary equivalent of the JSON file the report
+            corresponds to, built from self.dataframes_dict the first time it
+            is accessed.
 
-        self.dataframes: A dictionary of Pandas dataframes where key is the
+        self.dataframes_dict: A dictionary of Pandas dataframes where key is the
             sheet name of the dataframe while the value is the inner dictionary
-            corresponding to the dataframe itself.
+            corresponding to the dataframe itself. For a lazy report it is a
+            MergedSheets, which merges each sheet on first access.
 
         self.generated_report: A dictionary of Pandas dataframes where key is
             the sheet name of the dataframe while the value is the inner
@@ -98,15 +315,40 @@ class ActiveReport:
             based on the inputs of the User.
     """
 
-    def __init__(self, wbks_by_year: dict = None):
+    _json_dict = None
+
+    def __init__(self, wbks_by_year: dict = None, lazy: bool = False):
         """
         :param wbks_by_year: Given to us by the API. It is dict of keys as raw reports years, values as json from Django
+        or as dictionaries of dataframes loaded with RawReport.dataframes
+        :param lazy: whether to only decode and merge a sheet the first time it is accessed, see MergedSheets
         """
         if wbks_by_year:
-            self.dataframes_dict = join_pandas_dataframes(wbks_by_year)
-            self.json_dict = object_conversions.dataframes_dict_to_json_dict(self.dataframes_dict)
+            if lazy:
+                self.dataframes_dict = MergedSheets(wbks_by_year)
+            else:
+                self.dataframes_dict = join_pandas_dataframes(wbks_by_year)
             self.generated_report = self.dataframes_dict
 
+    @property
+    def json_dict(self) -> dict:
+        """
+        :return: the json dict object of the dataframes_dict, only built the first time it is needed
+        """
+        if self._json_dict is None:
+            self._json_dict = object_conversions.dataframes_dict_to_json_dict(self.dataframes_dict)
+        return self._json_dict
+
+    def label_index(self) -> dict:
+        """
+        :return: dict of keys as sheet names, values as the row labels of the sheet. Sheets of a lazy report are not
+        merged for it
+        """
+        if isinstance(self.dataframes_dict, MergedSheets):
+            return {sheet: self.dataframes_dict.row_labels(sheet) for sheet in self.dataframes_dict}
+
+        return {sheet: df.index.to_list() for sheet, df in self.dataframes_dict.items()}
+
     def filter_report(self, instructions: dict):
         """
         Args:
@@ -136,8 +378,9 @@ class ActiveReport:
         """Loads in a saved report that is currently in its json form into the active report object
 
         Args:
-            gen_report (dict): dictionary representation of the report to load in
+            gen_report (dict): dictionary representation of the report to load in. Its sheets are only turned into
+            dataframes once they are accessed, e.g. by filter_report
         """
-        self.dataframes_dict = object_conversions.json_dict_to_dataframes_dict(gen_report)
-        self.json_dict = object_conversions.dataframes_dict_to_json_dict(self.dataframes_dict)
+        self.dataframes_dict = DecodedSheets(gen_report)
+        self._json_dict = None
         self.generated_report = self.dataframes_dict
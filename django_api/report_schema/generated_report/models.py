@@ -7,12 +7,299 @@ from rest_framework.authentication import SessionAuthentication, BasicAuthentica
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.request import Request
+from django.db.models.deletion import ProtectedError
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Tuple
+import threading
 import json
 from report_schema.generated_report.permissions import IsOwner
+from report_schema.generated_report.active_report import MergedSheets
+from report_schema.raw_report.models import RawReport
+from report_schema import frame_storage, object_conversions
+
+
+class MergedReport(models.Model):
+    """Defines the MergedReport model in our database. Each row is a report merged from a company's raw
+    reports, which generated reports select rows from. Their content is never modified, a merged
+    report whose raw reports changed is stored as a new row. Its sheets are merged from raw_report_ids
+    the first time they are read until one of those raw reports changes, when they are stored.
+
+    Inherits from the predefined model class.
+    """
+    cik = models.CharField(max_length=50)
+    # Comma separated years merged together
+    years = models.CharField(max_length=200)
+    # SHA-256 of the company, years and raw reports' content, so that identical merged reports are stored once
+    digest = models.CharField(max_length=64, unique=True)
+    # Only set when frame_storage cannot store the sheets in parsed_frames
+    parsed_json = models.TextField(blank=True, null=True)
+    # The merged sheets as stored by frame_storage
+    parsed_frames = models.BinaryField(blank=True, null=True)
+    # Comma separated ids of the raw reports merged together, in the order they are merged, which the sheets are
+    # merged from while parsed_json and parsed_frames are null
+    raw_report_ids = models.CharField(max_length=200, blank=True, default='')
+    # Number of rows of each sheet as a JSON object, so that row selections are checked without loading the sheets
+    sheet_rows = models.TextField()
+    # Row labels of each sheet as a JSON object, the form data of the merged report
+    row_labels = models.TextField()
+    # CLEANER_VERSION of the raw reports it was merged from
+    cleaner_version = models.IntegerField()
+    # Whether it was merged from the company's raw reports as they are now, cleared when one of them changes
+    current = models.BooleanField(default=False, db_index=True)
+
+    def __str__(self):
+        return f'Report merged from {self.years} for {self.cik}'
+
+    def dataframes(self) -> Mapping:
+        """Loads the sheets of the merged report, or the raw reports they are merged from if they are not stored.
+
+        Returns:
+            Mapping: Sheet names as keys and Pandas dataframes as values, a MergedSheets that merges each sheet
+            on first access when they are not stored.
+        """
+        if self.parsed_frames is not None:
+            return frame_storage.loads(self.parsed_frames)
+        if self.parsed_json is not None:
+            return object_conversions.json_dict_to_dataframes_dict(self.parsed_json)
+
+        ids = [int(pk) for pk in self.raw_report_ids.split(',')]
+        raw_reports = RawReport.objects.in_bulk(ids)
+        return MergedSheets({pk: raw_reports[pk].sheets() for pk in ids})
+
+    def label_index(self) -> dict:
+        """Gets the row labels of the merged report without loading its sheets.
+
+        Returns:
+            dict: Sheet names as keys and lists of row labels as values.
+        """
+        return json.loads(self.row_labels)
+
+    def select_rows(self, instructions: dict, row_selection: dict = None) -> dict:
+        """Checks the rows a user picked from the merged report, like ActiveReport.filter_report would.
+
+        Args:
+            instructions (dict): Sheet names as keys and lists of row positions as values.
+            row_selection (dict): Rows already selected from the merged report, which the positions in
+                instructions refer to. Defaults to every row.
+
+        Raises:
+            KeyError: If a sheet does not exist.
+            IndexError: If a row position is out of bounds.
+
+        Returns:
+            dict: Sheet names as keys and lists of row positions in the merged report as values.
+        """
+        if row_selection is None:
+            row_selection = {sheet: range(rows) for sheet, rows in json.loads(self.sheet_rows).items()}
+
+        selection = {}
+        for sheet, rows in instructions.items():
+            sheet_rows = row_selection[sheet]
+            selection[sheet] = [sheet_rows[int(val)] for val in rows]
+
+        return selection
+
+
+def dump_merged_sheets(dataframes_dict: dict) -> Tuple[bytes, str]:
+    """Encodes the sheets of a merged report for MergedReport.parsed_frames, or for parsed_json when frame_storage
+    cannot store them.
+
+    Args:
+        dataframes_dict (dict): Dictionary of Pandas dataframes where key is the sheet name of the dataframe while
+            the value is the dataframe itself.
+
+    Returns:
+        bytes, str: The parsed_frames and parsed_json of the merged report, one of them None.
+    """
+    try:
+        return frame_storage.dumps(dataframes_dict), None
+    except frame_storage.UnsupportedFrameError:
+        return None, json.dumps(object_conversions.dataframes_dict_to_json_dict(dataframes_dict))
+
+
+def store_merged_sheets(cik: str) -> None:
+    """Merges and stores every sheet of the company's merged reports that generated reports select rows from
+    and whose sheets are still merged from its raw reports, before one of those raw reports changes.
+
+    Args:
+        cik (str): The cik of the company.
+    """
+    merged_reports = MergedReport.objects.filter(cik=cik, parsed_json__isnull=True, parsed_frames__isnull=True,
+                                                 generatedreport__isnull=False).distinct().values_list('pk', flat=True)
+    for merged_report_id in merged_reports:
+        parsed_frames, parsed_json = dump_merged_sheets(load_merged_report(merged_report_id))
+        MergedReport.objects.filter(pk=merged_report_id).update(parsed_frames=parsed_frames, parsed_json=parsed_json)
+
+
+def delete_outdated_merged_reports(cik: str) -> None:
+    """Deletes the merged reports of a company that are no longer current and that no generated report selects
+    rows from, as they will never be read again.
+
+    Args:
+        cik (str): The cik of the company.
+    """
+    try:
+        MergedReport.objects.filter(cik=cik, current=False, generatedreport__isnull=True).delete()
+    except ProtectedError:
+        # A generated report was created from one of them since, they are deleted the next time
+        pass
+
+
+class ReportCache:
+    """A least recently used cache kept in memory by each process, capped by the total size of its values.
+    The content of a merged report never changes, so entries keyed by its id never go stale.
+
+    Args:
+        max_bytes (int): Total size the cached values may take up. Once exceeded, the least recently used
+            entries are dropped.
+        sizeof (callable): Returns the size of a value in bytes.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: callable):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: object) -> object:
+        """Looks up a value and marks it as recently used.
+
+        Args:
+            key (object): The key the value was cached under.
+
+        Returns:
+            object: The value, or None if it is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: object, value: object) -> None:
+        """Keeps a value in place of the one cached under its key, unless it alone is larger than max_bytes, in
+        which case neither is kept.
+
+        Args:
+            key (object): The key to cache the value under.
+            value (object): The value.
+        """
+        size = self.sizeof(value)
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, dropped) = self._entries.popitem(last=False)
+                self._bytes -= dropped
+
+    def clear(self) -> None:
+        """Drops every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+def dataframes_memory_usage(dataframes_dict: Mapping) -> int:
+    """Measures the memory a dictionary of dataframes takes up, including the strings of their labels and
+    object columns.
+
+    Args:
+        dataframes_dict (Mapping): Dictionary of Pandas dataframes, or a MergedSheets whose sheets merged so
+            far and raw reports are measured.
+
+    Returns:
+        int: The size of the dataframes in bytes.
+    """
+    if isinstance(dataframes_dict, MergedSheets):
+        return dataframes_dict.memory_usage()
+
+    return sum(int(df.memory_usage(index=True, deep=True).sum()) for df in dataframes_dict.values())
+
+
+_merged_frames = ReportCache(settings.MERGED_REPORT_CACHE_MAX_BYTES, dataframes_memory_usage)
+
+
+def load_merged_report(merged_report_id: int, sheets: list = None) -> dict:
+    """Loads the sheets of a merged report, decoding or merging each of them once per process. They are kept in
+    memory by the merged report's id, up to settings.MERGED_REPORT_CACHE_MAX_BYTES of dataframes, and shared
+    between callers, so copy them before modifying them in place.
+
+    Args:
+        merged_report_id (int): Primary key of the MergedReport.
+        sheets (list): The names of the sheets to load, every sheet by default. Sheets that are merged from the
+            raw reports are only merged when they are loaded.
+
+    Returns:
+        dict: Dictionary of Pandas dataframes where key is the sheet name of the dataframe while the
+        value is the dataframe itself.
+    """
+    dataframes_dict = _merged_frames.get(merged_report_id)
+    cached = dataframes_dict is not None
+    if not cached:
+        merged_report = MergedReport.objects.only('parsed_json', 'parsed_frames', 'raw_report_ids').get(
+            pk=merged_report_id)
+        dataframes_dict = merged_report.dataframes()
+
+    loaded = {sheet: dataframes_dict[sheet] for sheet in (dataframes_dict if sheets is None else sheets)}
+
+    # Merging sheets takes up more memory, so the entry is measured again
+    if not cached or isinstance(dataframes_dict, MergedSheets):
+        _merged_frames.put(merged_report_id, dataframes_dict)
+
+    return loaded
+
+
+_materialized_reports = ReportCache(settings.MATERIALIZED_REPORT_CACHE_MAX_BYTES, len)
+
+
+def materialize_report(merged_report_id: int, row_selection: str) -> str:
+    """Builds the JSON of a generated report from the rows it selects. Merged reports never change, so the
+    result is cached by their id and the selection, up to settings.MATERIALIZED_REPORT_CACHE_MAX_BYTES of JSON.
+
+    Args:
+        merged_report_id (int): Primary key of the MergedReport the rows are selected from.
+        row_selection (str): JSON object of sheet names and lists of row positions, or None for every row.
+
+    Returns:
+        str: The JSON of the selected rows.
+    """
+    key = (merged_report_id, row_selection)
+    report_json = _materialized_reports.get(key)
+    if report_json is not None:
+        return report_json
+
+    if row_selection is None:
+        dataframes_dict = load_merged_report(merged_report_id)
+    else:
+        selection = json.loads(row_selection)
+        dataframes_dict = load_merged_report(merged_report_id, list(selection))
+        # Positions refer to the rows of the merged report as its JSON loads back, the way filtered reports
+        # were built from json_schema
+        dataframes_dict = {sheet: object_conversions.dataframe_to_json_dataframe(dataframes_dict[sheet]).iloc[rows]
+                           for sheet, rows in selection.items()}
+
+    report_json = json.dumps(object_conversions.dataframes_dict_to_json_dict(dataframes_dict))
+    _materialized_reports.put(key, report_json)
+    return report_json
 
 
 class GeneratedReport(models.Model):
-    """Defines the GeneratedReport model in our database
+    """Defines the GeneratedReport model in our database. A report either holds its whole content in
+    json_schema, or refers to the merged report it selects rows from, in which case json_schema is only set
+    once the report is modified, e.g. by analysis.
 
     Inherits from the predefined model class.
     """
@@ -20,10 +307,47 @@ class GeneratedReport(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.deletion.CASCADE,
                                    related_name='created_by')
     json_schema = models.TextField(blank=True, null=True)
+    merged_report = models.ForeignKey(MergedReport, on_delete=models.deletion.PROTECT, blank=True, null=True)
+    # Rows selected from merged_report as a JSON object of sheet names and row positions, every row if null
+    row_selection = models.TextField(blank=True, null=True)
 
     def __str__(self):
         return f'Report created by {self.created_by}, named: {self.name}'
 
+    def report_json(self) -> str:
+        """Gets the content of the report, materializing it from its merged report if needed.
+
+        Returns:
+            str: The JSON of the report.
+        """
+        if self.json_schema is not None or self.merged_report_id is None:
+            return self.json_schema
+
+        return materialize_report(self.merged_report_id, self.row_selection)
+
+
+@receiver(post_delete, sender=GeneratedReport)
+def delete_unused_merged_report(sender, instance: GeneratedReport, **kwargs) -> None:
+    """Deletes the merged report a deleted generated report selected rows from, if it was the last one to and
+    the merged report is no longer current.
+
+    Args:
+        sender: The GeneratedReport model.
+        instance (GeneratedReport): The generated report that was deleted.
+    """
+    cik = MergedReport.objects.filter(pk=instance.merged_report_id).values_list('cik', flat=True).first()
+    if cik is not None:
+        delete_outdated_merged_reports(cik)
+
+
+@admin.register(MergedReport)
+class MergedReportAdmin(admin.ModelAdmin):
+    """Defines what parameters from the merged report model should be displayed on the admin panel.
+
+    Inherits from the predefined model admin class.
+    """
+    list_display = ('cik', 'years', 'digest')
+
 
 @admin.register(GeneratedReport)
 class GeneratedReportAdmin(admin.ModelAdmin):
@@ -56,6 +380,12 @@ class GeneratedReportSerializer(serializers.ModelSerializer):
             'json_schema'
         )
 
+    # Reports that refer to a merged report are materialized from it
+    def to_representation(self, instance):
+        representation = super(GeneratedReportSerializer, self).to_representation(instance)
+        representation['json_schema'] = instance.report_json()
+        return representation
+
 
 class GeneratedReportViewSet(viewsets.ModelViewSet):
     """Defines the API Endpoint for the GeneratedReport model in the database.
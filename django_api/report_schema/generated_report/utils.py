@@ -1,9 +1,11 @@
-from report_schema.generated_report.models import GeneratedReport
+from report_schema.generated_report.models import GeneratedReport, MergedReport
 from report_schema.generated_report.active_report import ActiveReport
 from report_schema.raw_report import utils as raw_rep_utils
+from report_schema.raw_report.report_cleaner.cleaner import CLEANER_VERSION
 from report_schema import object_conversions
 
 import json
+import hashlib
 import pandas as pd
 import numpy as np
 from typing import Tuple
@@ -27,19 +29,20 @@ def get_sheets_and_rows(user: str, report_name: str, company_name: str, cik: str
     """
     year_list = years.split(',')
 
-    args = {
-        'company': company_name,
-        'cik': cik,
-        'years': year_list
-    }
-    response = raw_rep_utils.retrieve_raw_reports_response(args)
-
-    merged_report = ActiveReport(response['reports'])
+    # The form data of a merged report that is still current is read from its row labels, without loading any sheet
+    merged_report = current_merged_report(cik, year_list)
+    if merged_report is None:
+        args = {
+            'company': company_name,
+            'cik': cik,
+            'years': year_list
+        }
+        merged_report = store_merged_report(cik, year_list, list(raw_rep_utils.retrieve_raw_reports(args)))
 
     GeneratedReport.objects.create(
         name=report_name,
         created_by=user,
-        json_schema=json.dumps(merged_report.return_json_report())
+        merged_report=merged_report
     )
 
     form_data = create_form_data(merged_report)
@@ -47,21 +50,79 @@ def get_sheets_and_rows(user: str, report_name: str, company_name: str, cik: str
     return form_data
 
 
-def create_form_data(report: dict) -> dict:
-    """Helper function that goes into the data frame object and retrieves the form data.
+def current_merged_report(cik: str, years: list) -> MergedReport:
+    """Looks up the merged report of a company's current raw reports, without loading its sheets.
 
     Args:
-        report (dict): Dictionary representation of the merged report.
+        cik (str): The cik of the company.
+        years (list): The years merged together.
 
     Returns:
-        dict: returns a dictionary of sheet names and row values.
+        MergedReport: The merged report, or None if it has to be merged again.
     """
-    form_data = {}
-    sheet_names = report.json_dict.keys()
-    for sheet_name in sheet_names:
-        form_data[sheet_name] = report.dataframes_dict[sheet_name].index.to_list()
+    return MergedReport.objects.defer('parsed_json', 'parsed_frames').filter(
+        cik=cik,
+        years=','.join(sorted(set(years))),
+        cleaner_version=CLEANER_VERSION,
+        current=True
+    ).first()
 
-    return form_data
+
+def store_merged_report(cik: str, years: list, raw_reports: list) -> MergedReport:
+    """Stores a merged report for generated reports to select rows from, reusing an identical one. Only its row
+    labels are stored, its sheets are merged from the raw reports the first time they are read.
+
+    Args:
+        cik (str): The cik of the company the report was merged for.
+        years (list): The years merged together.
+        raw_reports (list): The RawReport models to merge together, in that order.
+
+    Returns:
+        MergedReport: The stored merged report.
+    """
+    years = ','.join(sorted(set(years)))
+    digest = hashlib.sha256(f'{cik}|{years}|{CLEANER_VERSION}'.encode())
+    for raw_report in raw_reports:
+        content = raw_report.parsed_frames if raw_report.parsed_frames is not None else raw_report.parsed_json.encode()
+        digest.update(f'|{len(content)}|'.encode())
+        digest.update(content)
+
+    # The row labels are joined from those of the yearly sheets, without merging any value
+    report = ActiveReport({raw_report.pk: raw_report.sheets() for raw_report in raw_reports}, lazy=True)
+    row_labels = report.label_index()
+    merged_report, _ = MergedReport.objects.get_or_create(
+        digest=digest.hexdigest(),
+        defaults={
+            'cik': cik,
+            'years': years,
+            'raw_report_ids': ','.join(str(raw_report.pk) for raw_report in raw_reports),
+            'sheet_rows': json.dumps({sheet: len(labels) for sheet, labels in row_labels.items()}),
+            'row_labels': json.dumps(row_labels),
+            'cleaner_version': CLEANER_VERSION
+        }
+    )
+
+    # It is now the one merged report of the company and years that is current
+    MergedReport.objects.filter(cik=cik, years=years, cleaner_version=CLEANER_VERSION, current=True).exclude(
+        pk=merged_report.pk).update(current=False)
+    if not merged_report.current:
+        MergedReport.objects.filter(pk=merged_report.pk).update(current=True)
+        merged_report.current = True
+
+    return merged_report
+
+
+def create_form_data(report: object) -> dict:
+    """Helper function that goes into the report's label index and retrieves the form data.
+
+    Args:
+        report (object): The merged report, an ActiveReport or a MergedReport. Only its sheet names and row
+        labels are read, so the sheets of a lazy ActiveReport or of a MergedReport are not merged or loaded.
+
+    Returns:
+        dict: returns a dictionary of sheet names and row values.
+    """
+    return report.label_index()
 
 
 def create_generated_report(user: str, report_name: str, form_data: str, output_type: str) -> int:
@@ -81,6 +142,18 @@ def create_generated_report(user: str, report_name: str, form_data: str, output_
 
     report_to_filter = GeneratedReport.objects.get(name=report_name, created_by=user)
 
+    # Only the positions of the selected rows are stored, the report is materialized from them when read
+    if report_to_filter.merged_report_id is not None and report_to_filter.json_schema is None:
+        merged_report = MergedReport.objects.only('sheet_rows').get(pk=report_to_filter.merged_report_id)
+        row_selection = report_to_filter.row_selection
+        if row_selection is not None:
+            row_selection = json.loads(row_selection)
+
+        report_to_filter.row_selection = json.dumps(merged_report.select_rows(form_data, row_selection))
+        report_to_filter.save()
+
+        return report_to_filter.pk
+
     active_report_obj = ActiveReport()
     active_report_obj.load_generated_report(json.loads(report_to_filter.json_schema))
     active_report_obj.filter_report(form_data)
@@ -207,7 +280,7 @@ def run_analysis(user, report_id: int) -> int:
     """
 
     report = GeneratedReport.objects.get(pk=report_id, created_by=user)
-    report_data = json.loads(report.json_schema)
+    report_data = json.loads(report.report_json())
 
     if analysis_already_ran(report_data):
         return report.pk
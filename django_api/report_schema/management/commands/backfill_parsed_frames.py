@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from report_schema.raw_report.models import RawReport
+from report_schema.raw_report import utils as raw_rep_utils
+
+
+class Command(BaseCommand):
+    help = 'Stores the parsed_frames of raw reports that were stored before it existed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of raw reports loaded from the database at a time.')
+
+    def handle(self, *args, **options):
+        reports = RawReport.objects.filter(parsed_frames__isnull=True, parsed_json__isnull=False)
+
+        converted = skipped = 0
+        for report in reports.only('pk', 'parsed_json').iterator(chunk_size=options['batch_size']):
+            parsed_frames = raw_rep_utils.json_dict_to_parsed_frames(report.parsed_json)
+            if parsed_frames is None:
+                skipped += 1
+                continue
+
+            RawReport.objects.filter(pk=report.pk).update(parsed_frames=parsed_frames)
+            converted += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored parsed_frames for {converted} raw reports, {skipped} left to parsed_json.'))
@@ -0,0 +1,180 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from company_schema.models import Company
+from report_schema.raw_report import utils as raw_rep_utils
+from report_schema import proxy
+import datetime
+import sys
+import os
+
+
+def read_companies(lines: list) -> list:
+    """
+    Parses the companies to prefetch, one per line. A line is either a CIK or
+    a CIK followed by the company's name, separated by a comma or a tab. Blank
+    lines and lines starting with # are ignored.
+
+    Args:
+        lines: Lines of the CIK file.
+
+    Returns:
+        A list of (cik, company name) tuples, where the name is None if the
+        line did not have one.
+    """
+    companies = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        cik, _, name = line.replace('\t', ',').partition(',')
+        cik = cik.strip()
+        if not proxy.is_valid_cik(cik):
+            raise CommandError(f'Invalid CIK: {cik}')
+
+        companies.append((cik, name.strip() or None))
+
+    return companies
+
+
+def company_name(cik: str, name: str) -> str:
+    """
+    Args:
+        cik: CIK of a company.
+        name: Name of the company given in the CIK file, or None.
+
+    Returns:
+        The name to store the company's raw reports under: the given name or
+        the name of a Company already stored with that CIK. None if neither
+        exists, as the name is the Company's primary key and a placeholder
+        would be duplicated by the company's real name later on.
+    """
+    if name:
+        return name
+
+    company = Company.objects.filter(cik=cik).first()
+    if company:
+        return company.name
+
+    return None
+
+
+def prefetch_company(name: str, cik: str, years: list) -> list:
+    """
+    Scrapes, cleans and stores the given years of a company's raw reports.
+    Runs in a worker thread, so it closes its database connection when done.
+
+    Returns:
+        The years that were stored, the other ones are not available on
+        EDGAR or failed to download.
+    """
+    try:
+        return raw_rep_utils.ingest_missing_raw_reports(name, cik, years)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Warms the RawReport table by scraping, cleaning and storing the 10-K raw reports of many companies.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'cik_file', nargs='?', default='-',
+            help='File with one CIK, optionally followed by ",<company name>", per line. Reads stdin if omitted.')
+        parser.add_argument(
+            '--years', default=','.join(str(year) for year in range(2016, datetime.date.today().year)),
+            help='Comma separated years to prefetch. Defaults to every year since 2016.')
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Number of companies prefetched at the same time.')
+        parser.add_argument(
+            '--resume-file',
+            help='File recording the CIKs that were prefetched. CIKs listed in it are skipped, '
+                 'so an interrupted run can be resumed.')
+
+    def handle(self, *args, **options):
+        if options['cik_file'] == '-':
+            companies = read_companies(sys.stdin.readlines())
+        else:
+            with open(options['cik_file']) as cik_file:
+                companies = read_companies(cik_file.readlines())
+
+        years = [year.strip() for year in options['years'].split(',')]
+        if not proxy.is_valid_years(years):
+            raise CommandError(f'Invalid years: {options["years"]}')
+
+        done = set()
+        resume_file = options['resume_file']
+        if resume_file and os.path.exists(resume_file):
+            with open(resume_file) as file:
+                done = set(line.strip() for line in file if line.strip())
+
+        total = len(companies)
+        skipped = 0
+        jobs = []
+        for idx, (cik, name) in enumerate(companies, start=1):
+            if cik in done:
+                self.stdout.write(f'[{idx}/{total}] {cik}: already prefetched')
+                continue
+
+            missing = raw_rep_utils.years_to_ingest(cik, years)
+            if not missing:
+                self.stdout.write(f'[{idx}/{total}] {cik}: all available years already stored')
+                self.mark_done(resume_file, cik)
+                continue
+
+            name = company_name(cik, name)
+            if name is None:
+                skipped += 1
+                self.stderr.write(self.style.WARNING(
+                    f'[{idx}/{total}] {cik}: skipped, no company name in the CIK file or database'))
+                continue
+
+            jobs.append((cik, name, missing))
+
+        failed = 0
+        finished = total - len(jobs)
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = {
+                pool.submit(prefetch_company, name, cik, missing): (cik, name, missing)
+                for cik, name, missing in jobs
+            }
+
+            for future in as_completed(futures):
+                cik, name, missing = futures[future]
+                finished += 1
+                try:
+                    stored = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'[{finished}/{total}] {cik} {name}: failed, {e}')
+                    continue
+
+                unavailable = raw_rep_utils.unavailable_report_years(cik, missing)
+                not_downloaded = [year for year in missing if year not in stored and year not in unavailable]
+
+                message = f'[{finished}/{total}] {cik} {name}: stored {", ".join(sorted(stored)) or "nothing"}'
+                if unavailable:
+                    message += f', not on EDGAR {", ".join(unavailable)}'
+                if not_downloaded:
+                    message += f', failed to download {", ".join(not_downloaded)}'
+                self.stdout.write(message)
+
+                # Years that failed to download are tried again when resuming
+                if not not_downloaded:
+                    self.mark_done(resume_file, cik)
+
+        summary = f'Prefetched {total - failed - skipped} of {total} companies, {failed} failed'
+        if skipped:
+            summary += f', {skipped} skipped'
+        self.stdout.write(self.style.SUCCESS(summary + '.'))
+
+    @staticmethod
+    def mark_done(resume_file: str, cik: str) -> None:
+        """
+        Records a prefetched CIK in the resume file, if there is one.
+        """
+        if resume_file:
+            with open(resume_file, 'a') as file:
+                file.write(cik + '\n')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from report_schema.raw_report import ingestion
+
+
+class Command(BaseCommand):
+    help = 'Runs a worker that scrapes, cleans and stores the raw reports requested through queued ingestion jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval', type=float, default=2,
+            help='Seconds to wait before checking an empty queue again.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit as soon as the queue is empty instead of waiting for new jobs.')
+
+    def handle(self, *args, **options):
+        processed = ingestion.run_worker(options['poll_interval'], options['once'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} ingestion jobs.'))
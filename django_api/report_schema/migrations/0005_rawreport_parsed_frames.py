@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report_schema', '0004_ingestionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rawreport',
+            name='parsed_frames',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
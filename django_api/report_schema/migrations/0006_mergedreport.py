@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report_schema', '0005_rawreport_parsed_frames'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MergedReport',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cik', models.CharField(max_length=50)),
+                ('years', models.CharField(max_length=200)),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('parsed_frames', models.BinaryField()),
+                ('cleaner_version', models.IntegerField()),
+                ('current', models.BooleanField(db_index=True, default=False)),
+            ],
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def delete_merged_reports(apps, schema_editor):
+    # They lack sheet_rows and are merged again when next requested
+    apps.get_model('report_schema', 'MergedReport').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report_schema', '0006_mergedreport'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_merged_reports, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='mergedreport',
+            name='parsed_json',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='mergedreport',
+            name='parsed_frames',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mergedreport',
+            name='sheet_rows',
+            field=models.TextField(default='{}'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='row_selection',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='merged_report',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='report_schema.mergedreport'),
+        ),
+    ]
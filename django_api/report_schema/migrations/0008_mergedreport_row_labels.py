@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+
+def outdate_merged_reports(apps, schema_editor):
+    # They lack row labels and are merged again when next requested
+    apps.get_model('report_schema', 'MergedReport').objects.update(current=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report_schema', '0007_generatedreport_merged_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mergedreport',
+            name='row_labels',
+            field=models.TextField(default='{}'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(outdate_merged_reports, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report_schema', '0008_mergedreport_row_labels'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnavailableReport',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cik', models.CharField(max_length=50)),
+                ('year', models.CharField(max_length=4)),
+                ('checked_at', models.DateTimeField()),
+            ],
+            options={
+                'unique_together': {('cik', 'year')},
+            },
+        ),
+    ]
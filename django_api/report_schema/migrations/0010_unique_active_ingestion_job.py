@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    # Jobs queued twice by concurrent requests before the constraint existed, the oldest one is kept
+    IngestionJob = apps.get_model('report_schema', 'IngestionJob')
+    kept = {}
+    for job in IngestionJob.objects.filter(status__in=['queued', 'running']).order_by('created_at', 'pk'):
+        key = (job.cik, job.years)
+        if key in kept:
+            job.status = 'failed'
+            job.error = f'Duplicate of ingestion job {kept[key]}'
+            job.save()
+        else:
+            kept[key] = job.pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report_schema', '0009_unavailablereport'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingestionjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('cik', 'years'), name='unique_active_ingestion_job'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report_schema', '0010_unique_active_ingestion_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mergedreport',
+            name='raw_report_ids',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+    ]
@@ -1,6 +1,28 @@
 import pandas as pd
+import numpy as np
+import datetime
 import json
+import math
 import openpyxl as pyxl
+import re
+
+# Matches a label that already ends with a suffix added by deduplicate_labels.
+DUPLICATE_SUFFIX = re.compile(r' dp_\d+$')
+
+# Numbers are only parsed as epoch timestamps when they are past this many
+# seconds, i.e. one year, and in one of these units, like pd.read_json does.
+MIN_EPOCH_SECONDS = 31536000
+EPOCH_UNITS = ('s', 'ms', 'us', 'ns')
+# Strings pd.to_datetime reads as missing values.
+NAT_STRINGS = frozenset(('NaT', 'nat', 'NAT', 'nan', 'NaN', 'NAN'))
+
+# to_json writes floats with 10 decimals, i.e. scaled by DECIMALS_SCALE,
+# unless they are beyond these magnitudes, then with 10 significant digits.
+DECIMALS_SCALE = 1e10
+FIXED_DECIMALS_MAX = 1e16 - 1
+FIXED_DECIMALS_MIN = 1e-15
+# Floats below this whole part are exact with their decimals scaled up.
+EXACT_DECIMALS_MAX = 900719
 
 
 def json_dict_to_dataframes_dict(json_dict: dict) -> dict:
@@ -103,27 +125,515 @@ def json_dict_to_json_file(json_dict: dict, file_path: str):
 
 def dataframe_to_dict(dataframe: object) -> dict:
     """
+    Builds the dictionary json.loads would parse from dataframe.to_json(),
+    without writing and parsing the JSON. Like to_json, floats keep 10
+    decimals, dates become epoch milliseconds, missing values become None and
+    the labels become the strings of the JSON keys.
+
     Args:
         dataframe: A pandas dataframe
 
     Returns:
         Dictionary representation of pandas dataframe
     """
-    dup_count = 1
-    while True in dataframe.columns.duplicated():
-        dataframe.columns = dataframe.columns.where(
-            ~dataframe.columns.duplicated(), dataframe.columns + ' dp_' + str(dup_count))
-        dup_count += 1
+    columns = deduplicate_labels(dataframe.columns)
+    if columns is not dataframe.columns:
+        dataframe.columns = columns
+
+    json_columns = _json_columns(dataframe)
+    if json_columns is None:
+        return json.loads(dataframe.to_json(force_ascii=False))
+
+    index, columns, values = json_columns
+    return {column: dict(zip(index, column_values))
+            for column, column_values in zip(columns, values)}
+
+
+def dataframe_to_json_dataframe(dataframe: object) -> object:
+    """
+    Builds the dataframe pd.read_json would parse from dataframe.to_json(),
+    that is the dataframe as it is loaded back after being stored as JSON,
+    without writing and parsing the JSON.
 
-    return json.loads(dataframe.to_json(force_ascii=False))
+    Args:
+        dataframe: A pandas dataframe
+
+    Returns:
+        Pandas dataframe constructed from the JSON values of the dataframe.
+    """
+    return dict_to_dataframe(dataframe_to_dict(dataframe))
 
 
 def dict_to_dataframe(json_dict: dict) -> object:
     """
+    Builds the dataframe pd.read_json would parse from the JSON of a
+    dictionary, without writing and parsing the JSON. Like pd.read_json, the
+    labels and columns are converted to numbers or dates when they all can be,
+    columns named like dates are parsed as dates, and missing values are NaN.
+
     Args:
         json_dict: A dictionary representation of Pandas dataframe
 
     Returns:
         Pandas dataframe construced from dictionary.
     """
-    return pd.read_json(json.dumps(json_dict, ensure_ascii=False))
+    return _infer_json_types(pd.DataFrame(_with_json_keys(json_dict), dtype=None))
+
+
+def _infer_json_types(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Args:
+        df: A pandas dataframe of the values and string labels of a JSON
+            dictionary.
+
+    Returns:
+        The dataframe with the labels and columns pd.read_json infers.
+    """
+    df.index = _infer_dtype(df.index, convert_dates=True)
+    df.columns = _infer_dtype(df.columns, convert_dates=True)
+
+    df = _convert_columns(df, lambda column, data: (
+        _infer_dates(data) if _is_date_column(column) else (data, False)))
+    df = _convert_columns(df, lambda column, data: (
+        _infer_dtype(data, convert_dates=False), True))
+
+    return df
+
+
+def _json_columns(dataframe: pd.DataFrame) -> tuple:
+    """
+    Args:
+        dataframe: A pandas dataframe
+
+    Returns:
+        A tuple of the JSON keys of the labels, the JSON keys of the columns
+        and a list of the JSON values of each column, or None if the dataframe
+        holds labels or values whose JSON is not written here.
+
+    Raises:
+        ValueError: If the labels are not unique, like to_json does.
+    """
+    if not dataframe.index.is_unique:
+        raise ValueError("DataFrame index must be unique for orient='columns'.")
+
+    index = _json_keys(dataframe.index)
+    columns = _json_keys(dataframe.columns)
+    if index is None or columns is None:
+        return None
+
+    values = [data.to_numpy() for _, data in dataframe.items()]
+    # The float columns, which reports mostly hold, are converted together
+    float_positions = [position for position, data in enumerate(values) if data.dtype.kind == 'f']
+    if float_positions:
+        floats = _json_floats(np.stack([values[position] for position in float_positions]).astype('float64'))
+        json_floats = floats.astype(object)
+        json_floats[np.isnan(floats)] = None
+        for position, column_values in zip(float_positions, json_floats.tolist()):
+            values[position] = column_values
+
+    for position, data in enumerate(values):
+        if isinstance(data, np.ndarray):
+            values[position] = _json_values(data)
+            if values[position] is None:
+                return None
+
+    return index, columns, values
+
+
+def _json_keys(labels: pd.Index) -> list:
+    """
+    Args:
+        labels: Row or column index of a dataframe.
+
+    Returns:
+        The labels as the keys to_json writes for them, i.e. dates as epoch
+        milliseconds and anything else as its str(), or None if they are not
+        all strings, numbers, dates or missing.
+    """
+    if isinstance(labels, pd.MultiIndex):
+        return None
+    if pd.api.types.infer_dtype(labels, skipna=False) == 'string':
+        return labels.tolist()
+
+    keys = []
+    for label in labels:
+        if isinstance(label, str):
+            keys.append(label)
+        elif label is pd.NaT:
+            keys.append('null')
+        elif isinstance(label, (pd.Timestamp, datetime.date)):
+            milliseconds = _epoch_milliseconds(label)
+            if milliseconds is None:
+                return None
+            keys.append(str(milliseconds))
+        elif label is None or isinstance(label, (bool, int, float, np.bool_, np.number)):
+            keys.append(str(label))
+        else:
+            return None
+
+    return keys
+
+
+def _json_values(values: np.ndarray) -> list:
+    """
+    Args:
+        values: The values of a column of a dataframe that does not hold
+            floats.
+
+    Returns:
+        The values as json.loads reads them from to_json, or None if they are
+        not all strings, numbers, booleans, dates or missing.
+    """
+    kind = values.dtype.kind
+    if kind in 'iub':
+        return values.tolist()
+
+    if kind == 'M' and values.dtype == 'datetime64[ns]':
+        nanoseconds = values.view('int64')
+        # Truncated towards zero like to_json does
+        milliseconds = np.where(nanoseconds < 0, -(-nanoseconds // 10 ** 6), nanoseconds // 10 ** 6).astype(object)
+        milliseconds[np.isnat(values)] = None
+        return milliseconds.tolist()
+
+    if kind != 'O':
+        return None
+
+    json_values = []
+    for value in values:
+        if value is None or isinstance(value, str):
+            json_values.append(value)
+        elif isinstance(value, (bool, np.bool_)):
+            json_values.append(bool(value))
+        elif isinstance(value, (int, np.integer)):
+            json_values.append(int(value))
+        elif isinstance(value, (float, np.floating)):
+            json_values.append(_json_float(float(value)))
+        elif value is pd.NaT:
+            json_values.append(None)
+        elif isinstance(value, (pd.Timestamp, datetime.date)):
+            milliseconds = _epoch_milliseconds(value)
+            if milliseconds is None:
+                return None
+            json_values.append(milliseconds)
+        else:
+            return None
+
+    return json_values
+
+
+def _epoch_milliseconds(value: object) -> int:
+    """
+    Args:
+        value: A timestamp, datetime or date.
+
+    Returns:
+        The milliseconds since the epoch to_json writes for the value, or None
+        if it has a time zone.
+    """
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        return None
+
+    # Truncated towards zero like to_json does
+    nanoseconds = pd.Timestamp(value).value
+    milliseconds = abs(nanoseconds) // 10 ** 6
+    return -milliseconds if nanoseconds < 0 else milliseconds
+
+
+def _json_floats(values: np.ndarray) -> np.ndarray:
+    """
+    Args:
+        values: Array of float64 values.
+
+    Returns:
+        The values as json.loads reads them from to_json, which writes them
+        with 10 decimals. Infinite values become NaN like missing ones.
+    """
+    finite = np.isfinite(values)
+    magnitudes = np.abs(np.where(finite, values, 0.0))
+    whole = np.trunc(magnitudes)
+    # Whole numbers, which most values of a report are, are written as is
+    if not magnitudes.size or (np.array_equal(magnitudes, whole) and magnitudes.max() <= FIXED_DECIMALS_MAX):
+        return np.where(finite, values + 0.0, np.nan)
+
+    scaled = (magnitudes - whole) * DECIMALS_SCALE
+    frac = np.floor(scaled)
+    diff = scaled - frac
+    frac += diff > 0.5
+
+    # Exact when whole and frac make an integer that is a float exactly, as
+    # dividing it is correctly rounded like parsing the decimals is. Halves
+    # and decimals rounded up to a whole are left to _json_float.
+    fast = (finite & (diff != 0.5) & (frac < DECIMALS_SCALE) & (magnitudes <= FIXED_DECIMALS_MAX)
+            & ((magnitudes == 0) | (magnitudes >= FIXED_DECIMALS_MIN))
+            & ((frac == 0) | (whole < EXACT_DECIMALS_MAX)))
+    floats = np.where(frac == 0, whole, (whole * DECIMALS_SCALE + frac) / DECIMALS_SCALE)
+    # Only zero itself is written without its sign
+    floats = np.where(values == 0, 0.0, np.copysign(floats, values))
+    floats[~finite] = np.nan
+
+    for position in np.flatnonzero(~fast & finite):
+        floats.flat[position] = _json_float(values.flat[position])
+
+    return floats
+
+
+def _json_float(value: float) -> float:
+    """
+    Args:
+        value: A float.
+
+    Returns:
+        The float json.loads reads from the JSON to_json writes for the
+        value, or None if it is NaN or infinite.
+    """
+    if not math.isfinite(value):
+        return None
+
+    magnitude = abs(value)
+    if magnitude > FIXED_DECIMALS_MAX or (magnitude and magnitude < FIXED_DECIMALS_MIN):
+        return float('%.10g' % value)
+
+    whole = int(magnitude)
+    scaled = (magnitude - whole) * DECIMALS_SCALE
+    frac = int(scaled)
+    diff = scaled - frac
+    if diff > 0.5 or (diff == 0.5 and (frac == 0 or frac & 1)):
+        frac += 1
+        if frac >= DECIMALS_SCALE:
+            frac = 0
+            whole += 1
+
+    return math.copysign(float(f'{whole}.{frac:010d}'), value) if value else 0.0
+
+
+def _with_json_keys(json_dict: dict) -> dict:
+    """
+    Args:
+        json_dict: A dictionary representation of Pandas dataframe
+
+    Returns:
+        The dictionary with its keys turned into strings the way json.dumps
+        writes them, e.g. 2019 into '2019' and None into 'null'.
+    """
+    def json_key(key):
+        return key if isinstance(key, str) else json.dumps(key)
+
+    # Not a dataframe, the DataFrame constructor raises like pd.read_json does
+    if not isinstance(json_dict, dict):
+        return json_dict
+
+    converted = {}
+    for column, rows in json_dict.items():
+        if isinstance(rows, dict) and not all(isinstance(row, str) for row in rows):
+            rows = {json_key(row): value for row, value in rows.items()}
+        converted[json_key(column)] = rows
+
+    return converted
+
+
+def _is_date_column(column: object) -> bool:
+    """
+    Args:
+        column: Label of a column.
+
+    Returns:
+        Whether pd.read_json parses the column as dates by default.
+    """
+    if not isinstance(column, str):
+        return False
+
+    column = column.lower()
+    return (column.endswith('_at') or column.endswith('_time')
+            or column in ('modified', 'date', 'datetime')
+            or column.startswith('timestamp'))
+
+
+def _convert_columns(df: pd.DataFrame, convert: callable) -> pd.DataFrame:
+    """
+    Args:
+        df: A pandas dataframe
+        convert: A function given a column's label and values that returns the
+            new values and whether they were converted.
+
+    Returns:
+        A dataframe of the converted columns, or df itself if none were.
+    """
+    converted = False
+    columns = {}
+    for idx, (column, data) in enumerate(df.items()):
+        data, changed = convert(column, data)
+        converted = converted or changed
+        columns[idx] = data
+
+    if not converted:
+        return df
+
+    # Columns are numbered, as the labels may have become duplicates
+    converted_df = pd.DataFrame(columns, index=df.index)
+    converted_df.columns = df.columns
+    return converted_df
+
+
+def _infer_dates(data: object) -> tuple:
+    """
+    Args:
+        data: A column or the labels of a dataframe.
+
+    Returns:
+        A tuple of the data parsed as dates and True, or the data itself and
+        False if they are not all epoch timestamps or date strings.
+    """
+    if not len(data):
+        return data, False
+
+    numbers = data
+    if numbers.dtype == 'object':
+        try:
+            numbers = data.astype('int64')
+        except (TypeError, ValueError, OverflowError):
+            pass
+
+    # Numbers too small to be epoch timestamps are not dates
+    if issubclass(numbers.dtype.type, np.number):
+        values = np.asarray(numbers)
+        in_range = pd.isna(values) | (values > MIN_EPOCH_SECONDS) | (values == pd.NaT.value)
+        if not in_range.all():
+            return data, False
+
+    # Strings that are not numbers can only be parsed as date strings, which
+    # to_datetime only tries for 'ns', so the other units are skipped
+    only_ns = numbers.dtype == 'object' and any(map(_is_non_numeric_string, numbers))
+
+    for unit in EPOCH_UNITS:
+        if only_ns and unit != 'ns':
+            continue
+        try:
+            return pd.to_datetime(numbers, errors='raise', unit=unit), True
+        except (ValueError, OverflowError, TypeError):
+            continue
+
+    return data, False
+
+
+def _is_non_numeric_string(value: object) -> bool:
+    """
+    Args:
+        value: A label or a value of a dataframe.
+
+    Returns:
+        Whether the value is a string that pd.to_datetime cannot read as a
+        number of epoch units nor as a missing value.
+    """
+    if not isinstance(value, str) or not value or value in NAT_STRINGS:
+        return False
+
+    try:
+        float(value)
+    except ValueError:
+        return True
+    return False
+
+
+def _infer_dtype(data: object, convert_dates: bool) -> object:
+    """
+    Args:
+        data: A column or the labels of a dataframe.
+        convert_dates: Whether to try parsing the data as dates first.
+
+    Returns:
+        The data as dates, integers or floats if they can all be converted,
+        otherwise the data itself. Missing values become NaN.
+    """
+    if convert_dates:
+        dates, converted = _infer_dates(data)
+        if converted:
+            return dates
+
+    if data.dtype == 'object':
+        try:
+            data = data.astype('float64')
+        except (TypeError, ValueError):
+            pass
+
+    if data.dtype.kind == 'f' and data.dtype != 'float64':
+        try:
+            data = data.astype('float64')
+        except (TypeError, ValueError):
+            pass
+
+    # Floats that are all whole numbers become integers
+    if len(data) and (data.dtype == 'float' or data.dtype == 'object'):
+        try:
+            integers = data.astype('int64')
+            if (integers == data).all():
+                data = integers
+        except (TypeError, ValueError, OverflowError):
+            pass
+
+    if data.dtype == 'int':
+        try:
+            data = data.astype('int64')
+        except (TypeError, ValueError):
+            pass
+
+    return data
+
+
+def deduplicate_labels(labels: pd.Index) -> pd.Index:
+    """
+    Makes the labels of an index unique. The first occurrence of a label is
+    kept as is and its n-th repeat gets ' dp_1 dp_2 ... dp_n' appended, e.g.
+    ['Total', 'Total', 'Total'] becomes
+    ['Total', 'Total dp_1', 'Total dp_1 dp_2'].
+
+    The suffixes are assigned in a single pass by numbering the repeats of
+    every label with groupby().cumcount(). Only when the labels are not all
+    strings, or some already end with a ' dp_<n>' suffix and could collide
+    with the generated ones, does it fall back to renaming the repeats one
+    round at a time.
+
+    Args:
+        labels: Row or column index of a dataframe.
+
+    Returns:
+        An index of unique labels, or labels itself if it was unique already.
+    """
+    if not labels.has_duplicates:
+        return labels
+
+    if not all(isinstance(label, str) and not DUPLICATE_SUFFIX.search(label)
+               for label in labels):
+        return _deduplicate_labels_by_rounds(labels)
+
+    values = pd.Series(labels.to_numpy(dtype=object))
+    repeats = values.groupby(values, sort=False).cumcount().to_numpy()
+
+    suffixes = ['']
+    for dup_count in range(1, repeats.max() + 1):
+        suffixes.append(f'{suffixes[-1]} dp_{dup_count}')
+
+    return pd.Index(
+        [label + suffixes[repeat] for label, repeat in zip(values, repeats)],
+        dtype=object,
+        name=labels.name
+    )
+
+
+def _deduplicate_labels_by_rounds(labels: pd.Index) -> pd.Index:
+    """
+    Renames the repeated labels of an index one round at a time until they
+    are unique, appending ' dp_<round>' to every repeat in each round.
+
+    Args:
+        labels: Row or column index of a dataframe.
+
+    Returns:
+        An index of unique labels.
+    """
+    dup_count = 1
+    while labels.has_duplicates:
+        labels = labels.where(
+            ~labels.duplicated(), labels + ' dp_' + str(dup_count))
+        dup_count += 1
+
+    return labels
@@ -1,6 +1,8 @@
 from report_schema.raw_report.utils import (
-    retrieve_raw_reports_response
+    retrieve_raw_reports_response,
+    years_to_ingest
 )
+from report_schema.raw_report.ingestion import enqueue_ingestion
 import json
 import os
 import re
@@ -233,6 +235,40 @@ class Proxy:
 
         return json.dumps({"error": msg}), 400
 
+    def request_raw_reports(self, request: dict) -> dict:
+        """
+        Calls validation methods on request and if the request validates,
+        retrieve a response with raw reports in it if every requested year is
+        already stored or was recently found to be unavailable on EDGAR.
+        Otherwise queue an ingestion job for the missing years and respond
+        with its id so that the caller can poll for it.
+
+        Args:
+            request: {
+                        "company": str,
+                        "cik": str,
+                        "years": list(str)
+                    }
+        Returns:
+            A tuple of a dictionary (response) that is either an error message,
+            a valid response or the queued job, along with a status code, 400,
+            200 or 202 respectively.
+        """
+        request = strip_request(request)
+        is_valid, msg = validate_raw_report_request(request)
+
+        if not is_valid:
+            return json.dumps({"error": msg}), 400
+
+        # Years EDGAR has no report for are left out, otherwise requesting
+        # them would queue a job on every call and never return the others.
+        missing = years_to_ingest(request['cik'], request['years'])
+        if missing:
+            job = enqueue_ingestion(request['company'], request['cik'], missing)
+            return json.dumps({'job_id': job.pk, 'status': job.status}), 202
+
+        return json.dumps(retrieve_raw_reports_response(request)), 200
+
     def generate_new_report(self, request: dict) -> dict:
         """
         Calls validation methods on request and if the request validates,
@@ -1,14 +1,86 @@
+from report_schema.raw_report import edgar_http
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from urllib.parse import parse_qs
+from io import BytesIO
 import urllib.parse as urlparse
 from pathlib import Path
-from lxml import html
+from lxml import html, etree
 import requests
+import threading
 import lxml
 import sys
 import re
 
 BASE_URL = "https://www.sec.gov"
 
+FILING_BUTTONS = etree.XPath(
+    "//*[@id='documentsbutton' or @id='interactiveDataBtn']")
+
+# SEC's fair access policy allows at most 10 requests per second, so only a
+# handful of workbooks are fetched at the same time.
+MAX_CONCURRENT_DOWNLOADS = 4
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class FilingIndexCache:
+    """
+    A thread safe, size capped cache of parsed filing pages, keyed by the url
+    of the page. Entries keep the ETag and Last-Modified validators the page
+    was served with so that it can be revalidated with a conditional GET.
+
+    Fields:
+        max_entries: Number of filing pages kept before the least recently
+            used one is dropped.
+        _entries: Cached filing pages, least recently used first.
+        _lock: Lock guarding _entries.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> dict:
+        """
+        Args:
+            url: The url of a filing page.
+
+        Returns:
+            The cached filing page, or None if the page is not cached.
+        """
+        with self._lock:
+            filing_index = self._entries.get(url)
+            if filing_index is not None:
+                self._entries.move_to_end(url)
+            return filing_index
+
+    def put(self, url: str, filing_index: dict) -> None:
+        """
+        Args:
+            url: The url of a filing page.
+            filing_index: The validators and parsed urls of the page.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._entries[url] = filing_index
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Drops every cached filing page.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+FILING_INDEX_CACHE = FilingIndexCache(1024)
+
 
 class EdgarScraper:
     """
@@ -24,44 +96,56 @@ class EdgarScraper:
         url: Default url to the company's filing page.
         timeout: Timeout for get requests will be used in the class, default to
             10.
+        workbook_cache: WorkbookCache downloaded excel reports are stored in
+            and looked up from, None to always download them.
+        _filings: (accession number, document url, interactive url) tuples of
+            the filings on the company's filing page that have interactive
+            data, None until the filing page was fetched.
         _document_urls: Urls for document buttons on the company's filing page.
         _interactive_urls: Urls for interactive buttons on the company's
             filing page.
         _excel_urls: Downloading urls for company's 10-K and 10-Q excel
             reports.
+        _accession_numbers: Accession numbers of the company's 10-K filings,
+            keyed by year.
     """
 
-    def __init__(self, name, cik, timeout=10):
+    def __init__(self, name, cik, timeout=10, workbook_cache=None):
         self.name = name
         self.cik = cik
         self.url = 'https://www.sec.gov/cgi-bin/browse-edgar?' + \
             f'action=getcompany&CIK={cik}'
         self.timeout = timeout
+        self.workbook_cache = workbook_cache
+        self._filings = None
         self._document_urls = []
         self._interactive_urls = []
         self._excel_urls = {'10-K': {}}
+        self._accession_numbers = {}
 
-    def _get(self, url: str) -> requests.models.Response:
+    def _get(self, url: str, stream: bool = False,
+             headers: dict = None) -> requests.models.Response:
         """
-        A private function that send a GET request to a url.
+        A private function that send a GET request to a url through the
+        process wide keep-alive session. Throttled and failed requests are
+        retried with exponential backoff, honoring Retry-After.
 
         Args:
             url: A url that want to be sending GET request to.
+            stream: Whether to defer downloading the response body until it
+                is read with iter_content.
+            headers: Extra request headers, e.g. conditional GET validators.
 
         Returns:
             The response of the GET request if the request was successful
-            within five tries, and None if the request was not successful.
+            within five retries, and None if the request was not successful.
+            A 304 Not Modified response counts as successful.
         """
-        page = requests.get(url, timeout=self.timeout, allow_redirects=True)
-        counter = 0
-
-        while counter < 5 and not page.ok:
-            page = requests.get(
-                url, timeout=self.timeout, allow_redirects=True
-            )
-            counter = counter + 1
+        page = edgar_http.get(url, timeout=self.timeout, stream=stream,
+                              headers=headers)
 
         if not page.ok:
+            page.close()
             return None
 
         return page
@@ -123,6 +207,48 @@ class EdgarScraper:
         else:
             return None
 
+    def _get_filing_index(self, url: str) -> dict:
+        """
+        A private method that gets the document and interactive button urls
+        listed on a filing page. Pages fetched before are revalidated with a
+        conditional GET, and a 304 Not Modified response reuses the urls
+        parsed last time instead of downloading and parsing the page again.
+
+        Args:
+            url: The url of the filing page.
+
+        Returns:
+            A dictionary with the list of filings on the page, as returned by
+            parse_filing_index, or None if the GET request was not successful.
+        """
+        cached = FILING_INDEX_CACHE.get(url)
+
+        headers = {}
+        if cached is not None:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        page = self._get(url, headers=headers)
+
+        if page is None:
+            return None
+
+        if page.status_code == 304 and cached is not None:
+            return cached
+
+        filing_index = {
+            'etag': page.headers.get('ETag'),
+            'last_modified': page.headers.get('Last-Modified'),
+            'filings': parse_filing_index(html.fromstring(page.content))
+        }
+
+        if filing_index['etag'] or filing_index['last_modified']:
+            FILING_INDEX_CACHE.put(url, filing_index)
+
+        return filing_index
+
     def _get_company_10_k_excel_report(self) -> None:
         """
         A private method that parse the company's 10-K excel report urls and
@@ -133,23 +259,13 @@ class EdgarScraper:
         So the _excel_urls after calling this function could look like:
             {"10-K": {"2020": [url], "2019": [url], "2018": [url]} }
         """
-        processed = 0
-
-        for document_url in self._document_urls:
-            accession_num = get_accession_number(
-                self._interactive_urls[processed])
-            if re.search(accession_num, document_url) is None:
-                continue
-
+        for accession_num, document_url, _ in self._filings:
             new_url = '/'.join(document_url.split('/')
                                [:-1] + ["Financial_Report.xlsx"])
             year = get_10k_year_from_url(new_url)
             if int(year) >= 2015:
                 self._excel_urls["10-K"][year] = [new_url]
-
-            processed += 1
-            if processed == len(self._interactive_urls):
-                break
+                self._accession_numbers[year] = accession_num
 
     def get_company_excel_reports_from(self,
                                        filing_type: str = "10-K",
@@ -180,21 +296,16 @@ class EdgarScraper:
         if not regex:
             return None
 
-        page = self.get_all_filings(
-            filing_type, prior_to, ownership, no_of_entries)
+        url = self.get_filings_url(filing_type, prior_to, ownership,
+                                   no_of_entries)
+        filing_index = self._get_filing_index(url)
 
-        if page is None:
+        if filing_index is None:
             return None
 
-        self._document_urls = []
-        for elem in page.xpath("//*[@id='documentsbutton']"):
-            if elem.attrib.get("href"):
-                self._document_urls.append(BASE_URL + elem.attrib["href"])
-
-        self._interactive_urls = []
-        for elem in page.xpath("//*[@id='interactiveDataBtn']"):
-            if elem.attrib.get("href"):
-                self._interactive_urls.append(BASE_URL + elem.attrib["href"])
+        self._filings = filing_index['filings']
+        self._document_urls = [filing[1] for filing in self._filings]
+        self._interactive_urls = [filing[2] for filing in self._filings]
 
         if filing_type != "10-K":
             return None
@@ -202,9 +313,29 @@ class EdgarScraper:
         self._get_company_10_k_excel_report()
         return self._excel_urls[filing_type]
 
+    def _get_report(self, url: str) -> requests.models.Response:
+        """
+        A private method that opens a streamed GET request to an excel report,
+        falling back to the .xls url when the .xlsx one is missing.
+
+        Args:
+            url: The downloading url of the report.
+
+        Returns:
+            The streamed response if the request was successful; None
+            otherwise.
+        """
+        req = self._get(url, stream=True)
+
+        if req is None:
+            req = self._get(url[:-1], stream=True)
+
+        return req
+
     def download_file(self, url: str) -> str:
         """
-        Downloads the file from the given url.
+        Downloads the file from the given url, writing it to disk chunk by
+        chunk as it arrives.
 
         Args:
             url: The downloading url of the file wants to be downloaded.
@@ -213,9 +344,7 @@ class EdgarScraper:
             File path of downloaded file is downloading is successful; None
             otherwise.
         """
-        req = self._get(url)
-        if req is None:
-            req = self._get(url[:-1])
+        req = self._get_report(url)
 
         if req is not None:
 
@@ -227,18 +356,86 @@ class EdgarScraper:
 
             file_name = 'report_' + '_'.join(self.name.split(' ')) + '.xlsx'
             file_path = dir_name / file_name
-            file = open(file_path, 'wb')
-            file.write(req.content)
-            file.close()
+            with open(file_path, 'wb') as file:
+                write_stream(req, file)
             return file_path
         return None
 
+    def _download_10k_year(self, year: str, url: str,
+                           in_memory: bool = False) -> object:
+        """
+        A private method that downloads a single year's 10-K excel report.
+
+        Args:
+            year: The year of the report being downloaded.
+            url: The downloading url of the report.
+            in_memory: Whether to keep the report in an in-memory buffer
+                instead of writing it to downloaded_reports/.
+
+        Returns:
+            File path of downloaded file, or a BytesIO rewound to its start if
+            in_memory is True, if downloading is successful; None otherwise.
+            Reports kept in the workbook cache are returned as the path of
+            the cached file unless in_memory is True.
+        """
+        accession_num = self._accession_numbers.get(year)
+        use_cache = self.workbook_cache is not None and accession_num
+
+        # Cached workbooks are read at once when kept in memory, as their
+        # path could be evicted by another ingestion before it is cleaned
+        if use_cache and in_memory:
+            cached = self.workbook_cache.read(accession_num)
+            if cached is not None:
+                return BytesIO(cached)
+        elif use_cache:
+            cached = self.workbook_cache.get(accession_num)
+            if cached is not None:
+                return cached
+
+        req = self._get_report(url)
+
+        if req is None:
+            return None
+
+        if in_memory:
+            buffer = BytesIO()
+            write_stream(req, buffer)
+            if use_cache:
+                self.workbook_cache.put(
+                    accession_num, lambda file: file.write(buffer.getbuffer()))
+            buffer.seek(0)
+            return buffer
+
+        if use_cache:
+            return self.workbook_cache.put(
+                accession_num, lambda file: write_stream(req, file))
+
+        company_name = '_'.join(self.name.split(' '))
+
+        plt = sys.platform
+        if plt.startswith('linux') or plt.startswith('darwin'):
+            dir_name = Path('downloaded_reports').absolute()
+        elif plt.startswith('win32') or plt.startswith('cygwin'):
+            dir_name = Path('downloaded_reports').absolute()
+
+        file_name = f'10K_{year}_report_{company_name}.xlsx'
+        full_file = dir_name / file_name
+        with open(full_file, 'wb') as file:
+            write_stream(req, file)
+
+        return full_file
+
     def download_10k_reports(self,
                              prior_to: str = "",
                              ownership: str = "include",
-                             no_of_entries: int = 10) -> dict:
+                             no_of_entries: int = 10,
+                             max_workers: int = MAX_CONCURRENT_DOWNLOADS,
+                             in_memory: bool = False,
+                             years: list = None) -> dict:
         """
-        Downloads the 10-K excel reports of the current company.
+        Downloads the 10-K excel reports of the current company. Every year is
+        fetched at the same time through a bounded thread pool, so the total
+        time depends on the slowest file rather than the sum of all of them.
 
         Args:
             prior_to: Time prior which documents are to be retrieved. If not
@@ -249,40 +446,43 @@ class EdgarScraper:
             no_of_entries: Number of reports can be returned. Defaults to 10
                 and the maximum is 100 as well.
 
+            max_workers: Maximum number of reports downloaded at the same
+                time. Defaults to MAX_CONCURRENT_DOWNLOADS, 1 downloads the
+                reports one after another.
+
+            in_memory: Whether to stream the reports into BytesIO buffers
+                instead of files in downloaded_reports/.
+
+            years: A list of year strings to download, None for every year
+                since 2016.
+
         Returns:
-            A dictionary where key is a year and the value is the file path for
-            the file corresponding to that year.
+            A dictionary where key is a year and the value is the file path
+            (or BytesIO buffer if in_memory is True) for the file
+            corresponding to that year.
         """
         self.get_company_excel_reports_from(
             "10-K", prior_to, ownership, no_of_entries)
         dict_10k = self._excel_urls['10-K']
 
-        file_paths = {}
+        to_download = [year for year in dict_10k.keys()
+                       if int(year) >= 2016 and (years is None or year in years)]
+        if not to_download:
+            return {}
+
+        with ThreadPoolExecutor(
+                max_workers=max(1, min(max_workers, len(to_download)))) as pool:
+            downloads = pool.map(
+                lambda year: self._download_10k_year(
+                    year, dict_10k[year][0], in_memory),
+                to_download
+            )
+            downloaded = dict(zip(to_download, downloads))
 
-        for year in dict_10k.keys():
-            url = dict_10k[year][0]
-            if int(year) >= 2016:
-                req = self._get(url)
-
-                if req is None:
-                    req = self._get(url[:-1])
-
-                if req is not None:
-                    company_name = '_'.join(self.name.split(' '))
-
-                    plt = sys.platform
-                    if plt.startswith('linux') or plt.startswith('darwin'):
-                        dir_name = Path('downloaded_reports').absolute()
-                    elif plt.startswith('win32') or plt.startswith('cygwin'):
-                        dir_name = Path('downloaded_reports').absolute()
-                    
-                    file_name = f'10K_{year}_report_{company_name}.xlsx'
-                    full_file = dir_name / file_name
-                    file = open(full_file, 'wb')
-                    file.write(req.content)
-                    file.close()
-
-                    file_paths[year] = full_file
+        file_paths = {}
+        for year in to_download:
+            if downloaded[year] is not None:
+                file_paths[year] = downloaded[year]
         return file_paths
 
     def get_existing_forms(self) -> dict:
@@ -312,6 +512,61 @@ class EdgarScraper:
         return None
 
 
+def parse_filing_index(page: lxml.html.HtmlElement) -> list:
+    """
+    Get the filings listed on a filing page that have interactive data, in a
+    single sweep over the document and interactive buttons of the page.
+
+    Args:
+        page: The HTML of a company's filing page.
+
+    Returns:
+        A list of (accession number, document url, interactive url) tuples in
+        the order they appear on the page.
+    """
+    document_urls = {}
+    interactive_urls = []
+    for elem in FILING_BUTTONS(page):
+        href = elem.attrib.get("href")
+        if not href:
+            continue
+
+        if elem.attrib["id"] == 'documentsbutton':
+            # Documents live in a folder named after the accession number
+            # without its dashes.
+            document_urls[href.split('/')[-2]] = BASE_URL + href
+        else:
+            interactive_urls.append(BASE_URL + href)
+
+    filings = []
+    for interactive_url in interactive_urls:
+        accession_num = get_accession_number(interactive_url)
+        document_url = document_urls.get(accession_num.replace('-', ''))
+        if document_url is not None:
+            filings.append((accession_num, document_url, interactive_url))
+
+    return filings
+
+
+def write_stream(response: requests.models.Response, file: object) -> None:
+    """
+    Writes the body of a streamed response to a file object chunk by chunk,
+    so that the whole body is never held in memory twice.
+
+    Args:
+        response: A response of a GET request sent with stream=True.
+        file: A writable binary file object.
+
+    Returns:
+        None
+    """
+    try:
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            file.write(chunk)
+    finally:
+        response.close()
+
+
 def get_10k_year_from_url(url: str) -> str:
     """
     Get the year and quarter of the given 10-K excel report url.
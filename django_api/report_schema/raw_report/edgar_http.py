@@ -0,0 +1,198 @@
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+import datetime
+import threading
+import requests
+import random
+import time
+import os
+
+"""
+This file contains the HTTP transport shared by every EdgarScraper in the
+process: one pooled keep-alive requests.Session, a token bucket that keeps the
+whole process under SEC's request-rate limit, and a GET helper that retries
+throttled or failed requests with exponential backoff.
+
+The token bucket only limits the process it lives in. SEC's limit applies to
+every process scraping EDGAR from the same host together, e.g. the web server
+and the ingestion worker, so EDGAR_REQUESTS_PER_SECOND must be set to their
+share of it.
+"""
+
+# SEC's fair access policy allows at most 10 requests per second, for all of
+# the processes sending requests together.
+REQUESTS_PER_SECOND = float(os.environ.get('EDGAR_REQUESTS_PER_SECOND', 10))
+POOL_SIZE = 10
+
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    A thread safe token bucket rate limiter.
+
+    Fields:
+        rate: Number of tokens added to the bucket every second.
+        capacity: Maximum number of tokens the bucket can hold, i.e. the
+            largest burst of requests allowed.
+        _tokens: Number of tokens currently in the bucket.
+        _updated: Time the bucket was last refilled.
+        _lock: Lock guarding _tokens and _updated.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Takes one token from the bucket, blocking until one is available.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+# Per process, see EDGAR_REQUESTS_PER_SECOND
+RATE_LIMITER = TokenBucket(REQUESTS_PER_SECOND, max(1, REQUESTS_PER_SECOND))
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Gets the keep-alive session shared by the current process. A new session
+    is created after a fork so that child processes never share sockets with
+    their parent.
+
+    Returns:
+        The pooled requests.Session of the current process.
+    """
+    global _session, _session_pid
+
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE,
+                                  pool_maxsize=POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+
+            _session = session
+            _session_pid = os.getpid()
+
+    return _session
+
+
+def retry_after_seconds(response: requests.models.Response) -> float:
+    """
+    Reads the Retry-After header of a response.
+
+    Args:
+        response: A response with a 429 or 503 status code.
+
+    Returns:
+        Number of seconds the server asked us to wait, or None if the header
+        is missing or malformed.
+    """
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Exponential backoff with jitter.
+
+    Args:
+        attempt: Number of attempts that already failed, starting at 0.
+
+    Returns:
+        Number of seconds to wait before the next attempt.
+    """
+    delay = min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+
+def get(url: str, timeout: float, max_retries: int = MAX_RETRIES,
+        **kwargs) -> requests.models.Response:
+    """
+    Sends a rate limited GET request through the shared session, retrying
+    throttled and server errors as well as connection errors and timeouts,
+    e.g. when a pooled keep-alive connection was reset by the server.
+
+    Args:
+        url: A url that want to be sending GET request to.
+        timeout: Timeout of every single attempt in seconds.
+        max_retries: Number of retries after the first attempt.
+        kwargs: Extra keyword arguments passed to requests.Session.get.
+
+    Returns:
+        The last response received. It is only retried when its status code
+        is in RETRY_STATUSES, so the caller still has to check response.ok.
+
+    Raises:
+        requests.ConnectionError: If every attempt failed to connect.
+        requests.Timeout: If every attempt timed out.
+    """
+    session = get_session()
+
+    attempt = 0
+    while True:
+        RATE_LIMITER.acquire()
+        try:
+            page = session.get(url, timeout=timeout, allow_redirects=True,
+                               **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= max_retries:
+                raise
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+            continue
+
+        if page.ok or page.status_code not in RETRY_STATUSES or \
+                attempt >= max_retries:
+            return page
+
+        delay = None
+        if page.status_code in (429, 503):
+            delay = retry_after_seconds(page)
+        if delay is None:
+            delay = backoff_delay(attempt)
+
+        page.close()
+        time.sleep(min(delay, BACKOFF_CAP))
+        attempt += 1
@@ -0,0 +1,142 @@
+from report_schema.raw_report.models import IngestionJob
+from report_schema.raw_report import utils as raw_rep_utils
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+import datetime
+import time
+
+"""
+This file contains the ingestion job queue. The web server only enqueues
+IngestionJob rows; worker processes started with the run_ingestion_worker
+management command claim them and do the scraping and cleaning, using the
+database as the only broker.
+"""
+
+# A running job that has not finished after this long is assumed to belong to
+# a worker that died and is queued again.
+STALE_JOB_TIMEOUT = datetime.timedelta(minutes=30)
+
+
+def enqueue_ingestion(company: str, cik: str, years: list) -> IngestionJob:
+    """
+    Queues the ingestion of a company's raw reports, reusing a job that is
+    already queued or running for the same company and years. The
+    unique_active_ingestion_job constraint makes concurrent calls share one
+    job as well.
+
+    Args:
+        company: Name of the company.
+        cik: CIK of the company.
+        years: A list of year strings to ingest.
+
+    Returns:
+        The IngestionJob that will ingest the years.
+    """
+    years = ','.join(sorted(years))
+
+    while True:
+        active_job = IngestionJob.objects.filter(
+            cik=cik,
+            years=years,
+            status__in=[IngestionJob.QUEUED, IngestionJob.RUNNING]
+        ).first()
+        if active_job:
+            return active_job
+
+        try:
+            with transaction.atomic():
+                return IngestionJob.objects.create(company=company, cik=cik,
+                                                   years=years)
+        except IntegrityError:
+            # Queued by a concurrent request since it was looked up
+            continue
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Queues running jobs again if they have been running for longer than
+    STALE_JOB_TIMEOUT.
+
+    Returns:
+        The number of jobs queued again.
+    """
+    return IngestionJob.objects.filter(
+        status=IngestionJob.RUNNING,
+        updated_at__lt=timezone.now() - STALE_JOB_TIMEOUT
+    ).update(status=IngestionJob.QUEUED, updated_at=timezone.now())
+
+
+def claim_next_job() -> IngestionJob:
+    """
+    Claims the oldest queued job. A job is claimed by flipping its status from
+    queued to running in a single UPDATE, so two workers can never claim the
+    same job.
+
+    Returns:
+        The claimed IngestionJob, or None if the queue is empty.
+    """
+    while True:
+        job = IngestionJob.objects.filter(
+            status=IngestionJob.QUEUED).order_by('created_at', 'pk').first()
+        if job is None:
+            return None
+
+        claimed = IngestionJob.objects.filter(
+            pk=job.pk, status=IngestionJob.QUEUED
+        ).update(status=IngestionJob.RUNNING, updated_at=timezone.now())
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job: IngestionJob) -> None:
+    """
+    Ingests the years of a claimed job that are still missing from the
+    database and records whether it succeeded.
+
+    Args:
+        job: A claimed IngestionJob.
+
+    Returns:
+        None
+    """
+    try:
+        raw_rep_utils.ingest_missing_raw_reports(
+            job.company, job.cik, job.years.split(','))
+    except Exception as e:
+        job.status = IngestionJob.FAILED
+        job.error = f'{type(e).__name__}: {e}'
+    else:
+        job.status = IngestionJob.DONE
+        job.error = ''
+
+    job.save()
+
+
+def run_worker(poll_interval: float = 2, once: bool = False) -> int:
+    """
+    Processes queued jobs one at a time until stopped.
+
+    Args:
+        poll_interval: Seconds to wait before checking an empty queue again.
+        once: Whether to return as soon as the queue is empty.
+
+    Returns:
+        The number of jobs processed.
+    """
+    processed = 0
+    requeue_stale_jobs()
+
+    while True:
+        close_old_connections()
+        job = claim_next_job()
+
+        if job is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            requeue_stale_jobs()
+            continue
+
+        run_job(job)
+        processed += 1
@@ -1,6 +1,10 @@
 from django.db import models
+from django.conf import settings
 from django.contrib import admin
 from django.apps import AppConfig
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from collections.abc import Mapping
 
 from rest_framework import viewsets, serializers, status
 from rest_framework.request import Request
@@ -8,6 +12,7 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 
 from company_schema.models import Company, CompanySerializer
+from report_schema import frame_storage, object_conversions
 
 
 class RawReport(models.Model):
@@ -18,17 +23,176 @@ class RawReport(models.Model):
     company = models.ForeignKey(Company, on_delete=models.deletion.CASCADE)
     report_date = models.DateField()
     parsed_json = models.TextField(blank=True, null=True)
+    # The sheets of parsed_json as stored by frame_storage, which load without parsing any JSON
+    parsed_frames = models.BinaryField(blank=True, null=True)
     excel_url = models.URLField()
 
     def __str__(self):
         return f'Report from {self.report_date} for {self.company}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The parsed_json that the loaded parsed_frames were stored from
+        instance._stored_parsed_json = instance.__dict__.get('parsed_json')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Saves the report, storing parsed_frames again whenever parsed_json changed, as it does when the report
+        is updated through the API or the admin, so that dataframes() never loads the sheets of an older
+        parsed_json.
+        """
+        if self._state.adding:
+            parsed_json_changed = self.parsed_frames is None and bool(self.parsed_json)
+        else:
+            parsed_json_changed = ('parsed_json' not in self.get_deferred_fields()
+                                   and self.parsed_json != getattr(self, '_stored_parsed_json', None))
+
+        if parsed_json_changed:
+            from report_schema.raw_report.utils import json_dict_to_parsed_frames
+
+            self.parsed_frames = json_dict_to_parsed_frames(self.parsed_json) if self.parsed_json else None
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'parsed_frames'}
+
+        super().save(*args, **kwargs)
+        self._stored_parsed_json = self.parsed_json
+
+    def dataframes(self) -> dict:
+        """Loads the cleaned sheets of the report. Reports stored before parsed_frames existed, or whose
+        sheets frame_storage cannot store, are loaded from parsed_json instead.
+
+        Returns:
+            dict: Dictionary of Pandas dataframes where key is the sheet name of the dataframe while the
+            value is the dataframe itself.
+        """
+        if self.parsed_frames is not None:
+            return frame_storage.loads(self.parsed_frames)
+
+        return object_conversions.json_dict_to_dataframes_dict(self.parsed_json)
+
+    def sheets(self) -> Mapping:
+        """Loads the cleaned sheets of the report like dataframes(), except that sheets stored in parsed_frames are
+        only loaded the first time they are accessed, and their row labels are read without loading them.
+
+        Returns:
+            Mapping: Sheet names as keys and Pandas dataframes as values, a frame_storage.StoredFrames when the
+            sheets are stored in parsed_frames.
+        """
+        if self.parsed_frames is not None:
+            return frame_storage.StoredFrames(self.parsed_frames)
+
+        return object_conversions.json_dict_to_dataframes_dict(self.parsed_json)
+
+
+@receiver([pre_save, pre_delete], sender=RawReport)
+def store_merged_report_sheets(sender, instance: RawReport, **kwargs) -> None:
+    """Stores the sheets of the company's merged reports that generated reports select rows from and that are
+    still merged from its raw reports, before the raw report is updated or deleted, so their rows stay the same.
+
+    Args:
+        sender: The RawReport model.
+        instance (RawReport): The raw report about to be saved or deleted.
+    """
+    from report_schema.generated_report import models as generated_models
+
+    # A raw report being added is not merged into any report yet
+    if instance._state.adding:
+        return
+
+    cik = Company.objects.filter(pk=instance.company_id).values_list('cik', flat=True).first()
+    if cik is not None:
+        generated_models.store_merged_sheets(cik)
+
+
+@receiver([post_save, post_delete], sender=RawReport)
+def invalidate_merged_reports(sender, instance: RawReport, **kwargs) -> None:
+    """Marks the stored merged reports of the company whose raw report was saved or deleted as outdated, so they
+    are merged again from the current raw reports. Outdated ones no generated report refers to are deleted.
+
+    Args:
+        sender: The RawReport model.
+        instance (RawReport): The raw report that was saved or deleted.
+    """
+    from report_schema.generated_report.models import MergedReport, delete_outdated_merged_reports
+
+    cik = Company.objects.filter(pk=instance.company_id).values_list('cik', flat=True).first()
+    if cik is not None:
+        MergedReport.objects.filter(cik=cik, current=True).update(current=False)
+        delete_outdated_merged_reports(cik)
+
 
 @admin.register(RawReport)
 class RawReportAdmin(admin.ModelAdmin):
     list_display = ('company', 'report_date', 'excel_url')
 
 
+class UnavailableReport(models.Model):
+    """Defines the UnavailableReport model in our database. Each row records a year whose 10-K raw report EDGAR
+    did not list when a company was last ingested, so that the year is not scraped again on every request until
+    the record is older than settings.UNAVAILABLE_REPORT_TTL.
+
+    Inherits from the predefined model class.
+    """
+    cik = models.CharField(max_length=50)
+    year = models.CharField(max_length=4)
+    checked_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('cik', 'year')
+
+    def __str__(self):
+        return f'No {self.year} report for {self.cik} as of {self.checked_at}'
+
+
+@admin.register(UnavailableReport)
+class UnavailableReportAdmin(admin.ModelAdmin):
+    list_display = ('cik', 'year', 'checked_at')
+
+
+class IngestionJob(models.Model):
+    """Defines the IngestionJob model in our database. Each row is a request to scrape, clean and store
+    the raw reports of a company that a worker process picks up, so the web server never does it inline.
+
+    Inherits from the predefined model class.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    company = models.CharField(max_length=50)
+    cik = models.CharField(max_length=50)
+    # Comma separated years to ingest
+    years = models.CharField(max_length=200)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # At most one queued or running job per company and years, even when requested concurrently
+            models.UniqueConstraint(fields=['cik', 'years'], condition=models.Q(status__in=['queued', 'running']),
+                                    name='unique_active_ingestion_job'),
+        ]
+
+    def __str__(self):
+        return f'Ingestion of {self.years} for {self.company} ({self.status})'
+
+
+@admin.register(IngestionJob)
+class IngestionJobAdmin(admin.ModelAdmin):
+    list_display = ('company', 'cik', 'years', 'status', 'created_at', 'updated_at')
+
+
 class ReportSchemaConfig(AppConfig):
     """Configures the name of this application
 
@@ -79,8 +243,45 @@ class RawReportViewSet(viewsets.ModelViewSet):
             'years': query_params_copy.pop('years'),
         }
 
-        response, status_code = Proxy().retrieve_raw_reports(real_request)
+        # Missing reports are ingested by a worker instead of inside this request
+        if settings.RAW_REPORT_ASYNC_INGESTION:
+            response, status_code = Proxy().request_raw_reports(real_request)
+        else:
+            response, status_code = Proxy().retrieve_raw_reports(real_request)
+
         if status_code == 400:
             return Response(response, status=status.HTTP_400_BAD_REQUEST)
+        if status_code == 202:
+            return Response(response, status=status.HTTP_202_ACCEPTED)
 
         return Response(response, status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=False, url_path='ingestion-status',
+            url_name='ingestion-status')
+    def ingestion_status(self, request: Request) -> Response:
+        """Reports the progress of an ingestion job queued by get-raw-reports.
+
+        Args:
+            request (Request): Request with a job_id query parameter.
+
+        Returns:
+            Response: The job's status, 'queued', 'running', 'done' or 'failed', along with its error if it
+            failed. Once it is done, get-raw-reports returns the reports.
+        """
+        job_id = request.query_params.get('job_id', '')
+        if not job_id.isnumeric():
+            return Response({'msg': 'Invalid request: job_id missing'}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = IngestionJob.objects.filter(pk=int(job_id)).first()
+        if job is None:
+            return Response({'msg': f'Ingestion job with id={job_id} does not exist'},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'job_id': job.pk,
+            'company': job.company,
+            'cik': job.cik,
+            'years': job.years.split(','),
+            'status': job.status,
+            'error': job.error
+        }, status=status.HTTP_200_OK)
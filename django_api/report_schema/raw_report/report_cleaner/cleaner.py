@@ -1,37 +1,67 @@
+from report_schema import object_conversions
 import pandas as pd
 import openpyxl as pyxl
 import numpy as np
+import re
 
+# Version of the cleaned and merged reports. Bump it whenever cleaning or merging changes their content, so that merged
+# reports stored under the previous version are rebuilt.
+CLEANER_VERSION = 1
 
-def ten_k_workbook_to_dataframes_dict(excel_report: pyxl.Workbook, notes: dict) -> dict:
+# Parenthesized suffixes stripped from row labels, e.g. 'Net income (loss)' becomes 'Net income', so that the same
+# row is labelled the same way in every company's report.
+LABEL_SUFFIXES = ('loss', 'gain', 'benefit', 'losses', 'gains', 'expense')
+
+
+def label_suffix_pattern(suffixes: tuple = LABEL_SUFFIXES) -> re.Pattern:
+    """
+    :param suffixes: words that are stripped from labels when they follow a space and are in parentheses
+    :return: compiled regex matching any of the suffixes
+    """
+    alternatives = '|'.join(re.escape(suffix) for suffix in suffixes)
+    return re.compile(rf' \((?:{alternatives})\)')
+
+
+LABEL_SUFFIX_PATTERN = label_suffix_pattern()
+
+# Sheets holding the financial statements, all others but the cover sheet are dropped by ten_k_excel_cleaning.
+STATEMENT_SHEETS_PATTERN = re.compile('^Condensed|^Consolidated|^CONSOLIDATED|^CONDENSED|^condensed|^consolidated')
+
+# Rows that are not in the sheet's units (e.g. 'In Millions') and must not be scaled by normalize_data.
+UNSCALED_ROWS_PATTERN = re.compile(r'\(in shares\)|\(in dollars per share\)')
+
+
+def normalize_labels(labels: pd.Series, pattern: re.Pattern = LABEL_SUFFIX_PATTERN) -> pd.Series:
+    """
+    :param labels: the index column of a sheet
+    :param pattern: regex of the suffixes to strip, see label_suffix_pattern
+    :return: the labels as strings with the suffixes stripped, in one vectorized pass
+    """
+    return labels.astype(str).str.replace(pattern, '', regex=True)
+
+
+def ten_k_workbook_to_dataframes_dict(excel_report: pyxl.Workbook, notes: dict,
+                                      label_suffixes: tuple = LABEL_SUFFIXES) -> dict:
     """
     :param excel_report: openpyxl Workbook object
     :param notes: Information on how to normalize that sheet
+    :param label_suffixes: parenthesized suffixes stripped from the row labels
     :return: Dictionary of dataframes for each sheet in excel workbook.
     """
+    if label_suffixes == LABEL_SUFFIXES:
+        pattern = LABEL_SUFFIX_PATTERN
+    else:
+        pattern = label_suffix_pattern(label_suffixes)
+
     dataframes_dict = {}
     for sheet in excel_report.worksheets:
         data = sheet.values
         cols = next(data)  # Headers (First Row)
         data = list(data)  # Second until Last rows
         df = pd.DataFrame(data, columns=cols)
-        for loc in range(len(df['index'])):
-            df.loc[loc, 'index'] = str(df['index'][loc]).replace(' (loss)', '')
-            df.loc[loc, 'index'] = str(df['index'][loc]).replace(' (gain)', '')
-            df.loc[loc, 'index'] = str(
-                df['index'][loc]).replace(' (benefit)', '')
-            df.loc[loc, 'index'] = str(
-                df['index'][loc]).replace(' (losses)', '')
-            df.loc[loc, 'index'] = str(
-                df['index'][loc]).replace(' (gains)', '')
-            df.loc[loc, 'index'] = str(
-                df['index'][loc]).replace(' (expense)', '')
+        df['index'] = normalize_labels(df['index'], pattern)
         df = df.set_index('index').fillna(value=np.nan)
-        dup_count = 1
-        while True in df.index.duplicated():
-            df.index = df.index.where(
-                ~df.index.duplicated(), df.index + ' dp_' + str(dup_count))
-            dup_count += 1
+        df.index = object_conversions.deduplicate_labels(df.index)
 
 
 #        dataframes_dict[sheet.title] = pd.DataFrame(data, columns=cols).set_index(keys='index').fillna(value=np.nan)
@@ -48,19 +78,18 @@ def normalize_data(dataframes_dict: dict, notes: dict) -> dict:
     :return: normalized sheets. all values in USD
     """
     for index, (sheet_name, frame) in enumerate(dataframes_dict.items()):
-        if get_multiplier(notes[sheet_name]) > 1:
-            multiplier = get_multiplier(notes[sheet_name])
-            df = frame.T
+        multiplier = get_multiplier(notes[sheet_name])
+        if multiplier > 1:
+            if frame.dtypes.nunique() > 1:
+                # Give the sheet a single dtype, as transposing it used to, so ints stored next to floats are still
+                # stored as floats. This is the only copy and only happens for sheets with mixed dtypes.
+                frame = pd.DataFrame(frame.to_numpy(), index=frame.index, columns=frame.columns)
+                dataframes_dict[sheet_name] = frame
             if index == 0:
-                df['Entity Public Float'] = df['Entity Public Float'] * multiplier
-                dataframes_dict[sheet_name] = df.T
+                rows = frame.index == 'Entity Public Float'
             else:
-                for row_name in df.columns:
-                    row_to_skip = (
-                        '(in shares)' in row_name or '(in dollars per share)' in row_name)
-                    if not row_to_skip:
-                        df[row_name] = df[row_name] * multiplier
-                dataframes_dict[sheet_name] = df.T
+                rows = ~frame.index.str.contains(UNSCALED_ROWS_PATTERN)
+            frame.loc[rows] = frame.loc[rows] * multiplier
     return dataframes_dict
 
 
@@ -78,33 +107,59 @@ def get_multiplier(note: str) -> int:
     return 1
 
 
+def unmerge_header_cells(sheet: pyxl.worksheet.worksheet.Worksheet) -> None:
+    """
+    :param sheet: a worksheet of a 10-K workbook, modified in place. Sheets don't share any cells, so each one can be
+    unmerged independently of the others
+    Unmerges every merged range of the sheet. The merged ranges are snapshotted once and each range's cells are looked
+    up once, rather than rescanning the sheet's remaining ranges after every unmerge.
+    """
+    for merged_range in list(sheet.merged_cells.ranges):
+        my_range = merged_range.coord
+        sheet.unmerge_cells(my_range)
+        range_rows = sheet[my_range]
+        # Fixing merged cells tha say '# Months Ended'
+        if len(range_rows) == 1:  # Len = 1 if Merged Horizontally
+            top_left = range_rows[0][0]
+            for col_cell in range_rows[0]:
+                # haven't seen a spreadsheet yet where this isnt the
+                # case for merged cells at the top.
+                next_cell = sheet[col_cell.coordinate[0] + '2']
+                next_cell.value = str(next_cell.value) + ' - ' + str(top_left.value)
+            top_left.value = None
+
+
+def ten_k_sheets_to_keep(sheetnames: list) -> list:
+    """
+    :param sheetnames: names of the sheets of a 10-K workbook, in order
+    :return: names of the sheets cleaning keeps: the condensed and consolidated statements, plus the first sheet that
+    isn't one, which is the cover sheet. Readers can use it to skip the other sheets without parsing them
+    """
+    kept_cover = False
+    to_keep = []
+    for sheet_name in sheetnames:
+        if STATEMENT_SHEETS_PATTERN.search(sheet_name):
+            to_keep.append(sheet_name)
+        elif not kept_cover:
+            to_keep.append(sheet_name)
+            kept_cover = True
+    return to_keep
+
+
 def ten_k_excel_cleaning(excel_report: pyxl.Workbook) -> tuple:
     """
     :param excel_report: a pyxl.Workbook object that is an excel spreadsheet
     :return: A cleaned excel spreadsheet. no merged columns, etc also gets the notes from each sheet
     and renames them to be the non abreviated version
     """
-    sheets_name_series = pd.Series(excel_report.sheetnames)
     notes = {}
-    pattern = '^Condensed|^Consolidated|^CONSOLIDATED|^CONDENSED|^condensed|^consolidated'
-    to_keep = sheets_name_series.str.contains(pattern)
-    to_drop = (sheets_name_series[~to_keep])[1:]
+    to_keep = set(ten_k_sheets_to_keep(excel_report.sheetnames))
+    to_drop = [sheet_name for sheet_name in excel_report.sheetnames if sheet_name not in to_keep]
     for sheet_name in to_drop:
         excel_report.remove(excel_report[sheet_name])
 
     for sheets in excel_report.worksheets:
-        while sheets.merged_cells.ranges:
-            my_range = str(sheets.merged_cells.ranges[0])
-            sheets.unmerge_cells(my_range)
-            # Fixing merged cells tha say '# Months Ended'
-            if len(sheets[my_range]) == 1:  # Len = 1 if Merged Horizontally
-                for col_cell in sheets[my_range][0]:
-                    # haven't seen a spreadsheet yet where this isnt the
-                    # case for merged cells at the top.
-                    next_coord = col_cell.coordinate[0] + '2'
-                    sheets[next_coord].value = str(sheets[next_coord].value) + \
-                        ' - ' + str(sheets[my_range][0][0].value)
-                sheets[my_range][0][0].value = None
+        unmerge_header_cells(sheets)
 
     # Fixing Sheet names to value in cell A1 and making cell A1 to be units
     for sheets in excel_report.worksheets:
@@ -1,8 +1,10 @@
 from report_schema import object_conversions
 from report_schema.raw_report.report_cleaner.cleaner import (
     ten_k_workbook_to_dataframes_dict,
-    ten_k_excel_cleaning
+    ten_k_excel_cleaning,
+    ten_k_sheets_to_keep
 )
+from report_schema.raw_report.report_cleaner import readers
 import openpyxl as pyxl
 
 
@@ -11,19 +13,55 @@ class ConvertCleanSave:
     This class is responsible for cleaning and converting a spreadsheet when it is pulled into the database for the
     first time. Most of it's functions are in cleaner.py
     """
-    def __init__(self, file: str):
+    def __init__(self, file: object, reader: str = 'openpyxl'):
         """
-        :param file: takes the file path of the xlsx downloaded from edgar
+        :param file: takes the file path of the xlsx downloaded from edgar, or a binary file object (e.g. a BytesIO
+        buffer the report was streamed into)
+        :param reader: name of the backend in readers.READERS the workbook is read with
         """
-        # the original workbook in case needed in future
-        self.excel_report = pyxl.load_workbook(file)
+        self.file = file
+        self._excel_report = None
+        # the workbook is only loaded once, cleaning modifies it in place. Readers that can skip the sheets cleaning
+        # drops never parse them
+        workbook = readers.read_workbook(file, reader, select=ten_k_sheets_to_keep)
         self.cleaned_excel_report, self.notes = ten_k_excel_cleaning(
-            pyxl.load_workbook(file))  # pyxl Workbook object
+            workbook)  # pyxl Workbook object, or the xml reader's look-alike
         self.pandas_dict = ten_k_workbook_to_dataframes_dict(
             self.cleaned_excel_report, self.notes)
 
+    @property
+    def excel_report(self) -> pyxl.Workbook:
+        """
+        :return: the original workbook in case needed in future. Nothing needs it while cleaning, so it is only
+        loaded when asked for, in openpyxl's read only mode which parses sheets lazily
+        """
+        if self._excel_report is None:
+            self._excel_report = load_workbook(self.file, read_only=True)
+        return self._excel_report
+
     def convert_to_json(self) -> dict:
         """
         :return: calls the object_conversion utility to make a json for storing in the database
         """
         return object_conversions.dataframes_dict_to_json_dict(self.pandas_dict)
+
+
+def load_workbook(file: object, read_only: bool = False) -> pyxl.Workbook:
+    """
+    :param file: file path or binary file object of an xlsx
+    :param read_only: whether to load the workbook in openpyxl's read only mode
+    :return: the loaded pyxl Workbook. File objects are rewound first so that the same buffer can be loaded again
+    """
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return pyxl.load_workbook(file, read_only=read_only)
+
+
+def convert_clean_to_json(file: object, reader: str = 'openpyxl') -> dict:
+    """
+    :param file: file path or binary file object of an xlsx downloaded from edgar
+    :param reader: name of the backend in readers.READERS the workbook is read with
+    :return: the json dict of the cleaned workbook. A module level function so that it can be sent to the processes of
+    a process pool, which only get the file and hand back the json dict rather than any openpyxl or pandas objects
+    """
+    return ConvertCleanSave(file, reader).convert_to_json()
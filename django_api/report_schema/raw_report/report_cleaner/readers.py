@@ -0,0 +1,610 @@
+from openpyxl.styles.numbers import (
+    builtin_format_code,
+    is_date_format,
+    is_timedelta_format
+)
+from openpyxl.utils.cell import (
+    coordinate_to_tuple,
+    get_column_letter,
+    range_boundaries
+)
+from openpyxl.utils.datetime import (
+    from_excel,
+    from_ISO8601,
+    MAC_EPOCH,
+    WINDOWS_EPOCH
+)
+from openpyxl.workbook.child import avoid_duplicate_name, INVALID_TITLE_REGEX
+from collections import namedtuple
+from lxml import etree
+import openpyxl as pyxl
+import posixpath
+import zipfile
+
+"""
+This file contains the backends that read a 10-K xlsx workbook for cleaning.
+
+openpyxl is the reference backend: it builds openpyxl's full cell and style
+object model. The xml backend parses the worksheet XML with lxml and only keeps
+what the cleaner reads, cell values and whether a cell is bold, in a minimal
+Workbook/Worksheet look-alike. ten_k_excel_cleaning and
+ten_k_workbook_to_dataframes_dict run unchanged on either backend and must
+produce the same parsed_json; the look-alike mirrors openpyxl's behaviour
+wherever it shows through the cleaner, e.g. cells created by accessing them,
+immutable fonts and how rows are shifted by delete_rows.
+"""
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+ROW_TAG = f'{{{MAIN_NS}}}row'
+CELL_TAG = f'{{{MAIN_NS}}}c'
+VALUE_TAG = f'{{{MAIN_NS}}}v'
+FORMULA_TAG = f'{{{MAIN_NS}}}f'
+INLINE_STRING_TAG = f'{{{MAIN_NS}}}is'
+TEXT_TAG = f'{{{MAIN_NS}}}t'
+RICH_TEXT_TAG = f'{{{MAIN_NS}}}r'
+STRING_ITEM_TAG = f'{{{MAIN_NS}}}si'
+MERGE_CELL_TAG = f'{{{MAIN_NS}}}mergeCell'
+
+
+class UnsupportedWorkbookError(Exception):
+    """
+    Raised by the xml backend for workbooks using features it does not read,
+    e.g. formulas or chartsheets. Such workbooks are read by openpyxl instead.
+    """
+
+
+Font = namedtuple('Font', ['b'])
+
+
+class Cell:
+    """
+    A cell of a Worksheet.
+
+    Fields:
+        row: Row of the cell, starting at 1.
+        column: Column of the cell, starting at 1.
+        value: Value of the cell.
+        font: Font of the cell. Like openpyxl's, it cannot be modified.
+    """
+    __slots__ = ('row', 'column', 'value', 'font')
+
+    def __init__(self, row: int, column: int, value: object = None,
+                 font: Font = None):
+        self.row = row
+        self.column = column
+        self.value = value
+        self.font = font
+
+    @property
+    def column_letter(self) -> str:
+        return get_column_letter(self.column)
+
+    @property
+    def coordinate(self) -> str:
+        return f'{get_column_letter(self.column)}{self.row}'
+
+
+class MergedCell(Cell):
+    """
+    A cell covered by a merged range other than its top left cell. Like in
+    openpyxl, it has no value and cannot be assigned one.
+    """
+    __slots__ = ()
+
+    def __init__(self, row: int, column: int, font: Font = None):
+        super().__init__(row, column, font=font)
+
+    @property
+    def value(self) -> object:
+        return None
+
+    @value.setter
+    def value(self, value: object) -> None:
+        if value is not None:
+            raise AttributeError(
+                "'MergedCell' object attribute 'value' is read-only")
+
+
+class MergedRange:
+    """
+    A merged range of a Worksheet.
+
+    Fields:
+        coord: The range, e.g. 'B1:D1'.
+        bounds: The (min_col, min_row, max_col, max_row) of the range.
+    """
+
+    def __init__(self, coord: str):
+        self.coord = coord
+        self.bounds = range_boundaries(coord)
+
+    def __str__(self) -> str:
+        return self.coord
+
+
+class MergedRanges:
+    """
+    The merged ranges of a Worksheet, in the order they appear in the sheet.
+    """
+
+    def __init__(self):
+        self.ranges = []
+
+
+class Worksheet:
+    """
+    The subset of openpyxl's Worksheet used by the cleaner.
+
+    Fields:
+        parent: The Workbook the sheet belongs to.
+        merged_cells: The sheet's merged ranges.
+        _title: Title of the sheet.
+        _cells: The sheet's cells keyed by (row, column). As in openpyxl, the
+            dimensions of the sheet are those of the cells that exist, and
+            accessing a cell creates it.
+        _default_font: Font of cells created after loading.
+    """
+
+    def __init__(self, parent, title: str, default_font: Font):
+        self.parent = parent
+        self.merged_cells = MergedRanges()
+        self._title = title
+        self._cells = {}
+        self._default_font = default_font
+
+    @property
+    def title(self) -> str:
+        return self._title
+
+    @title.setter
+    def title(self, value: str) -> None:
+        if not value:
+            raise ValueError('Title must have at least one character')
+
+        match = INVALID_TITLE_REGEX.search(value)
+        if match:
+            raise ValueError(
+                f'Invalid character {match.group(0)} found in sheet title')
+
+        if self._title != value:
+            value = avoid_duplicate_name(self.parent.sheetnames, value)
+        self._title = value
+
+    @property
+    def max_row(self) -> int:
+        return max((row for row, _ in self._cells), default=1)
+
+    @property
+    def max_column(self) -> int:
+        return max((column for _, column in self._cells), default=1)
+
+    @property
+    def min_column(self) -> int:
+        return min((column for _, column in self._cells), default=1)
+
+    def cell(self, row: int, column: int) -> Cell:
+        """
+        Gets a cell, creating it if it does not exist.
+        """
+        cell = self._cells.get((row, column))
+        if cell is None:
+            cell = self._cells[row, column] = Cell(
+                row, column, font=self._default_font)
+        return cell
+
+    def __getitem__(self, key: str) -> object:
+        """
+        Gets a cell, e.g. 'A1', or a tuple of rows of cells, e.g. 'A1:D1'.
+        Cells are created if they do not exist.
+        """
+        if ':' not in key:
+            row, column = coordinate_to_tuple(key)
+            return self.cell(row, column)
+
+        min_col, min_row, max_col, max_row = range_boundaries(key)
+        return tuple(self.iter_rows(min_row, max_row, min_col, max_col))
+
+    def iter_rows(self, min_row: int = None, max_row: int = None,
+                  min_col: int = None, max_col: int = None,
+                  values_only: bool = False):
+        if not self._cells and not any([min_row, max_row, min_col, max_col]):
+            return iter(())
+
+        min_row = min_row or 1
+        min_col = min_col or 1
+        max_row = max_row or self.max_row
+        max_col = max_col or self.max_column
+        return self._cells_by_row(min_row, max_row, min_col, max_col,
+                                  values_only)
+
+    def _cells_by_row(self, min_row, max_row, min_col, max_col, values_only):
+        for row in range(min_row, max_row + 1):
+            cells = (self.cell(row, column)
+                     for column in range(min_col, max_col + 1))
+            if values_only:
+                yield tuple(cell.value for cell in cells)
+            else:
+                yield tuple(cells)
+
+    def iter_cols(self):
+        if not self._cells:
+            return iter(())
+
+        max_row = self.max_row
+        max_col = self.max_column
+        return (
+            tuple(self.cell(row, column) for row in range(1, max_row + 1))
+            for column in range(1, max_col + 1)
+        )
+
+    @property
+    def rows(self):
+        return self.iter_rows()
+
+    @property
+    def columns(self):
+        return self.iter_cols()
+
+    @property
+    def values(self):
+        for row in self.iter_rows(values_only=True):
+            yield row
+
+    def merge_range(self, coord: str) -> None:
+        """
+        Marks a range as merged while loading the sheet. Every cell but the
+        top left one becomes a MergedCell, dropping its value.
+        """
+        merged_range = MergedRange(coord)
+        min_col, min_row, max_col, max_row = merged_range.bounds
+        for row in range(min_row, max_row + 1):
+            for column in range(min_col, max_col + 1):
+                if (row, column) != (min_row, min_col):
+                    self._cells[row, column] = MergedCell(
+                        row, column, font=self._default_font)
+        self.merged_cells.ranges.append(merged_range)
+
+    def unmerge_cells(self, range_string: str) -> None:
+        """
+        Removes a merged range, deleting all but its top left cell.
+        """
+        bounds = range_boundaries(range_string)
+        for idx, merged_range in enumerate(self.merged_cells.ranges):
+            if merged_range.bounds == bounds:
+                del self.merged_cells.ranges[idx]
+                break
+        else:
+            raise ValueError(f'Cell range {range_string} is not merged')
+
+        min_col, min_row, max_col, max_row = bounds
+        for row in range(min_row, max_row + 1):
+            for column in range(min_col, max_col + 1):
+                if (row, column) != (min_row, min_col):
+                    self._cells.pop((row, column), None)
+
+    def delete_rows(self, idx: int, amount: int = 1) -> None:
+        """
+        Deletes rows, shifting the rows below them up. Like openpyxl, every
+        cell below the deleted rows is created before shifting, so the shifted
+        rows completely overwrite the deleted ones.
+        """
+        max_row = self.max_row
+        remainder = range(max(max_row + 1 - amount, idx),
+                          min(idx + amount, max_row) + 1)
+
+        list(self.iter_rows(min_row=idx + amount))
+        for row, column in sorted(self._cells, key=lambda key: key[0]):
+            if row < idx + amount:
+                continue
+            cell = self._cells.pop((row, column))
+            cell.row = row - amount
+            self._cells[cell.row, column] = cell
+
+        min_col = self.min_column
+        max_col = self.max_column + 1
+        for row in remainder:
+            for column in range(min_col, max_col):
+                self._cells.pop((row, column), None)
+
+
+class Workbook:
+    """
+    The subset of openpyxl's Workbook used by the cleaner.
+
+    Fields:
+        worksheets: The workbook's worksheets, in order.
+    """
+
+    def __init__(self):
+        self.worksheets = []
+
+    @property
+    def sheetnames(self) -> list:
+        return [sheet.title for sheet in self.worksheets]
+
+    def __getitem__(self, name: str) -> Worksheet:
+        for sheet in self.worksheets:
+            if sheet.title == name:
+                return sheet
+        raise KeyError(f'Worksheet {name} does not exist.')
+
+    def remove(self, worksheet: Worksheet) -> None:
+        self.worksheets.remove(worksheet)
+
+
+class Styles:
+    """
+    The parts of a workbook's styles.xml that affect cell values and fonts.
+
+    Fields:
+        fonts: Font of every cell style.
+        date_styles: Cell styles whose number format is a date.
+        timedelta_styles: Cell styles whose number format is a duration.
+        default_font: Font of cells that are not in the sheet XML.
+    """
+
+    def __init__(self, source: bytes = None):
+        self.fonts = []
+        self.date_styles = set()
+        self.timedelta_styles = set()
+        self.default_font = Font(b=False)
+
+        if source is None:
+            return
+
+        root = etree.fromstring(source)
+        ns = {'main': MAIN_NS}
+
+        fonts = []
+        for font in root.iterfind('main:fonts/main:font', ns):
+            b = font.find('main:b', ns)
+            fonts.append(Font(
+                b=b is not None and b.get('val', 'true') not in ('false', 'f', '0')
+            ))
+
+        custom_formats = {
+            int(num_fmt.get('numFmtId')): num_fmt.get('formatCode')
+            for num_fmt in root.iterfind('main:numFmts/main:numFmt', ns)
+        }
+
+        cell_xfs = root.findall('main:cellXfs/main:xf', ns)
+        if not cell_xfs:
+            return
+
+        self.default_font = fonts[0] if fonts else self.default_font
+        for idx, xf in enumerate(cell_xfs):
+            font_id = int(xf.get('fontId', 0))
+            self.fonts.append(fonts[font_id] if font_id < len(fonts)
+                             else self.default_font)
+
+            num_fmt_id = int(xf.get('numFmtId', 0))
+            fmt = custom_formats.get(num_fmt_id,
+                                     builtin_format_code(num_fmt_id))
+            if is_date_format(fmt):
+                self.date_styles.add(idx)
+            if is_timedelta_format(fmt):
+                self.timedelta_styles.add(idx)
+
+    def font(self, style_id: int) -> Font:
+        if style_id < len(self.fonts):
+            return self.fonts[style_id]
+        return self.default_font
+
+
+def text_content(node: etree._Element) -> str:
+    """
+    :param node: a shared string item or an inline string
+    :return: its text stripped of all formatting, like openpyxl's Text.content
+    """
+    snippets = []
+    plain = node.find(TEXT_TAG)
+    if plain is not None and plain.text is not None:
+        snippets.append(plain.text)
+    for run in node.iterfind(RICH_TEXT_TAG):
+        text = run.find(TEXT_TAG)
+        if text is not None and text.text is not None:
+            snippets.append(text.text)
+    return ''.join(snippets)
+
+
+def read_shared_strings(source: object) -> list:
+    """
+    :param source: file object of the workbook's sharedStrings.xml
+    :return: the shared strings table
+    """
+    strings = []
+    for _, node in etree.iterparse(source, tag=STRING_ITEM_TAG):
+        strings.append(text_content(node).replace('x005F_', ''))
+        node.clear()
+    return strings
+
+
+def cast_number(value: str) -> object:
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+def read_relationships(archive: zipfile.ZipFile, part: str) -> dict:
+    """
+    :param archive: the xlsx zip archive
+    :param part: path of a part in the archive, e.g. 'xl/workbook.xml'
+    :return: the part's relationships as {id: (type, path of the target)}
+    """
+    folder, name = posixpath.split(part)
+    rels_path = posixpath.join(folder, '_rels', f'{name}.rels')
+    try:
+        root = etree.fromstring(archive.read(rels_path))
+    except KeyError:
+        return {}
+
+    relationships = {}
+    for rel in root.iterfind(f'{{{PACKAGE_REL_NS}}}Relationship'):
+        target = rel.get('Target')
+        if target.startswith('/'):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(folder, target))
+        relationships[rel.get('Id')] = (rel.get('Type'), target)
+    return relationships
+
+
+def read_worksheet(sheet: Worksheet, source: object, shared_strings: list,
+                   styles: Styles, epoch) -> None:
+    """
+    Loads the cells and merged ranges of a worksheet's XML into sheet, casting
+    values the same way openpyxl does.
+    """
+    cells = sheet._cells
+    row_counter = 0
+
+    for _, element in etree.iterparse(source, tag=(ROW_TAG, MERGE_CELL_TAG)):
+        if element.tag == MERGE_CELL_TAG:
+            sheet.merge_range(element.get('ref'))
+            continue
+
+        row_attr = element.get('r')
+        if row_attr is not None:
+            row_counter = int(float(row_attr))
+        else:
+            row_counter += 1
+        col_counter = 0
+
+        for cell in element.iterchildren(CELL_TAG):
+            data_type = cell.get('t', 'n')
+            style_id = int(cell.get('s', 0))
+
+            coordinate = cell.get('r')
+            if coordinate:
+                row, column = coordinate_to_tuple(coordinate)
+                col_counter = column
+            else:
+                col_counter += 1
+                row, column = row_counter, col_counter
+
+            if cell.find(FORMULA_TAG) is not None:
+                raise UnsupportedWorkbookError(
+                    f'Formula in cell {sheet.title}!{coordinate}')
+
+            value = None
+            if data_type == 'inlineStr':
+                inline = cell.find(INLINE_STRING_TAG)
+                if inline is not None:
+                    value = text_content(inline)
+            else:
+                value = cell.findtext(VALUE_TAG, None) or None
+
+            if value is not None and data_type != 'inlineStr':
+                if data_type == 'n':
+                    value = cast_number(value)
+                    if style_id in styles.date_styles:
+                        try:
+                            value = from_excel(
+                                value, epoch,
+                                timedelta=style_id in styles.timedelta_styles)
+                        except (OverflowError, ValueError):
+                            value = '#VALUE!'
+                elif data_type == 's':
+                    value = shared_strings[int(value)]
+                elif data_type == 'b':
+                    value = bool(int(value))
+                elif data_type == 'd':
+                    value = from_ISO8601(value)
+
+            cells[row, column] = Cell(row, column, value,
+                                      styles.font(style_id))
+
+        element.clear()
+
+
+def read_xml_workbook(file: object, select: callable = None) -> Workbook:
+    """
+    :param file: file path or binary file object of an xlsx
+    :param select: given the names of all sheets, in order, returns the names of the sheets to read. The sheets are
+    listed in workbook.xml, so the others are never opened. All sheets are read if None
+    :return: the workbook read by the xml backend
+    """
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+    with zipfile.ZipFile(file) as archive:
+        package = read_relationships(archive, '')
+        workbook_part = next(
+            target for rel_type, target in package.values()
+            if rel_type.endswith('/officeDocument'))
+        relationships = read_relationships(archive, workbook_part)
+
+        shared_strings = []
+        styles = Styles()
+        for rel_type, target in relationships.values():
+            if rel_type.endswith('/sharedStrings'):
+                with archive.open(target) as source:
+                    shared_strings = read_shared_strings(source)
+            elif rel_type.endswith('/styles'):
+                styles = Styles(archive.read(target))
+
+        root = etree.fromstring(archive.read(workbook_part))
+        ns = {'main': MAIN_NS}
+
+        epoch = WINDOWS_EPOCH
+        workbook_pr = root.find('main:workbookPr', ns)
+        if workbook_pr is not None and \
+                workbook_pr.get('date1904') in ('1', 'true'):
+            epoch = MAC_EPOCH
+
+        sheet_nodes = root.findall('main:sheets/main:sheet', ns)
+        if select is not None:
+            selected = set(select([node.get('name') for node in sheet_nodes]))
+            sheet_nodes = [node for node in sheet_nodes
+                           if node.get('name') in selected]
+
+        workbook = Workbook()
+        for sheet_node in sheet_nodes:
+            rel_type, target = relationships[sheet_node.get(f'{{{REL_NS}}}id')]
+            if not rel_type.endswith('/worksheet'):
+                raise UnsupportedWorkbookError(
+                    f'{sheet_node.get("name")} is not a worksheet')
+
+            sheet = Worksheet(workbook, sheet_node.get('name'),
+                              styles.default_font)
+            with archive.open(target) as source:
+                read_worksheet(sheet, source, shared_strings, styles, epoch)
+            workbook.worksheets.append(sheet)
+
+    return workbook
+
+
+def read_openpyxl_workbook(file: object, select: callable = None) -> pyxl.Workbook:
+    """
+    :param file: file path or binary file object of an xlsx
+    :param select: ignored, openpyxl always loads every sheet
+    :return: the workbook loaded by openpyxl. File objects are rewound first so that the same buffer can be loaded
+    again
+    """
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return pyxl.load_workbook(file)
+
+
+READERS = {
+    'openpyxl': read_openpyxl_workbook,
+    'xml': read_xml_workbook,
+}
+
+
+def read_workbook(file: object, reader: str = 'openpyxl', select: callable = None) -> object:
+    """
+    :param file: file path or binary file object of an xlsx
+    :param reader: name of the backend in READERS to read the workbook with
+    :param select: given the names of all sheets, returns the names of the sheets that are needed. Backends may skip
+    the other sheets, but don't have to
+    :return: the workbook, either an openpyxl Workbook or the xml backend's look-alike. Workbooks the xml backend does
+    not support are read by openpyxl
+    """
+    try:
+        return READERS[reader](file, select)
+    except UnsupportedWorkbookError:
+        return read_openpyxl_workbook(file)
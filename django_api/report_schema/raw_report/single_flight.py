@@ -0,0 +1,104 @@
+from contextlib import contextmanager, ExitStack
+from django.db import connection
+import threading
+import zlib
+
+"""
+This file contains the locks used to coalesce concurrent ingestions of the same
+raw reports. A raw report is identified by its (cik, year) pair. Whoever holds
+the lock of a pair is the only one allowed to scrape and store it; everyone
+else waits for the lock and then finds the report already in the database.
+
+Threads of the same process are serialized with in-process locks. Separate
+processes (gunicorn workers, ingestion workers, prefetch runs) are serialized
+with PostgreSQL advisory locks; on other databases only the in-process locks
+apply.
+"""
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _process_lock(key: tuple):
+    """
+    Holds the in-process lock of a key. Locks are created on first use and
+    dropped once nobody holds or waits for them.
+
+    Args:
+        key: A (cik, year) tuple.
+    """
+    with _locks_guard:
+        entry = _locks.get(key)
+        if entry is None:
+            entry = _locks[key] = [threading.Lock(), 0]
+        entry[1] += 1
+
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _locks[key]
+
+
+def advisory_lock_ids(key: tuple) -> tuple:
+    """
+    Maps a key onto the two 32 bit integers identifying a PostgreSQL advisory
+    lock.
+
+    Args:
+        key: A (cik, year) tuple.
+
+    Returns:
+        A (classid, objid) tuple of signed 32 bit integers.
+    """
+    cik, year = key
+    classid = zlib.crc32(cik.encode())
+    if classid >= 2 ** 31:
+        classid -= 2 ** 32
+    return classid, int(year)
+
+
+@contextmanager
+def _advisory_lock(key: tuple):
+    """
+    Holds the session level PostgreSQL advisory lock of a key. Does nothing on
+    other databases.
+
+    Args:
+        key: A (cik, year) tuple.
+    """
+    if connection.vendor != 'postgresql':
+        yield
+        return
+
+    lock_ids = advisory_lock_ids(key)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_lock(%s, %s)', lock_ids)
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s, %s)', lock_ids)
+
+
+@contextmanager
+def report_locks(cik: str, years: list):
+    """
+    Holds the locks of a company's raw reports for the given years, blocking
+    until every one of them is available. Locks are always taken in the same
+    order so that overlapping requests cannot deadlock.
+
+    Args:
+        cik: CIK of a company.
+        years: A list of year strings.
+    """
+    with ExitStack() as stack:
+        for year in sorted(set(years)):
+            key = (cik, year)
+            stack.enter_context(_process_lock(key))
+            stack.enter_context(_advisory_lock(key))
+        yield
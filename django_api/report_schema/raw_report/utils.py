@@ -1,9 +1,19 @@
-
 from report_schema.raw_report.report_cleaner.excelToPandasToJson import (
-    ConvertCleanSave
+    convert_clean_to_json
 )
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from report_schema.raw_report.EdgarScraper import EdgarScraper
-from report_schema.raw_report.models import RawReport, Company
+from report_schema.raw_report.models import (
+    RawReport,
+    UnavailableReport,
+    Company
+)
+from report_schema.raw_report.workbook_cache import WorkbookCache
+from report_schema.raw_report import single_flight
+from report_schema import frame_storage, object_conversions
+from django.conf import settings
+from django.utils import timezone
 import datetime
 import json
 import os
@@ -35,11 +45,49 @@ def create_raw_report_models(company_model, jsons, urls) -> None:
             # Edgar Scaper only able to get year of report, not full date.
             report_date=datetime.date(int(year), 1, 1),
             parsed_json=json.dumps(json_dict),
+            parsed_frames=json_dict_to_parsed_frames(json_dict),
             excel_url=urls[year]
         )
 
 
-def create_raw_report_jsons_from_workbooks(report_file_paths: dict) -> dict:
+def json_dict_to_parsed_frames(json_dict: dict) -> bytes:
+    """
+    Converts the dictionary representation of a cleaned workbook into the
+    binary representation stored in RawReport.parsed_frames.
+
+    Args:
+        json_dict: Dictionary of dictionaries that represents the JSON, or the
+            JSON string itself.
+
+    Returns:
+        The dataframes of the workbook as stored by frame_storage, or None if
+        it does not hold dataframes or they hold values frame_storage cannot
+        store, in which case the report is only loaded from its parsed_json.
+    """
+    try:
+        return frame_storage.dumps(
+            object_conversions.json_dict_to_dataframes_dict(json_dict))
+    except (ValueError, frame_storage.UnsupportedFrameError):
+        return None
+
+
+def get_workbook_cache() -> WorkbookCache:
+    """
+    Gets the cache of downloaded EDGAR workbooks configured in settings.
+
+    Returns:
+        A WorkbookCache, or None if WORKBOOK_CACHE_DIR is empty.
+    """
+    if not settings.WORKBOOK_CACHE_DIR:
+        return None
+
+    return WorkbookCache(settings.WORKBOOK_CACHE_DIR,
+                         settings.WORKBOOK_CACHE_MAX_BYTES)
+
+
+def create_raw_report_jsons_from_workbooks(report_file_paths: dict,
+                                           remove_files: bool = True,
+                                           max_workers: int = None) -> dict:
     """
     Assuming the raw report Excel workbooks are already downloaded, given a
     list of years, convert the excel workbooks into their dictionary
@@ -47,24 +95,212 @@ def create_raw_report_jsons_from_workbooks(report_file_paths: dict) -> dict:
 
     Args:
         report_file_paths: A dictionary where key is a year string and the
-            value is a file path to a raw report corresponding to that year.
+            value is a file path, or an in-memory buffer, holding the raw
+            report corresponding to that year.
+
+        remove_files: Whether to delete the files once converted. Must be
+            False for workbooks kept in the workbook cache.
+
+        max_workers: Number of processes cleaning workbooks in parallel,
+            settings.RAW_REPORT_CLEANING_WORKERS if None. Cleaning is CPU
+            bound pure Python, so threads would not help. With 1 worker the
+            workbooks are cleaned in the current process.
 
     Returns:
         A dictionary where keys are years and values are dictionary
         representations of Excel workbooks corresponding to that year.
     """
-    json_dict_by_year = {}
+    if max_workers is None:
+        max_workers = settings.RAW_REPORT_CLEANING_WORKERS
+    reader = settings.RAW_REPORT_WORKBOOK_READER
+
+    to_convert = {}
     for year, file_path in report_file_paths.items():
         if year <= '2015':
             break
-        conversion_obj = ConvertCleanSave(file_path)
+        to_convert[year] = file_path
+
+    workers = min(max_workers, len(to_convert))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            json_dicts = pool.map(convert_clean_to_json, to_convert.values(),
+                                  repeat(reader))
+            json_dict_by_year = dict(zip(to_convert.keys(), json_dicts))
+    else:
+        json_dict_by_year = {
+            year: convert_clean_to_json(file_path, reader)
+            for year, file_path in to_convert.items()
+        }
+
+    if remove_files:
+        for file_path in to_convert.values():
+            if not hasattr(file_path, 'read'):
+                os.remove(file_path)
 
-        json_dict_by_year[year] = conversion_obj.convert_to_json()
-        os.remove(file_path)
-        
     return json_dict_by_year
 
 
+def missing_report_years(cik: str, years: list) -> list:
+    """
+    Finds the years whose raw report is not stored in the database yet.
+
+    Args:
+        cik: CIK of a company.
+        years: A list of year strings.
+
+    Returns:
+        The years in years without a RawReport for the company, in the same
+        order.
+    """
+    stored = set(
+        str(report_date.year) for report_date in RawReport.objects.filter(
+            company__cik=cik,
+            report_date__year__in=years
+        ).values_list('report_date', flat=True)
+    )
+    return [year for year in years if year not in stored]
+
+
+def unavailable_report_years(cik: str, years: list) -> list:
+    """
+    Finds the years EDGAR had no 10-K report for when the company was last
+    ingested, less than settings.UNAVAILABLE_REPORT_TTL seconds ago.
+
+    Args:
+        cik: CIK of a company.
+        years: A list of year strings.
+
+    Returns:
+        The years in years recorded as unavailable, in the same order.
+    """
+    checked_after = timezone.now() - datetime.timedelta(
+        seconds=settings.UNAVAILABLE_REPORT_TTL)
+    unavailable = set(UnavailableReport.objects.filter(
+        cik=cik,
+        year__in=years,
+        checked_at__gt=checked_after
+    ).values_list('year', flat=True))
+    return [year for year in years if year in unavailable]
+
+
+def years_to_ingest(cik: str, years: list) -> list:
+    """
+    Finds the years whose raw report is neither stored nor recently found to
+    be unavailable on EDGAR.
+
+    Args:
+        cik: CIK of a company.
+        years: A list of year strings.
+
+    Returns:
+        The missing years in years that are worth scraping, in the same
+        order.
+    """
+    missing = missing_report_years(cik, years)
+    if not missing:
+        return missing
+
+    unavailable = unavailable_report_years(cik, missing)
+    return [year for year in missing if year not in unavailable]
+
+
+def record_unavailable_years(cik: str, years: list) -> None:
+    """
+    Records years EDGAR has no 10-K report for, so they are not scraped again
+    until settings.UNAVAILABLE_REPORT_TTL seconds have passed.
+
+    Args:
+        cik: CIK of a company.
+        years: A list of year strings.
+
+    Returns:
+        None
+    """
+    now = timezone.now()
+    for year in years:
+        UnavailableReport.objects.update_or_create(
+            cik=cik, year=year, defaults={'checked_at': now})
+
+
+def ingest_raw_reports(company: str, cik: str, years: list = None) -> list:
+    """
+    Scrapes a company's 10-K excel reports from EDGAR, cleans them and stores
+    them in the database as RawReport models.
+
+    Args:
+        company: Name of the company.
+        cik: CIK of the company.
+        years: A list of year strings to ingest, None for every year EDGAR
+            has a report for since 2016.
+
+    Returns:
+        The years that were stored.
+    """
+    edgar_scraper = EdgarScraper(company, cik,
+                                 workbook_cache=get_workbook_cache())
+
+    # Cached workbooks are returned as paths, anything else is streamed
+    # into memory.
+    report_file_paths = edgar_scraper.download_10k_reports(in_memory=True,
+                                                           years=years)
+
+    # Only years missing from a filing page that was fetched are unavailable,
+    # years that failed to download are tried again on the next request.
+    if years is not None and edgar_scraper._filings is not None:
+        record_unavailable_years(cik, [
+            year for year in years
+            if year not in edgar_scraper._excel_urls['10-K']
+        ])
+
+    # Must be called after downloading 10-K's (i.e. the previous statement)
+    jsons_by_year = create_raw_report_jsons_from_workbooks(
+        report_file_paths, remove_files=False
+    )
+
+    # Never store a year twice, even if it was stored by an ingestion that
+    # was not holding the lock of that year.
+    jsons_by_year = {
+        year: jsons_by_year[year]
+        for year in missing_report_years(cik, list(jsons_by_year))
+    }
+
+    # Jobs ingesting other years of a new company can get here at the same
+    # time, as they do not hold the same locks.
+    company_model, _ = Company.objects.get_or_create(name=company, cik=cik)
+
+    create_raw_report_models(company_model, jsons_by_year,
+                             edgar_scraper._excel_urls['10-K'])
+    UnavailableReport.objects.filter(cik=cik,
+                                     year__in=list(jsons_by_year)).delete()
+
+    return list(jsons_by_year.keys())
+
+
+def ingest_missing_raw_reports(company: str, cik: str, years: list) -> list:
+    """
+    Ingests the given years of a company's raw reports that are not stored
+    yet, leaving out the years recently found to be unavailable on EDGAR.
+    Concurrent calls for the same (cik, year) are coalesced: only the
+    first caller scrapes the year, the others wait for it to finish and then
+    find the year already stored.
+
+    Args:
+        company: Name of the company.
+        cik: CIK of the company.
+        years: A list of year strings.
+
+    Returns:
+        The years that were stored, which leaves out the missing years EDGAR
+        has no report for or that failed to download.
+    """
+    with single_flight.report_locks(cik, years):
+        missing = years_to_ingest(cik, years)
+        if not missing:
+            return []
+
+        return ingest_raw_reports(company, cik, missing)
+
+
 def raw_reports_from_db(request: dict) -> object:
     """
     Gets RawReport models with specfic CIK and year attributes from the
@@ -94,7 +330,8 @@ def retrieve_raw_reports_response(request: dict) -> dict:
             and years of reports wanted.
 
     Returns:
-        A response dictionary containing the urls for the raw reports.
+        A response dictionary containing the urls for the raw reports, and
+        the requested years that have no raw report under 'unavailable'.
     """
     response = {
         'company': request['company'],
@@ -102,36 +339,59 @@ def retrieve_raw_reports_response(request: dict) -> dict:
         'reports': {}
     }
 
-    raw_reports_in_db = raw_reports_from_db(request)
-
-    if not raw_reports_in_db:
-        edgar_scraper = EdgarScraper(request['company'], request['cik'])
+    for report_model in retrieve_raw_reports(request):
+        year_str = str(report_model.report_date.year)
+        if year_str in request['years']:
+            response['reports'][year_str] = report_model.parsed_json
 
-        report_file_paths = edgar_scraper.download_10k_reports()
+    response['unavailable'] = [year for year in request['years']
+                               if year not in response['reports']]
 
-        # Must be called after downloading 10-K's (i.e. the previous statement)
-        jsons_by_year = create_raw_report_jsons_from_workbooks(
-            report_file_paths
-        )
+    return response
 
-        company_queryset = Company.objects.filter(
-            name=request['company'], cik=request['cik'])
-        if not company_queryset:
-            company_model = Company.objects.create(
-                name=request['company'], cik=request['cik']
-            )
-        else:
-            company_model = company_queryset.first()
 
-        create_raw_report_models(company_model, jsons_by_year,
-                                 edgar_scraper._excel_urls['10-K'])
+def retrieve_raw_report_dataframes(request: dict) -> dict:
+    """
+    Loads the cleaned sheets of the raw reports for the requested years,
+    without going through their JSON representation when they have been
+    stored as parsed_frames.
 
-        # Raw reports are now in database.
-        raw_reports_in_db = raw_reports_from_db(request)
+    Args:
+        request: A request from the front-end with user inputted company, CIK,
+            and years of reports wanted.
 
-    for report_model in raw_reports_in_db:
+    Returns:
+        A dictionary where keys are years and values are dictionaries of
+        Pandas dataframes where key is the sheet name of the dataframe while
+        the value is the dataframe itself.
+    """
+    dataframes_by_year = {}
+    for report_model in retrieve_raw_reports(request):
         year_str = str(report_model.report_date.year)
         if year_str in request['years']:
-            response['reports'][year_str] = report_model.parsed_json
+            dataframes_by_year[year_str] = report_model.dataframes()
 
-    return response
+    return dataframes_by_year
+
+
+def retrieve_raw_reports(request: dict) -> object:
+    """
+    Gets the RawReport models of the requested years, ingesting the ones that
+    are not stored yet.
+
+    Args:
+        request: A request from the front-end with user inputted company, CIK,
+            and years of reports wanted.
+
+    Returns:
+        Django Queryset of the requested reports.
+    """
+    # Only the requested years that are not stored yet are scraped, so a
+    # partially stored company gets completed instead of truncated. Years
+    # EDGAR recently had no report for are not scraped again.
+    if years_to_ingest(request['cik'], request['years']):
+        ingest_missing_raw_reports(request['company'], request['cik'],
+                                   request['years'])
+
+    # Raw reports are now in database.
+    return raw_reports_from_db(request)
@@ -0,0 +1,142 @@
+from pathlib import Path
+import tempfile
+import os
+
+"""
+This file contains the WorkbookCache class, a persistent on-disk cache of the
+Financial_Report.xlsx workbooks downloaded from EDGAR. A filing's accession
+number identifies its content, which never changes once filed, so workbooks are
+stored under their accession number and can be shared by every request for the
+same company.
+"""
+
+
+class WorkbookCache:
+    """
+    A size capped, least recently used cache of downloaded excel workbooks.
+
+    Fields:
+        directory: Directory the workbooks are stored in.
+        max_bytes: Total size the cached workbooks may take up. Once exceeded,
+            the least recently used workbooks are deleted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def path_for(self, accession_num: str) -> Path:
+        """
+        Args:
+            accession_num: Accession number of a filing.
+
+        Returns:
+            Path the filing's workbook is stored at.
+        """
+        return self.directory / f'{accession_num}.xlsx'
+
+    def get(self, accession_num: str) -> Path:
+        """
+        Looks up a cached workbook and marks it as recently used.
+
+        Args:
+            accession_num: Accession number of a filing.
+
+        Returns:
+            Path of the cached workbook, or None if it is not cached.
+        """
+        path = self.path_for(accession_num)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def read(self, accession_num: str) -> bytes:
+        """
+        Reads a cached workbook and marks it as recently used. A path returned
+        by get can be evicted by another thread or process before the workbook
+        is opened, while the content returned here is the caller's to keep.
+
+        Args:
+            accession_num: Accession number of a filing.
+
+        Returns:
+            Content of the cached workbook, or None if it is not cached.
+        """
+        path = self.path_for(accession_num)
+        try:
+            file = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+
+        with file:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # Evicted since it was opened, the open file is still readable
+                pass
+            return file.read()
+
+    def put(self, accession_num: str, write: callable) -> Path:
+        """
+        Stores a workbook in the cache. The workbook is written to a temporary
+        file first and then renamed into place, so concurrent readers never
+        see a partially written workbook.
+
+        Args:
+            accession_num: Accession number of a filing.
+            write: A function that is given a writable binary file object and
+                writes the workbook to it.
+
+        Returns:
+            Path of the cached workbook.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path_for(accession_num)
+
+        file = tempfile.NamedTemporaryFile(
+            dir=self.directory, prefix=f'.{accession_num}.', suffix='.part',
+            delete=False)
+        try:
+            with file:
+                write(file)
+            os.replace(file.name, path)
+        except BaseException:
+            os.remove(file.name)
+            raise
+
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Path = None) -> None:
+        """
+        Deletes the least recently used workbooks until the cache fits in
+        max_bytes.
+
+        Args:
+            keep: A workbook that must not be deleted, e.g. one that was just
+                stored and is about to be read.
+
+        Returns:
+            None
+        """
+        entries = []
+        for path in self.directory.glob('*.xlsx'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,143 @@
+from report_schema.generated_report.active_report import (
+    ActiveReport,
+    MergedSheets,
+    normalize_frame,
+    duplicate_column_merges,
+    normalize_sheet_title,
+    align_sheets
+)
+from report_schema import object_conversions
+import pandas as pd
+import unittest
+
+
+class MergeDuplicateColumnsTests(unittest.TestCase):
+    def test_duplicate_column_merges(self):
+        columns = pd.Index(['Dec. 31, 2020', 'Dec. 31, 2019', 'Dec. 31, 2019 dp_1', 'Dec. 31, 2018',
+                            'Dec. 31, 2019 dp_1 dp_2', 'Dec. 31, 2018 dp_1'])
+
+        self.assertEqual([('Dec. 31, 2019', 'Dec. 31, 2019 dp_1'), ('Dec. 31, 2019', 'Dec. 31, 2019 dp_1 dp_2'),
+                          ('Dec. 31, 2018', 'Dec. 31, 2018 dp_1')], duplicate_column_merges(columns))
+
+    def test_most_recent_non_zero_value_wins(self):
+        cover = pd.DataFrame({'Dec. 31, 2020': ['10-K'], 'Dec. 31, 2020 dp_1': ['10-K']}, index=['Document Type'])
+        income = pd.DataFrame({
+            'Dec. 31, 2020': [1.0, 2.0, 0.0],
+            'Dec. 31, 2019': [3.0, 0.0, 0.0],
+            'Dec. 31, 2019 dp_1': [4.0, 5.0, 0.0],
+            'Dec. 31, 2019 dp_1 dp_2': [6.0, 7.0, 8.0],
+        }, index=['Revenues', 'Amortization', 'Other'])
+
+        # The cover page's columns are not merged
+        pd.testing.assert_frame_equal(cover, normalize_frame(cover.copy(), first=True))
+
+        merged = normalize_frame(income, first=False)
+        self.assertEqual(['Dec. 31, 2020', 'Dec. 31, 2019'], merged.columns.tolist())
+        self.assertEqual([3.0, 5.0, 8.0], merged['Dec. 31, 2019'].tolist())
+        self.assertEqual([1.0, 2.0, 0.0], merged['Dec. 31, 2020'].tolist())
+
+    def test_columns_of_strings(self):
+        equity = pd.DataFrame({
+            'Common Stock [Member]': ['', 0.0, 2.0],
+            'Common Stock [Member] dp_1': [1.0, 'n/a', 3.0],
+        }, index=['Beginning balance', 'Dividends', 'Ending balance'])
+
+        merged = normalize_frame(equity, first=False)
+
+        # Empty strings are zeroes, so the duplicate's value is taken
+        self.assertEqual([1.0, 'n/a', 2.0], merged['Common Stock [Member]'].tolist())
+        self.assertEqual(object, merged['Common Stock [Member]'].dtype)
+
+
+class AlignSheetsTests(unittest.TestCase):
+    def test_normalize_sheet_title(self):
+        self.assertEqual(normalize_sheet_title("Consolidated Statements of Stockholders' Equity (Parentheticals)"),
+                         normalize_sheet_title('CONSOLIDATED STATEMENT OF STOCKHOLDERS’ EQUITY (Parenthetical)'))
+        self.assertEqual('balance sheet', normalize_sheet_title('Consolidated Balance Sheets'))
+        self.assertEqual('statement comprehensive income loss',
+                         normalize_sheet_title('Statements of Comprehensive Income (Loss)'))
+
+    def test_sheets_are_aligned_by_title(self):
+        recent = {'Cover': 'cover 2020', 'Consolidated Balance Sheets': 'balance 2020',
+                  'Consolidated Statements of Operations': 'operations 2020'}
+        # Sheets in a different order, one of them renamed, and an extra sheet
+        older = {'Cover': 'cover 2019', 'Statements of Income': 'operations 2019',
+                 'CONSOLIDATED BALANCE SHEET': 'balance 2019', 'Segments': 'segments 2019'}
+        # A missing sheet
+        oldest = {'Cover': 'cover 2018', 'Consolidated Balance Sheets': 'balance 2018'}
+
+        aligned = align_sheets([recent, older, oldest])
+
+        self.assertEqual({
+            'Cover': ['cover 2020', 'cover 2019', 'cover 2018'],
+            'Consolidated Balance Sheets': ['balance 2020', 'balance 2019', 'balance 2018'],
+            'Consolidated Statements of Operations': ['operations 2020', 'operations 2019'],
+        }, aligned)
+
+
+class ActiveReportTests(unittest.TestCase):
+    def setUp(self):
+        cover = pd.DataFrame({'Dec. 31, 2020 - 12 Months Ended': ['10-K', 'Facebook']}, index=['Document Type', 'Entity Name'])
+        income = pd.DataFrame({'Dec. 31, 2020 - 12 Months Ended': [3.0, 2.0], 'Dec. 31, 2019 - 12 Months Ended': [4.0, 0.0]},
+                              index=['Revenues', 'Net income'])
+        older_income = pd.DataFrame({'Dec. 31, 2019 - 12 Months Ended': ['', 5.0], 'Dec. 31, 2018 - 12 Months Ended': [1.0, ' 6 ']},
+                                    index=['Net income', 'Cost of revenue'])
+        self.wbks_by_year = {
+            '2020': {'Cover': cover, 'Consolidated Statements of Income': income},
+            '2019': object_conversions.dataframes_dict_to_json_dict(
+                {'Cover': cover, 'Statements of Income': older_income}),
+        }
+
+    def test_years_are_merged_sheet_by_sheet(self):
+        report = ActiveReport(self.wbks_by_year)
+
+        self.assertEqual({'Cover': ['Document Type', 'Entity Name'],
+                          'Consolidated Statements of Income': ['Revenues', 'Net income', 'Cost of revenue']},
+                         report.label_index())
+
+        report.filter_report({'Consolidated Statements of Income': [1, 2]})
+
+        self.assertEqual({'Consolidated Statements of Income': {
+            'Dec. 31, 2020 - 12 Months Ended': {'Net income': 2.0, 'Cost of revenue': 0.0},
+            'Dec. 31, 2019 - 12 Months Ended': {'Net income': 0.0, 'Cost of revenue': 5.0},
+            'Dec. 31, 2018 - 12 Months Ended': {'Net income': 1.0, 'Cost of revenue': 6.0},
+        }}, report.return_json_report())
+
+    def test_lazy_report_matches_eager_report(self):
+        eager = ActiveReport(self.wbks_by_year)
+        lazy = ActiveReport(self.wbks_by_year, lazy=True)
+
+        self.assertEqual(eager.label_index(), lazy.label_index())
+        self.assertEqual(list(eager.dataframes_dict), list(lazy.dataframes_dict))
+        for sheet in eager.dataframes_dict:
+            pd.testing.assert_frame_equal(eager.dataframes_dict[sheet], lazy.dataframes_dict[sheet])
+        self.assertEqual(eager.json_dict, lazy.json_dict)
+
+    def test_sheets_are_merged_on_first_access(self):
+        report = ActiveReport(self.wbks_by_year, lazy=True)
+        self.assertIsInstance(report.dataframes_dict, MergedSheets)
+
+        self.assertEqual({'Cover': ['Document Type', 'Entity Name'],
+                          'Consolidated Statements of Income': ['Revenues', 'Net income', 'Cost of revenue']},
+                         report.label_index())
+        self.assertEqual({}, report.dataframes_dict._merged)
+
+        report.filter_report({'Consolidated Statements of Income': [2]})
+
+        self.assertEqual(['Consolidated Statements of Income'], list(report.dataframes_dict._merged))
+        self.assertEqual({'Consolidated Statements of Income': {
+            'Dec. 31, 2020 - 12 Months Ended': {'Cost of revenue': 0.0},
+            'Dec. 31, 2019 - 12 Months Ended': {'Cost of revenue': 5.0},
+            'Dec. 31, 2018 - 12 Months Ended': {'Cost of revenue': 6.0},
+        }}, report.return_json_report())
+
+    def test_loaded_report_decodes_filtered_sheets_only(self):
+        report = ActiveReport()
+        report.load_generated_report(ActiveReport(self.wbks_by_year).return_json_report())
+
+        report.filter_report({'Cover': [1]})
+
+        self.assertEqual(['Cover'], list(report.dataframes_dict._dataframes))
+        self.assertEqual({'Cover': {'Dec. 31, 2020 - 12 Months Ended': {'Entity Name': 'Facebook'},
+                                    'Dec. 31, 2020 - 12 Months Ended dp_1': {'Entity Name': 'Facebook'}}},
+                         report.return_json_report())
@@ -3,9 +3,17 @@ from django.test import TestCase
 from django.contrib.auth.models import User
 import json
 
-from report_schema.generated_report.models import GeneratedReport
-from report_schema.generated_report import utils
+from report_schema.generated_report.models import GeneratedReport, MergedReport, ReportCache, load_merged_report
+from report_schema.generated_report.active_report import ActiveReport
+from report_schema.generated_report import active_report, models as generated_models, utils
+from report_schema.raw_report.models import RawReport
+from report_schema.raw_report import utils as raw_rep_utils
+from report_schema import frame_storage, object_conversions
+from company_schema.models import Company
 from tests.mocks import MockedRequest
+from unittest import mock
+import pandas as pd
+import datetime
 
 class GenReportUtilTests(TestCase):
     def setUp(self):
@@ -283,7 +291,7 @@ class GenReportUtilTests(TestCase):
         self.assertTrue(report_id)
         self.assertEqual(
             {'Document And Entity Information': {'Nov. 28, 2015 - 12 Months Ended': {'Entity Registrant Name': 'BASSETT FURNITURE INDUSTRIES INC', 'Entity Central Index Key': 10329}, 'Jan. 08, 2016': {'Entity Registrant Name': None, 'Entity Central Index Key': None}, 'May. 30, 2015': {'Entity Registrant Name': None, 'Entity Central Index Key': None}}},
-            json.loads(GeneratedReport.objects.get(name='test report').json_schema)
+            json.loads(GeneratedReport.objects.get(name='test report').report_json())
         )
 
     def test_create_generated_report_2(self):
@@ -305,7 +313,7 @@ class GenReportUtilTests(TestCase):
         self.assertTrue(report_id)
         self.assertEqual(
             {'CONSOLIDATED STATEMENTS OF INCOME': {'Dec. 31, 2016 - 12 Months Ended': {'Revenue': 27638000000.0, 'Costs and expenses: - CATEGORY': 0.0, 'Cost of revenue': 3789000000.0}, 'Dec. 31, 2015 - 12 Months Ended': {'Revenue': 17928000000.0, 'Costs and expenses: - CATEGORY': 0.0, 'Cost of revenue': 2867000000.0}, 'Dec. 31, 2014 - 12 Months Ended': {'Revenue': 12466000000.0, 'Costs and expenses: - CATEGORY': 0.0, 'Cost of revenue': 2153000000.0}, 'Dec. 31, 2013 - 12 Months Ended': {'Revenue': 7872000000.0, 'Costs and expenses: - CATEGORY': 0.0, 'Cost of revenue': 1875000000.0}}},
-            json.loads(GeneratedReport.objects.get(name='test report').json_schema)
+            json.loads(GeneratedReport.objects.get(name='test report').report_json())
         )
 
 
@@ -524,3 +532,204 @@ class TestRunAnalysisTests(TestCase):
         self.assertTrue(contains_max)
         self.assertTrue(contains_mean)
 
+
+class MergedReportTests(TestCase):
+    def setUp(self):
+        # Ids are reused once a test's transaction is rolled back
+        generated_models._merged_frames.clear()
+        generated_models._materialized_reports.clear()
+        self.user = User.objects.create_user('developer1', 'developer1@example.com', 'developerpassword123')
+
+        income = pd.DataFrame({'Dec. 31, 2020': [3.0, 2.0, 1.5], 'Dec. 31, 2019': [4.0, 5.0, 0.5]},
+                              index=['Revenues', 'Net income', 'EPS (in dollars per share)'])
+        cover = pd.DataFrame({'Dec. 31, 2020': ['10-K', 'Facebook']}, index=['Document Type', 'Entity Name'])
+        self.facebook = Company.objects.create(name='Facebook', cik='1326801')
+        self.raw_report = RawReport.objects.create(
+            company=self.facebook,
+            report_date=datetime.date(2020, 12, 31),
+            parsed_json=json.dumps(object_conversions.dataframes_dict_to_json_dict({'Cover': cover, 'Income': income})),
+            excel_url='Facebook.com'
+        )
+        self.merged_report = ActiveReport({'2020': self.raw_report.dataframes()})
+        self.stored_report = utils.store_merged_report('1326801', ['2020'], [self.raw_report])
+
+    def test_identical_merged_reports_are_stored_once(self):
+        utils.store_merged_report('1326801', ['2020'], [self.raw_report])
+        self.assertEqual(1, MergedReport.objects.count())
+
+        utils.store_merged_report('1326801', ['2019', '2020'], [self.raw_report])
+        self.assertEqual(2, MergedReport.objects.count())
+
+    def test_current_merged_report_is_not_merged_again(self):
+        with mock.patch.object(raw_rep_utils, 'retrieve_raw_reports') as retrieve, \
+                mock.patch.object(frame_storage, 'loads') as loads:
+            form_data = utils.get_sheets_and_rows(self.user, 'test report', 'Facebook', '1326801', '2020')
+
+        # The form data is read from the stored row labels
+        retrieve.assert_not_called()
+        loads.assert_not_called()
+        self.assertEqual(self.merged_report.label_index(), form_data)
+
+        report = GeneratedReport.objects.get(name='test report')
+        self.assertEqual(self.stored_report.pk, report.merged_report_id)
+        self.assertEqual(self.merged_report.return_json_report(), json.loads(report.report_json()))
+
+    def test_saving_a_raw_report_deletes_outdated_merged_reports(self):
+        RawReport.objects.create(company=self.facebook, report_date=datetime.date(2019, 1, 1), excel_url='Facebook.com')
+
+        self.assertIsNone(utils.current_merged_report('1326801', ['2020']))
+        self.assertFalse(MergedReport.objects.exists())
+
+    def test_form_data_merges_no_sheet(self):
+        MergedReport.objects.all().delete()
+
+        with mock.patch.object(active_report, 'merge_sheet') as merge_sheet, \
+                mock.patch.object(frame_storage.StoredFrames, '_load') as load:
+            form_data = utils.get_sheets_and_rows(self.user, 'test report', 'Facebook', '1326801', '2020')
+
+        # The row labels are read from the raw report's header
+        merge_sheet.assert_not_called()
+        load.assert_not_called()
+        self.assertEqual(self.merged_report.label_index(), form_data)
+
+        merged_report = MergedReport.objects.get()
+        self.assertIsNone(merged_report.parsed_frames)
+        self.assertIsNone(merged_report.parsed_json)
+        self.assertEqual(str(self.raw_report.pk), merged_report.raw_report_ids)
+        self.assertEqual(self.merged_report.return_json_report(),
+                         json.loads(GeneratedReport.objects.get(name='test report').report_json()))
+
+    def test_only_selected_sheets_are_merged(self):
+        GeneratedReport.objects.create(name='test report', created_by=self.user, merged_report=self.stored_report)
+        utils.create_generated_report(self.user, 'test report', json.dumps({'Income': [1]}), 'json')
+
+        with mock.patch.object(active_report, 'merge_sheet', wraps=active_report.merge_sheet) as merge_sheet:
+            report_json = GeneratedReport.objects.get(name='test report').report_json()
+
+        merge_sheet.assert_called_once()
+        expected = ActiveReport()
+        expected.load_generated_report(self.merged_report.return_json_report())
+        expected.filter_report({'Income': [1]})
+        self.assertEqual(expected.return_json_report(), json.loads(report_json))
+
+    def test_merged_sheets_are_merged_once(self):
+        with mock.patch.object(active_report, 'merge_sheet', wraps=active_report.merge_sheet) as merge_sheet:
+            dataframes_dict = load_merged_report(self.stored_report.pk)
+            self.assertIs(dataframes_dict['Income'], load_merged_report(self.stored_report.pk, ['Income'])['Income'])
+
+        self.assertEqual(2, merge_sheet.call_count)
+        self.assertEqual(self.merged_report.return_json_report(),
+                         object_conversions.dataframes_dict_to_json_dict(dataframes_dict))
+
+    def test_merged_sheets_are_stored_before_a_raw_report_changes(self):
+        GeneratedReport.objects.create(name='test report', created_by=self.user, merged_report=self.stored_report)
+        utils.create_generated_report(self.user, 'test report', json.dumps({'Cover': [1], 'Income': [2, 0]}), 'json')
+        report_json = GeneratedReport.objects.get(name='test report').report_json()
+
+        self.raw_report.parsed_json = json.dumps({'Cover': {'Dec. 31, 2021': {'Document Type': '10-K'}}})
+        self.raw_report.save()
+        generated_models._merged_frames.clear()
+        generated_models._materialized_reports.clear()
+
+        self.stored_report.refresh_from_db()
+        self.assertEqual(self.merged_report.return_json_report(),
+                         object_conversions.dataframes_dict_to_json_dict(self.stored_report.dataframes()))
+        self.assertEqual(report_json, GeneratedReport.objects.get(name='test report').report_json())
+
+    def test_report_cache_is_capped_by_size(self):
+        cache = ReportCache(max_bytes=10, sizeof=len)
+        cache.put(1, '{"a": 1}')
+        cache.put(2, '{}')
+        cache.get(1)
+        cache.put(3, '{}')
+
+        self.assertEqual('{"a": 1}', cache.get(1))
+        self.assertIsNone(cache.get(2))
+        self.assertEqual('{}', cache.get(3))
+
+        cache.put(4, '{"abcdefgh": 1}')
+        self.assertIsNone(cache.get(4))
+
+
+class TestRowSelectionTests(TestCase):
+    def setUp(self):
+        # Ids are reused once a test's transaction is rolled back
+        generated_models._merged_frames.clear()
+        generated_models._materialized_reports.clear()
+        self.user = User.objects.create_user('developer1', 'developer1@example.com', 'developerpassword123')
+
+        income = pd.DataFrame({'Dec. 31, 2020': [3.0, 2.0, 1.5], 'Dec. 31, 2019': [4.0, 5.0, 0.5]},
+                              index=['Revenues', 'Net income', 'EPS (in dollars per share)'])
+        cover = pd.DataFrame({'Dec. 31, 2020': ['10-K', 'Facebook']}, index=['Document Type', 'Entity Name'])
+        self.facebook = Company.objects.create(name='Facebook', cik='1326801')
+        self.raw_report = RawReport.objects.create(
+            company=self.facebook,
+            report_date=datetime.date(2020, 12, 31),
+            parsed_json=json.dumps(object_conversions.dataframes_dict_to_json_dict({'Cover': cover, 'Income': income})),
+            excel_url='Facebook.com'
+        )
+        self.merged_report = ActiveReport({'2020': self.raw_report.dataframes()})
+
+        GeneratedReport.objects.create(
+            name='test report',
+            created_by=self.user,
+            merged_report=utils.store_merged_report('1326801', ['2020'], [self.raw_report])
+        )
+
+    def filtered_json(self, *instructions):
+        report = ActiveReport()
+        report.load_generated_report(json.loads(json.dumps(self.merged_report.return_json_report())))
+        for instruction in instructions:
+            report.filter_report(instruction)
+            report.load_generated_report(report.return_json_report())
+
+        return report.return_json_report()
+
+    def test_create_generated_report_stores_the_selection(self):
+        utils.create_generated_report(self.user, 'test report', json.dumps({'Income': [2, '0']}), 'json')
+
+        report = GeneratedReport.objects.get(name='test report')
+        self.assertIsNone(report.json_schema)
+        self.assertEqual({'Income': [2, 0]}, json.loads(report.row_selection))
+        self.assertEqual(self.filtered_json({'Income': [2, 0]}), json.loads(report.report_json()))
+
+    def test_filtering_again_selects_from_the_selection(self):
+        utils.create_generated_report(self.user, 'test report', json.dumps({'Income': [2, 0], 'Cover': [1]}), 'json')
+        utils.create_generated_report(self.user, 'test report', json.dumps({'Income': [1]}), 'json')
+
+        report = GeneratedReport.objects.get(name='test report')
+        self.assertEqual({'Income': [0]}, json.loads(report.row_selection))
+        self.assertEqual(self.filtered_json({'Income': [2, 0], 'Cover': [1]}, {'Income': [1]}),
+                         json.loads(report.report_json()))
+
+    def test_invalid_selection_is_not_stored(self):
+        with self.assertRaises(KeyError):
+            utils.create_generated_report(self.user, 'test report', json.dumps({'Balance': [0]}), 'json')
+        with self.assertRaises(IndexError):
+            utils.create_generated_report(self.user, 'test report', json.dumps({'Income': [3]}), 'json')
+
+        self.assertIsNone(GeneratedReport.objects.get(name='test report').row_selection)
+
+    def test_analysis_runs_on_the_materialized_report(self):
+        utils.create_generated_report(self.user, 'test report', json.dumps({'Cover': [0], 'Income': [0, 1]}), 'json')
+        report = GeneratedReport.objects.get(name='test report')
+
+        utils.run_analysis(self.user, report.pk)
+
+        report.refresh_from_db()
+        self.assertTrue(utils.analysis_already_ran(json.loads(report.json_schema)))
+        self.assertEqual(report.json_schema, report.report_json())
+
+    def test_outdated_merged_reports_are_deleted_once_unused(self):
+        used = MergedReport.objects.get()
+        unused = utils.store_merged_report('1326801', ['2019', '2020'], [self.raw_report])
+
+        RawReport.objects.create(company=self.facebook, report_date=datetime.date(2019, 1, 1), excel_url='Facebook.com')
+
+        # Generated reports still select rows from the outdated merged report
+        self.assertIsNone(utils.current_merged_report('1326801', ['2020']))
+        self.assertEqual([used.pk], list(MergedReport.objects.values_list('pk', flat=True)))
+        self.assertFalse(MergedReport.objects.filter(pk=unused.pk).exists())
+
+        GeneratedReport.objects.get(name='test report').delete()
+        self.assertFalse(MergedReport.objects.exists())
@@ -4,4 +4,21 @@ class MockedRequest():
     """
     def __init__(self, user: str, data: dict):
         self.user = user
-        self.data = data
\ No newline at end of file
+        self.data = data
+
+class MockedResponse():
+    """
+    Stands in for a requests response when testing offline.
+    """
+    def __init__(self, content: bytes = b'', status_code: int = 200, headers: dict = None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.ok = status_code < 400
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
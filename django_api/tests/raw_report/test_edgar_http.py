@@ -0,0 +1,83 @@
+from report_schema.raw_report import edgar_http
+from tests.mocks import MockedResponse
+from unittest import mock
+import unittest
+import requests
+import time
+
+
+class EdgarHttpTestCase(unittest.TestCase):
+
+    def get(self, responses):
+        session = mock.Mock()
+        session.get.side_effect = responses
+        with mock.patch.object(edgar_http, 'get_session', return_value=session), \
+                mock.patch.object(edgar_http, 'RATE_LIMITER'), \
+                mock.patch.object(edgar_http.time, 'sleep') as sleep:
+            page = edgar_http.get('https://www.sec.gov', timeout=10)
+        return page, session, sleep
+
+    def test_get_session_is_shared(self):
+        self.assertIs(edgar_http.get_session(), edgar_http.get_session())
+
+    def test_get_honors_retry_after(self):
+        page, session, sleep = self.get([
+            MockedResponse(status_code=429, headers={'Retry-After': '3'}),
+            MockedResponse(status_code=200)
+        ])
+
+        self.assertTrue(page.ok)
+        self.assertEqual(session.get.call_count, 2)
+        sleep.assert_called_once_with(3.0)
+
+    def test_get_backs_off_exponentially(self):
+        page, session, sleep = self.get([MockedResponse(status_code=500)] * 3 + [MockedResponse(status_code=200)])
+
+        self.assertTrue(page.ok)
+        delays = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(len(delays), 3)
+        for attempt, delay in enumerate(delays):
+            upper = edgar_http.BACKOFF_BASE * 2 ** attempt
+            self.assertTrue(upper / 2 <= delay <= upper)
+
+    def test_get_gives_up_after_max_retries(self):
+        page, session, _ = self.get([MockedResponse(status_code=503)] * (edgar_http.MAX_RETRIES + 1))
+
+        self.assertFalse(page.ok)
+        self.assertEqual(session.get.call_count, edgar_http.MAX_RETRIES + 1)
+
+    def test_get_retries_connection_errors(self):
+        page, session, sleep = self.get([requests.ConnectionError('Connection reset by peer'),
+                                         requests.ReadTimeout(), MockedResponse(status_code=200)])
+
+        self.assertTrue(page.ok)
+        self.assertEqual(session.get.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_get_raises_connection_error_after_max_retries(self):
+        with self.assertRaises(requests.ConnectionError):
+            self.get([requests.ConnectionError()] * (edgar_http.MAX_RETRIES + 1))
+
+    def test_get_does_not_retry_client_errors(self):
+        page, session, sleep = self.get([MockedResponse(status_code=404)])
+
+        self.assertEqual(page.status_code, 404)
+        self.assertEqual(session.get.call_count, 1)
+        sleep.assert_not_called()
+
+    def test_retry_after_http_date(self):
+        response = MockedResponse(status_code=503, headers={'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        self.assertEqual(edgar_http.retry_after_seconds(response), 0.0)
+
+        response = MockedResponse(status_code=503, headers={'Retry-After': 'soon'})
+        self.assertIsNone(edgar_http.retry_after_seconds(response))
+
+    def test_token_bucket_limits_rate(self):
+        bucket = edgar_http.TokenBucket(rate=50, capacity=1)
+
+        start = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+
+        # The first token is free, the other five are refilled at 50 per second.
+        self.assertGreaterEqual(time.monotonic() - start, 5 / 50 * 0.9)
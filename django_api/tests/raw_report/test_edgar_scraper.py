@@ -1,7 +1,13 @@
 from report_schema.raw_report.EdgarScraper import EdgarScraper
+from report_schema.raw_report import EdgarScraper as edgar_scraper
+from tests.mocks import MockedResponse
+from unittest import mock
+from io import BytesIO
 from lxml import html
+import threading
 import unittest
 import requests
+import time
 import os
 
 
@@ -21,6 +27,42 @@ GET_FORMS_ONLY_10K = {'10-K': {
     '2019': ['https://www.sec.gov/Archives/edgar/data/1341439/000156459019023119/Financial_Report.xlsx'],
     '2020': ['https://www.sec.gov/Archives/edgar/data/1341439/000156459020030125/Financial_Report.xlsx']}}
 
+# Trimmed down copy of Oracle's 10-K filing page. The 10-K/A has no
+# interactive data and therefore no excel report.
+ORACLE_FILING_INDEX = b"""
+<html><body><div id="seriesDiv">
+<table class="tableFile2" summary="Results">
+<tr><th>Filings</th><th>Format</th><th>Description</th><th>Filing Date</th><th>File/Film Number</th></tr>
+<tr>
+<td nowrap="nowrap">10-K</td>
+<td nowrap="nowrap"><a href="/Archives/edgar/data/1341439/000156459020030125/0001564590-20-030125-index.htm"
+ id="documentsbutton">&nbsp;Documents</a>&nbsp; <a
+ href="/cgi-bin/viewer?action=view&amp;cik=1341439&amp;accession_number=0001564590-20-030125&amp;xbrl_type=v"
+ id="interactiveDataBtn">&nbsp;Interactive Data</a></td>
+<td class="small">Annual report</td><td>2020-06-22</td><td>001-35992</td>
+</tr>
+<tr>
+<td nowrap="nowrap">10-K/A</td>
+<td nowrap="nowrap"><a href="/Archives/edgar/data/1341439/000119312519250000/0001193125-19-250000-index.htm"
+ id="documentsbutton">&nbsp;Documents</a></td>
+<td class="small">Amended annual report</td><td>2019-09-20</td><td>001-35992</td>
+</tr>
+<tr>
+<td nowrap="nowrap">10-K</td>
+<td nowrap="nowrap"><a href="/Archives/edgar/data/1341439/000156459019023119/0001564590-19-023119-index.htm"
+ id="documentsbutton">&nbsp;Documents</a>&nbsp; <a
+ href="/cgi-bin/viewer?action=view&amp;cik=1341439&amp;accession_number=0001564590-19-023119&amp;xbrl_type=v"
+ id="interactiveDataBtn">&nbsp;Interactive Data</a></td>
+<td class="small">Annual report</td><td>2019-06-21</td><td>001-35992</td>
+</tr>
+</table>
+</div></body></html>
+"""
+
+ORACLE_FILING_INDEX_EXCEL = {
+    '2020': ['https://www.sec.gov/Archives/edgar/data/1341439/000156459020030125/Financial_Report.xlsx'],
+    '2019': ['https://www.sec.gov/Archives/edgar/data/1341439/000156459019023119/Financial_Report.xlsx']}
+
 
 class EdgarScraperTestCase(unittest.TestCase):
 
@@ -106,3 +148,107 @@ class EdgarScraperTestCase(unittest.TestCase):
         self.assertEqual(result, None)
         result = company.get_10k_year(2018)
         self.assertEqual(result, None)
+
+
+class ConcurrentDownloadTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.company = EdgarScraper("Oracle Corp", "0001341439")
+        self.company._excel_urls = GET_FORMS_ONLY_10K
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def mocked_get(self, url, stream=False):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight -= 1
+        return MockedResponse(url.encode())
+
+    def download(self, max_workers, in_memory=False):
+        with mock.patch.object(EdgarScraper, 'get_company_excel_reports_from'), \
+                mock.patch.object(EdgarScraper, '_get', side_effect=self.mocked_get):
+            return self.company.download_10k_reports(max_workers=max_workers, in_memory=in_memory)
+
+    def test_download_10k_reports_concurrently(self):
+        file_paths = self.download(max_workers=3)
+
+        self.assertEqual(list(file_paths.keys()), ['2016', '2017', '2018', '2019', '2020'])
+        self.assertTrue(1 < self.max_in_flight <= 3)
+
+        for year, file_path in file_paths.items():
+            with open(file_path, 'rb') as file:
+                self.assertEqual(file.read(), ORACLE_10K_EXCEL[year][0].encode())
+            os.remove(file_path)
+
+    def test_download_10k_reports_serially(self):
+        file_paths = self.download(max_workers=1)
+
+        self.assertEqual(len(file_paths), 5)
+        self.assertEqual(self.max_in_flight, 1)
+
+        for file_path in file_paths.values():
+            os.remove(file_path)
+
+    def test_download_10k_reports_in_memory(self):
+        with mock.patch.object(edgar_scraper, 'DOWNLOAD_CHUNK_SIZE', 8):
+            buffers = self.download(max_workers=2, in_memory=True)
+
+        self.assertEqual(len(buffers), 5)
+        for year, buffer in buffers.items():
+            self.assertIsInstance(buffer, BytesIO)
+            self.assertEqual(buffer.read(), ORACLE_10K_EXCEL[year][0].encode())
+
+
+class FilingIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        edgar_scraper.FILING_INDEX_CACHE.clear()
+
+    def tearDown(self):
+        edgar_scraper.FILING_INDEX_CACHE.clear()
+
+    def test_parse_filing_index(self):
+        filings = edgar_scraper.parse_filing_index(html.fromstring(ORACLE_FILING_INDEX))
+
+        self.assertEqual(filings, [
+            ('0001564590-20-030125',
+             'https://www.sec.gov/Archives/edgar/data/1341439/000156459020030125/0001564590-20-030125-index.htm',
+             'https://www.sec.gov/cgi-bin/viewer?action=view&cik=1341439&accession_number=0001564590-20-030125'
+             '&xbrl_type=v'),
+            ('0001564590-19-023119',
+             'https://www.sec.gov/Archives/edgar/data/1341439/000156459019023119/0001564590-19-023119-index.htm',
+             'https://www.sec.gov/cgi-bin/viewer?action=view&cik=1341439&accession_number=0001564590-19-023119'
+             '&xbrl_type=v')
+        ])
+
+    def test_filing_index_is_revalidated(self):
+        responses = [
+            MockedResponse(ORACLE_FILING_INDEX, headers={'ETag': '"v1"', 'Last-Modified': 'Mon, 22 Jun 2020'}),
+            MockedResponse(b'', status_code=304)
+        ]
+
+        company = EdgarScraper("Oracle Corp", "0001341439")
+        with mock.patch.object(EdgarScraper, '_get', side_effect=responses) as get:
+            first = EdgarScraper("Oracle Corp", "0001341439").get_company_excel_reports_from("10-K")
+            second = company.get_company_excel_reports_from("10-K")
+
+        self.assertEqual(first, ORACLE_FILING_INDEX_EXCEL)
+        self.assertEqual(second, ORACLE_FILING_INDEX_EXCEL)
+        self.assertEqual(company._accession_numbers, {'2020': '0001564590-20-030125', '2019': '0001564590-19-023119'})
+
+        self.assertEqual(get.call_args_list[0].kwargs['headers'], {})
+        self.assertEqual(get.call_args_list[1].kwargs['headers'], {
+            'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon, 22 Jun 2020'})
+
+    def test_filing_index_without_validators_is_not_cached(self):
+        responses = [MockedResponse(ORACLE_FILING_INDEX), MockedResponse(ORACLE_FILING_INDEX)]
+
+        with mock.patch.object(EdgarScraper, '_get', side_effect=responses) as get:
+            EdgarScraper("Oracle Corp", "0001341439").get_company_excel_reports_from("10-K")
+            EdgarScraper("Oracle Corp", "0001341439").get_company_excel_reports_from("10-K")
+
+        self.assertEqual(get.call_args_list[1].kwargs['headers'], {})
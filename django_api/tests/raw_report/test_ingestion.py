@@ -0,0 +1,149 @@
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from unittest import mock
+import datetime
+import json
+
+from company_schema.models import Company
+from report_schema.raw_report.models import RawReport, IngestionJob
+from report_schema.raw_report.EdgarScraper import EdgarScraper
+from report_schema.raw_report import ingestion, utils
+
+
+def mocked_ingest(company, cik, years):
+    company_model, _ = Company.objects.get_or_create(name=company, cik=cik)
+    for year in years:
+        RawReport.objects.create(company=company_model, report_date=datetime.date(int(year), 1, 1),
+                                 parsed_json='{}', excel_url='Google.com')
+    return years
+
+
+class IngestionJobTests(TestCase):
+    def setUp(self):
+        google = Company.objects.create(name='Google', cik='123456')
+        RawReport.objects.create(company=google, report_date=datetime.date(2016, 1, 1),
+                                 parsed_json='{}', excel_url='Google.com')
+
+    def test_enqueue_reuses_active_job(self):
+        job_1 = ingestion.enqueue_ingestion('Google', '123456', ['2018', '2017'])
+        job_2 = ingestion.enqueue_ingestion('Google', '123456', ['2017', '2018'])
+
+        self.assertEqual(job_1.pk, job_2.pk)
+        self.assertEqual(job_1.years, '2017,2018')
+
+        job_1.status = IngestionJob.DONE
+        job_1.save()
+
+        job_3 = ingestion.enqueue_ingestion('Google', '123456', ['2017', '2018'])
+        self.assertNotEqual(job_1.pk, job_3.pk)
+
+    def test_enqueue_shares_job_queued_concurrently(self):
+        concurrent_job = IngestionJob.objects.create(company='Google', cik='123456', years='2017')
+
+        # The concurrent job is queued after this request looked for an active one
+        with mock.patch.object(QuerySet, 'first', autospec=True, side_effect=[None, concurrent_job]):
+            job = ingestion.enqueue_ingestion('Google', '123456', ['2017'])
+
+        self.assertEqual(job.pk, concurrent_job.pk)
+        self.assertEqual(IngestionJob.objects.count(), 1)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            IngestionJob.objects.create(company='Google', cik='123456', years='2017', status=IngestionJob.RUNNING)
+
+    def test_claim_next_job(self):
+        job_1 = ingestion.enqueue_ingestion('Google', '123456', ['2017'])
+        job_2 = ingestion.enqueue_ingestion('Google', '123456', ['2018'])
+
+        self.assertEqual(ingestion.claim_next_job().pk, job_1.pk)
+        self.assertEqual(ingestion.claim_next_job().pk, job_2.pk)
+        self.assertIsNone(ingestion.claim_next_job())
+        self.assertEqual(IngestionJob.objects.filter(status=IngestionJob.RUNNING).count(), 2)
+
+    def test_requeue_stale_jobs(self):
+        job = ingestion.enqueue_ingestion('Google', '123456', ['2017'])
+        IngestionJob.objects.filter(pk=job.pk).update(
+            status=IngestionJob.RUNNING, updated_at=timezone.now() - ingestion.STALE_JOB_TIMEOUT * 2)
+
+        self.assertEqual(ingestion.requeue_stale_jobs(), 1)
+        self.assertEqual(ingestion.claim_next_job().pk, job.pk)
+
+    def test_run_worker(self):
+        ingestion.enqueue_ingestion('Google', '123456', ['2016', '2017'])
+        failing_job = ingestion.enqueue_ingestion('Oracle Corp', '0001341439', ['2017'])
+
+        def ingest(company, cik, years):
+            if cik == '0001341439':
+                raise ValueError('no 10-K found')
+            return mocked_ingest(company, cik, years)
+
+        with mock.patch.object(utils, 'ingest_raw_reports', side_effect=ingest) as ingest_mock:
+            self.assertEqual(ingestion.run_worker(once=True), 2)
+
+        # 2016 was already stored
+        ingest_mock.assert_any_call('Google', '123456', ['2017'])
+        self.assertEqual(utils.missing_report_years('123456', ['2016', '2017']), [])
+
+        failing_job.refresh_from_db()
+        self.assertEqual(failing_job.status, IngestionJob.FAILED)
+        self.assertEqual(failing_job.error, 'ValueError: no 10-K found')
+
+    def test_get_raw_reports_endpoint_queues_missing_years(self):
+        client = Client()
+        payload = {'company': 'Google', 'cik': '123456', 'years': ['2016', '2017']}
+
+        response = client.get(reverse('raw-reports-get-raw-reports'), data=payload)
+        self.assertEqual(response.status_code, 202)
+        job_id = json.loads(response.data)['job_id']
+
+        response = client.get(reverse('raw-reports-ingestion-status'), data={'job_id': job_id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], IngestionJob.QUEUED)
+        self.assertEqual(response.data['years'], ['2017'])
+
+        with mock.patch.object(utils, 'ingest_raw_reports', side_effect=mocked_ingest):
+            ingestion.run_worker(once=True)
+
+        response = client.get(reverse('raw-reports-ingestion-status'), data={'job_id': job_id})
+        self.assertEqual(response.data['status'], IngestionJob.DONE)
+
+        response = client.get(reverse('raw-reports-get-raw-reports'), data=payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(json.loads(response.data)['reports']), ['2016', '2017'])
+
+    def test_get_raw_reports_endpoint_returns_stored_years_once_edgar_lacks_the_others(self):
+        client = Client()
+        payload = {'company': 'Google', 'cik': '123456', 'years': ['2016', '2030']}
+
+        response = client.get(reverse('raw-reports-get-raw-reports'), data=payload)
+        self.assertEqual(response.status_code, 202)
+
+        def download_10k_reports(scraper, in_memory, years):
+            # EDGAR does not list 2030
+            scraper._filings = []
+            return {}
+
+        with mock.patch.object(EdgarScraper, 'download_10k_reports', autospec=True,
+                               side_effect=download_10k_reports):
+            ingestion.run_worker(once=True)
+
+        response = client.get(reverse('raw-reports-get-raw-reports'), data=payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(json.loads(response.data)['reports']), ['2016'])
+        self.assertEqual(json.loads(response.data)['unavailable'], ['2030'])
+
+        # The year is looked up on EDGAR again once the record expires
+        with self.settings(UNAVAILABLE_REPORT_TTL=0):
+            response = client.get(reverse('raw-reports-get-raw-reports'), data=payload)
+        self.assertEqual(response.status_code, 202)
+
+    def test_ingestion_status_endpoint_unknown_job(self):
+        client = Client()
+
+        response = client.get(reverse('raw-reports-ingestion-status'), data={'job_id': '99'})
+        self.assertEqual(response.status_code, 404)
+
+        response = client.get(reverse('raw-reports-ingestion-status'))
+        self.assertEqual(response.status_code, 400)
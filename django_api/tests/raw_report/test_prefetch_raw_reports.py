@@ -0,0 +1,110 @@
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from unittest import mock
+from io import StringIO
+import tempfile
+import datetime
+import os
+
+from company_schema.models import Company
+from report_schema.raw_report.models import RawReport
+from report_schema.raw_report import utils
+
+
+class PrefetchRawReportsTests(TestCase):
+    def setUp(self):
+        google = Company.objects.create(name='Google', cik='123456')
+        for year in (2016, 2017):
+            RawReport.objects.create(company=google, report_date=datetime.date(year, 1, 1), excel_url='Google.com')
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.cik_file = os.path.join(self.directory.name, 'ciks.txt')
+        with open(self.cik_file, 'w') as file:
+            file.write('# S&P 500\n123456\n0001341439,Oracle Corp\n\n')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def prefetch(self, *args, ingest=lambda name, cik, years: years):
+        out = StringIO()
+        with mock.patch.object(utils, 'ingest_missing_raw_reports', side_effect=ingest) as ingest:
+            call_command('prefetch_raw_reports', *args, stdout=out, stderr=StringIO())
+        return ingest, out.getvalue()
+
+    def test_prefetch_only_missing_years(self):
+        ingest, out = self.prefetch(self.cik_file, '--years', '2016,2017,2018', '--workers', '2')
+
+        ingest.assert_has_calls([
+            mock.call('Google', '123456', ['2018']),
+            mock.call('Oracle Corp', '0001341439', ['2016', '2017', '2018'])
+        ], any_order=True)
+        self.assertEqual(ingest.call_count, 2)
+        self.assertIn('Prefetched 2 of 2 companies, 0 failed.', out)
+
+    def test_prefetch_skips_stored_companies(self):
+        ingest, out = self.prefetch(self.cik_file, '--years', '2016,2017')
+
+        ingest.assert_called_once_with('Oracle Corp', '0001341439', ['2016', '2017'])
+        self.assertIn('123456: all available years already stored', out)
+
+    def test_prefetch_resumes(self):
+        resume_file = os.path.join(self.directory.name, 'done.txt')
+        with open(resume_file, 'w') as file:
+            file.write('0001341439\n')
+
+        ingest, out = self.prefetch(self.cik_file, '--years', '2016,2017,2018', '--resume-file', resume_file)
+
+        ingest.assert_called_once_with('Google', '123456', ['2018'])
+        with open(resume_file) as file:
+            self.assertEqual(file.read().split(), ['0001341439', '123456'])
+
+    def test_prefetch_reports_years_that_were_not_stored(self):
+        resume_file = os.path.join(self.directory.name, 'done.txt')
+
+        unavailable = set()
+
+        def ingest(name, cik, years):
+            if cik == '123456':
+                unavailable.add((cik, '2018'))
+                return []
+            return ['2016']
+
+        with mock.patch.object(utils, 'unavailable_report_years',
+                               side_effect=lambda cik, years: [year for year in years if (cik, year) in unavailable]):
+            _, out = self.prefetch(self.cik_file, '--years', '2016,2017,2018', '--resume-file', resume_file,
+                                   ingest=ingest)
+
+        self.assertIn('123456 Google: stored nothing, not on EDGAR 2018', out)
+        self.assertIn('0001341439 Oracle Corp: stored 2016, failed to download 2017, 2018', out)
+        # Oracle's missing years are tried again when resuming
+        with open(resume_file) as file:
+            self.assertEqual(file.read().split(), ['123456'])
+
+    def test_prefetch_skips_unavailable_years(self):
+        utils.record_unavailable_years('123456', ['2018'])
+
+        ingest, out = self.prefetch(self.cik_file, '--years', '2016,2017,2018')
+
+        self.assertIn('123456: all available years already stored', out)
+        ingest.assert_called_once_with('Oracle Corp', '0001341439', ['2016', '2017', '2018'])
+
+    def test_prefetch_skips_unnamed_unknown_company(self):
+        with open(self.cik_file, 'w') as file:
+            file.write('123456\n0001341439\n')
+
+        ingest, out = self.prefetch(self.cik_file, '--years', '2016,2017,2018')
+
+        ingest.assert_called_once_with('Google', '123456', ['2018'])
+        self.assertFalse(Company.objects.filter(cik='0001341439').exists())
+        self.assertIn('Prefetched 1 of 2 companies, 0 failed, 1 skipped.', out)
+
+    def test_prefetch_rejects_invalid_cik(self):
+        with open(self.cik_file, 'w') as file:
+            file.write('not a cik\n')
+
+        with self.assertRaises(CommandError):
+            self.prefetch(self.cik_file)
+
+    def test_missing_report_years(self):
+        self.assertEqual(utils.missing_report_years('123456', ['2016', '2018', '2017', '2019']), ['2018', '2019'])
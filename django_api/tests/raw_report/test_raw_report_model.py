@@ -211,6 +211,50 @@ class RawReportTests(TestCase):
         self.assertEqual(response_1.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response_2.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_put_parsed_json_updates_dataframes(self):
+        client = Client()
+        google = Company.objects.create(name='Google', cik='123456')
+        report = RawReport.objects.create(
+            company=google, report_date='2020-05-22', excel_url='Http://Google.com',
+            parsed_json=json.dumps({'Sheet': {'2020': {'Revenue': 1.0}}}))
+        self.assertIsNotNone(report.parsed_frames)
+
+        payload = {
+            'company': 'Google',
+            'report_date': '2020-05-22',
+            'excel_url': 'https://www.google.com/',
+            'parsed_json': json.dumps({'Sheet': {'2020': {'Revenue': 2.0}}})
+        }
+
+        response = client.put(
+            reverse('raw-reports-detail', kwargs={'pk': report.pk}),
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        dataframes = RawReport.objects.get(pk=report.pk).dataframes()
+        self.assertEqual(['Sheet'], list(dataframes))
+        self.assertEqual([2.0], list(dataframes['Sheet'].loc['Revenue']))
+
+    def test_patch_parsed_json_updates_dataframes(self):
+        client = Client()
+        google = Company.objects.create(name='Google', cik='123456')
+        report = RawReport.objects.create(
+            company=google, report_date='2020-05-22', excel_url='Http://Google.com',
+            parsed_json=json.dumps({'Sheet': {'2020': {'Revenue': 1.0}}}))
+
+        response = client.patch(
+            reverse('raw-reports-detail', kwargs={'pk': report.pk}),
+            data=json.dumps({'parsed_json': json.dumps({'Other': {'2021': {'Assets': 3.0}}})}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        dataframes = RawReport.objects.get(pk=report.pk).dataframes()
+        self.assertEqual(['Other'], list(dataframes))
+        self.assertEqual([3.0], list(dataframes['Other'].loc['Assets']))
+
     def test_delete_existing_raw_report(self):
         client = Client()
         google = Company.objects.create(name='Google', cik='123456')
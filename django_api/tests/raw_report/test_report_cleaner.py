@@ -1,7 +1,16 @@
 from report_schema.raw_report.report_cleaner.excelToPandasToJson import (
     ConvertCleanSave
 )
+from report_schema.raw_report.report_cleaner.cleaner import (
+    normalize_labels,
+    label_suffix_pattern,
+    unmerge_header_cells,
+    normalize_data
+)
 from os.path import dirname, realpath
+from io import BytesIO
+import openpyxl as pyxl
+import pandas as pd
 import unittest
 import sys
 
@@ -34,3 +43,57 @@ class TestReportCleaner(unittest.TestCase):
         # 97 sheets in OG 10-k-20 report
         test_object = ConvertCleanSave(file_path)
         self.assertEqual(8, len(test_object.cleaned_excel_report.sheetnames))
+
+    def test_CleanedExcelReport_from_buffer(self):
+        with open(file_path, 'rb') as file:
+            buffer = BytesIO(file.read())
+
+        from_buffer = ConvertCleanSave(buffer)
+        from_file = ConvertCleanSave(file_path)
+        self.assertEqual(from_buffer.convert_to_json(), from_file.convert_to_json())
+
+    def test_CleanedExcelReport_original_is_loaded_lazily(self):
+        with open(file_path, 'rb') as file:
+            buffer = BytesIO(file.read())
+
+        test_object = ConvertCleanSave(buffer)
+        self.assertIsNone(test_object._excel_report)
+        # the buffer has been read to the end by cleaning, it is rewound for the original
+        self.assertEqual(97, len(test_object.excel_report.sheetnames))
+
+    def test_normalize_labels(self):
+        labels = pd.Series(['Net income (loss)', 'Other (gains) losses', 'Tax (benefit) (expense)',
+                            'Losses (in shares)', None])
+        self.assertEqual(['Net income', 'Other losses', 'Tax', 'Losses (in shares)', 'None'],
+                         normalize_labels(labels).tolist())
+
+        only_loss = label_suffix_pattern(('loss',))
+        self.assertEqual(['Net income', 'Other (gains) losses'],
+                         normalize_labels(labels[:2], only_loss).tolist())
+
+    def test_unmerge_header_cells(self):
+        sheet = pyxl.Workbook().active
+        sheet.append(['Income Statement - USD ($) $ in Millions', 'Twelve Months Ended', None, '3 Months Ended'])
+        sheet.append([None, 'Dec. 31, 2020', 'Dec. 31, 2019', 'Dec. 31, 2020'])
+        sheet.merge_cells('A1:A2')
+        sheet.merge_cells('B1:C1')
+
+        unmerge_header_cells(sheet)
+
+        self.assertFalse(sheet.merged_cells.ranges)
+        self.assertEqual(['Income Statement - USD ($) $ in Millions', None, None, '3 Months Ended'],
+                         [cell.value for cell in sheet[1]])
+        self.assertEqual([None, 'Dec. 31, 2020 - Twelve Months Ended', 'Dec. 31, 2019 - Twelve Months Ended',
+                          'Dec. 31, 2020'], [cell.value for cell in sheet[2]])
+
+    def test_normalize_data(self):
+        cover = pd.DataFrame({'Dec. 31, 2020': ['10-K', 2.5]}, index=['Document Type', 'Entity Public Float'])
+        income = pd.DataFrame({'Dec. 31, 2020': [3.0, 2, 1.5], 'Dec. 31, 2019': [4, 5, 0.5]},
+                              index=['Revenues', 'Shares outstanding (in shares)', 'EPS (in dollars per share)'])
+        notes = {'Cover': 'USD ($) $ in Billions', 'Income': 'USD ($) shares in Millions, $ in Millions'}
+
+        normalized = normalize_data({'Cover': cover, 'Income': income}, notes)
+
+        self.assertEqual(['10-K', 2500000000.0], normalized['Cover']['Dec. 31, 2020'].tolist())
+        self.assertEqual([3000000.0, 2.0, 1.5], normalized['Income']['Dec. 31, 2020'].tolist())
+        self.assertEqual([4000000.0, 5.0, 0.5], normalized['Income']['Dec. 31, 2019'].tolist())
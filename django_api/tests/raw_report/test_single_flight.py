@@ -0,0 +1,78 @@
+from django.test import SimpleTestCase
+from unittest import mock
+import threading
+import time
+
+from report_schema.raw_report import single_flight, utils
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_overlapping_years_are_serialized(self):
+        holding = threading.Event()
+        release = threading.Event()
+        acquired = []
+
+        def hold():
+            with single_flight.report_locks('123456', ['2018', '2017']):
+                holding.set()
+                release.wait(5)
+            acquired.append('first')
+
+        def wait():
+            with single_flight.report_locks('123456', ['2018']):
+                acquired.append('second')
+
+        first = threading.Thread(target=hold)
+        first.start()
+        holding.wait(5)
+
+        second = threading.Thread(target=wait)
+        second.start()
+        second.join(0.2)
+        # Blocked on 2018 while the first thread holds it.
+        self.assertEqual(acquired, [])
+
+        # Other companies and years are not blocked.
+        with single_flight.report_locks('123456', ['2019']):
+            pass
+        with single_flight.report_locks('654321', ['2018']):
+            pass
+
+        release.set()
+        first.join(5)
+        second.join(5)
+        self.assertEqual(acquired, ['first', 'second'])
+        self.assertEqual(single_flight._locks, {})
+
+    def test_concurrent_ingestions_are_coalesced(self):
+        stored = set()
+
+        def missing_report_years(cik, years):
+            return [year for year in years if year not in stored]
+
+        def ingest_raw_reports(company, cik, years):
+            time.sleep(0.1)
+            stored.update(years)
+            return years
+
+        results = []
+        with mock.patch.object(utils, 'missing_report_years', side_effect=missing_report_years), \
+                mock.patch.object(utils, 'ingest_raw_reports', side_effect=ingest_raw_reports) as ingest:
+            threads = [
+                threading.Thread(target=lambda: results.append(
+                    utils.ingest_missing_raw_reports('Google', '123456', ['2017', '2018'])))
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+
+        ingest.assert_called_once_with('Google', '123456', ['2017', '2018'])
+        self.assertEqual(sorted(results), [[], [], [], ['2017', '2018']])
+
+    def test_advisory_lock_ids(self):
+        for cik in ['0001341439', '123456', '1652044']:
+            classid, objid = single_flight.advisory_lock_ids((cik, '2018'))
+            self.assertTrue(-2 ** 31 <= classid < 2 ** 31)
+            self.assertEqual(objid, 2018)
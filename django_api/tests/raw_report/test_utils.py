@@ -1,10 +1,17 @@
 from report_schema.raw_report.EdgarScraper import EdgarScraper
 from report_schema.raw_report.models import RawReport, Company
 from report_schema.raw_report import utils
+from report_schema import object_conversions
+from django.db.models import QuerySet
 from django.test import TestCase
+from django.conf import settings
+from io import BytesIO
+from unittest import mock
 import datetime
+import os
 import json
 import ast
+import pandas as pd
 
 
 class TestUtils(TestCase):
@@ -62,6 +69,20 @@ class TestUtils(TestCase):
             self.assertTrue(year in intended_years)
             self.assertIsInstance(report_dict, dict)
 
+    def test_create_raw_report_jsons_from_workbooks_in_parallel(self):
+        fixture = os.path.join(settings.BASE_DIR, 'downloaded_reports', '10-K-20.xlsx')
+        with open(fixture, 'rb') as file:
+            content = file.read()
+
+        file_paths = {'2020': BytesIO(content), '2019': BytesIO(content),
+                      '2015': BytesIO(content)}
+
+        serial = utils.create_raw_report_jsons_from_workbooks(file_paths, max_workers=1)
+        parallel = utils.create_raw_report_jsons_from_workbooks(file_paths, max_workers=2)
+
+        self.assertEqual(['2020', '2019'], list(parallel.keys()))
+        self.assertEqual(serial, parallel)
+
     def test_raw_reports_from_db(self):
         company_model = Company.objects.create(name='Google', cik='123456')
 
@@ -161,3 +182,113 @@ class TestUtils(TestCase):
             self.assertTrue(year in intended_response['reports'].keys())
             self.assertIsInstance(json_dict, str)
             self.assertTrue(ast.literal_eval(json_dict)['year'] == year)
+
+    def test_retrieve_raw_reports_response_ingests_only_missing_years(self):
+        company_model = Company.objects.create(name='Google', cik='123456')
+        RawReport.objects.create(
+            company=company_model,
+            report_date=datetime.date(2017, 1, 1),
+            excel_url='Google.com',
+            parsed_json={'year': '2017'}
+        )
+
+        def ingest_raw_reports(company, cik, years):
+            for year in years:
+                RawReport.objects.create(
+                    company=company_model,
+                    report_date=datetime.date(int(year), 1, 1),
+                    excel_url='Google.com',
+                    parsed_json={'year': year}
+                )
+            return years
+
+        inputted_request = {
+            'company': 'Google',
+            'cik': '123456',
+            'years': ['2017', '2018']
+        }
+
+        with mock.patch.object(utils, 'ingest_raw_reports',
+                               side_effect=ingest_raw_reports) as ingest:
+            returned_response = utils.retrieve_raw_reports_response(
+                inputted_request)
+            ingest.assert_called_once_with('Google', '123456', ['2018'])
+
+            # Nothing is scraped once every requested year is stored.
+            utils.retrieve_raw_reports_response(inputted_request)
+            ingest.assert_called_once()
+
+        self.assertEqual(sorted(returned_response['reports']),
+                         ['2017', '2018'])
+
+    def test_years_edgar_does_not_have_are_not_ingested_again(self):
+        def download_10k_reports(scraper, in_memory, years):
+            scraper._filings = []
+            scraper._excel_urls = {'10-K': {'2020': ['Google.com/2020']}}
+            # The 2020 workbook failed to download
+            return {}
+
+        inputted_request = {'company': 'Google', 'cik': '123456', 'years': ['2020', '2030']}
+
+        with mock.patch.object(EdgarScraper, 'download_10k_reports', autospec=True,
+                               side_effect=download_10k_reports) as download:
+            utils.retrieve_raw_reports(inputted_request)
+            download.assert_called_once_with(mock.ANY, in_memory=True, years=['2020', '2030'])
+
+            self.assertEqual(utils.unavailable_report_years('123456', ['2020', '2030']), ['2030'])
+            self.assertEqual(utils.years_to_ingest('123456', ['2020', '2030']), ['2020'])
+
+            RawReport.objects.create(company=Company.objects.get(cik='123456'),
+                                     report_date=datetime.date(2020, 1, 1), excel_url='Google.com/2020')
+            utils.retrieve_raw_reports(inputted_request)
+            download.assert_called_once()
+
+            with self.settings(UNAVAILABLE_REPORT_TTL=0):
+                self.assertEqual(utils.years_to_ingest('123456', ['2020', '2030']), ['2030'])
+
+    def test_ingestion_reuses_company_created_concurrently(self):
+        fixture = os.path.join(settings.BASE_DIR, 'downloaded_reports', '10-K-20.xlsx')
+
+        def download_10k_reports(scraper, in_memory, years):
+            scraper._filings = []
+            scraper._excel_urls = {'10-K': {'2020': ['Google.com/2020']}}
+            return {'2020': fixture}
+
+        real_get = QuerySet.get
+
+        # Another job creates the company right after this one looked it up
+        def get(queryset, *args, **kwargs):
+            if queryset.model is Company and not Company.objects.exists():
+                Company.objects.bulk_create([Company(name='Google', cik='123456')])
+                raise Company.DoesNotExist
+            return real_get(queryset, *args, **kwargs)
+
+        with mock.patch.object(EdgarScraper, 'download_10k_reports', autospec=True,
+                               side_effect=download_10k_reports), \
+                mock.patch.object(QuerySet, 'get', autospec=True, side_effect=get):
+            self.assertEqual(utils.ingest_raw_reports('Google', '123456', ['2020']), ['2020'])
+
+        google = Company.objects.get()
+        self.assertEqual([google], list(Company.objects.all()))
+        self.assertEqual(google, RawReport.objects.get().company)
+
+    def test_retrieve_raw_report_dataframes(self):
+        fixture = os.path.join(settings.BASE_DIR, 'downloaded_reports', '10-K-20.xlsx')
+        jsons = utils.create_raw_report_jsons_from_workbooks({'2020': fixture}, remove_files=False)
+        company_model = Company.objects.create(name='Google', cik='123456')
+        utils.create_raw_report_models(company_model, jsons, {'2020': 'Google.com/2020'})
+
+        # A report stored before parsed_frames existed is loaded from its parsed_json
+        RawReport.objects.create(company=company_model, report_date=datetime.date(2019, 1, 1),
+                                 excel_url='Google.com/2019', parsed_json=json.dumps(jsons['2020']))
+        RawReport.objects.filter(report_date__year=2019).update(parsed_frames=None)
+        self.assertIsNotNone(RawReport.objects.get(report_date__year=2020).parsed_frames)
+
+        dataframes_by_year = utils.retrieve_raw_report_dataframes(
+            {'company': 'Google', 'cik': '123456', 'years': ['2019', '2020']})
+
+        expected = object_conversions.json_dict_to_dataframes_dict(jsons['2020'])
+        for year in ['2019', '2020']:
+            self.assertEqual(list(expected), list(dataframes_by_year[year]))
+            for sheet_name, df in expected.items():
+                pd.testing.assert_frame_equal(df, dataframes_by_year[year][sheet_name])
@@ -0,0 +1,97 @@
+from report_schema.raw_report.workbook_cache import WorkbookCache
+from report_schema.raw_report.EdgarScraper import EdgarScraper
+from tests.mocks import MockedResponse
+from unittest import mock
+import tempfile
+import unittest
+import time
+import os
+
+
+class WorkbookCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = WorkbookCache(self.directory.name, max_bytes=10)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def put(self, accession_num, content):
+        return self.cache.put(accession_num, lambda file: file.write(content))
+
+    def test_put_and_get(self):
+        self.assertIsNone(self.cache.get('0001193125-20-171234'))
+
+        path = self.put('0001193125-20-171234', b'workbook')
+
+        self.assertEqual(self.cache.get('0001193125-20-171234'), path)
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), b'workbook')
+        # Only the renamed workbook is left behind
+        self.assertEqual(os.listdir(self.directory.name), ['0001193125-20-171234.xlsx'])
+
+    def test_failed_write_leaves_nothing(self):
+        def write(file):
+            file.write(b'half a work')
+            raise IOError('connection dropped')
+
+        with self.assertRaises(IOError):
+            self.cache.put('0001193125-20-171234', write)
+
+        self.assertIsNone(self.cache.get('0001193125-20-171234'))
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_evicts_least_recently_used(self):
+        self.put('a', b'1234')
+        time.sleep(0.01)
+        self.put('b', b'1234')
+        time.sleep(0.01)
+        self.cache.get('a')
+        time.sleep(0.01)
+        self.put('c', b'1234')
+
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+    def test_scraper_skips_download_when_cached(self):
+        self.put('0001564590-20-030125', b'cached workbook')
+
+        company = EdgarScraper('Oracle Corp', '0001341439', workbook_cache=self.cache)
+        company._excel_urls = {'10-K': {
+            '2020': ['https://www.sec.gov/Archives/edgar/data/1341439/000156459020030125/Financial_Report.xlsx']}}
+        company._accession_numbers = {'2020': '0001564590-20-030125'}
+
+        with mock.patch.object(EdgarScraper, 'get_company_excel_reports_from'), \
+                mock.patch.object(EdgarScraper, '_get') as get:
+            file_paths = company.download_10k_reports(in_memory=True)
+
+        get.assert_not_called()
+        self.assertEqual(file_paths['2020'].read(), b'cached workbook')
+
+    def test_read_survives_eviction(self):
+        path = self.put('0001193125-20-171234', b'workbook')
+
+        self.assertEqual(self.cache.read('0001193125-20-171234'), b'workbook')
+        with open(path, 'rb') as file:
+            os.remove(path)
+            self.assertIsNone(self.cache.read('0001193125-20-171234'))
+            # A workbook evicted while being read is still read in full
+            self.assertEqual(file.read(), b'workbook')
+
+    def test_scraper_downloads_evicted_workbook_again(self):
+        company = EdgarScraper('Oracle Corp', '0001341439', workbook_cache=self.cache)
+        company._excel_urls = {'10-K': {
+            '2020': ['https://www.sec.gov/Archives/edgar/data/1341439/000156459020030125/Financial_Report.xlsx']}}
+        company._accession_numbers = {'2020': '0001564590-20-030125'}
+
+        with mock.patch.object(EdgarScraper, 'get_company_excel_reports_from'), \
+                mock.patch.object(EdgarScraper, '_get', side_effect=lambda url, stream: MockedResponse(b'downloaded')):
+            buffers = company.download_10k_reports(in_memory=True)
+            os.remove(self.cache.path_for('0001564590-20-030125'))
+            buffers_again = company.download_10k_reports(in_memory=True)
+
+        self.assertEqual(buffers['2020'].read(), b'downloaded')
+        self.assertEqual(buffers_again['2020'].read(), b'downloaded')
+        self.assertEqual(self.cache.read('0001564590-20-030125'), b'downloaded')
@@ -0,0 +1,132 @@
+from report_schema.raw_report.report_cleaner.excelToPandasToJson import (
+    ConvertCleanSave
+)
+from report_schema.raw_report.report_cleaner.cleaner import (
+    ten_k_excel_cleaning,
+    ten_k_workbook_to_dataframes_dict,
+    ten_k_sheets_to_keep
+)
+from report_schema.raw_report.report_cleaner import readers
+from report_schema import object_conversions
+from openpyxl.styles import Font
+from os.path import dirname, realpath, join
+from io import BytesIO
+from unittest import mock
+import openpyxl as pyxl
+import datetime
+import unittest
+
+file_path = join(dirname(dirname(dirname(realpath(__file__)))), 'downloaded_reports', '10-K-20.xlsx')
+
+
+def cleaned_json(file: object, reader: str) -> dict:
+    cleaned, notes = ten_k_excel_cleaning(readers.read_workbook(file, reader))
+    return object_conversions.dataframes_dict_to_json_dict(ten_k_workbook_to_dataframes_dict(cleaned, notes))
+
+
+def build_workbook(build: callable) -> BytesIO:
+    workbook = pyxl.Workbook()
+    build(workbook)
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer
+
+
+def report_workbook(workbook: pyxl.Workbook) -> None:
+    cover = workbook.active
+    cover.title = 'Document and Entity Info'
+    cover.append(['Document and Entity Information - USD ($) $ in Millions', '12 Months Ended', None])
+    cover.append([None, 'May 31, 2020', 'Jun. 15, 2020'])
+    cover.append(['Entity Public Float', 123.5, None])
+    cover.append(['Amendment Flag', False, None])
+    cover.append(['Document Period End Date', datetime.datetime(2020, 5, 31), None])
+    cover.merge_cells('A1:A2')
+    cover.merge_cells('B1:C1')
+
+    workbook.create_sheet('Other sheet that is dropped').append(['Dropped - USD ($)', 1])
+
+    for title, first_header in [('CONSOLIDATED BALANCE SHEETS', None), ('Consolidated Balance Sheets (Parenthetical)',
+                                                                         '3 Months Ended')]:
+        sheet = workbook.create_sheet(title)
+        # Both sheets are renamed after their A1 cell. openpyxl compares the new title case insensitively with the
+        # existing ones, including the sheet's own, so the first one gets a number appended.
+        sheet.append(['Consolidated Balance Sheets - USD ($) shares in Millions, $ in Millions', first_header,
+                      'Dec. 31, 2019'])
+        sheet.append([None, 'Dec. 31, 2020', 'Dec. 31, 2019'])
+        sheet.append(['Assets', None, None])
+        sheet.append(['Cash (gain)', 1200, 1100.25])
+        sheet.append(['Other', 3, 4])
+        sheet.append(['Other', 5, 6])
+        sheet.append(['Shares (in shares)', 7, 8])
+        sheet['A3'].font = Font(bold=True)
+        sheet['A4'].font = Font(italic=True)
+        sheet['E9'] = None
+
+
+class WorkbookReaderParityTests(unittest.TestCase):
+    def test_fixture_sheets_match(self):
+        reference = readers.read_workbook(file_path, 'openpyxl')
+        workbook = readers.read_workbook(file_path, 'xml')
+
+        self.assertIsInstance(workbook, readers.Workbook)
+        self.assertEqual(reference.sheetnames, workbook.sheetnames)
+        for reference_sheet, sheet in zip(reference.worksheets, workbook.worksheets):
+            self.assertEqual(list(reference_sheet.values), list(sheet.values))
+            self.assertEqual([str(merged) for merged in reference_sheet.merged_cells.ranges],
+                             [str(merged) for merged in sheet.merged_cells.ranges])
+            self.assertEqual([bool(cell.font.b) for cell in next(reference_sheet.columns)],
+                             [bool(cell.font.b) for cell in next(sheet.columns)])
+
+    def test_fixture_parsed_json_matches(self):
+        reference = ConvertCleanSave(file_path, 'openpyxl')
+        converted = ConvertCleanSave(file_path, 'xml')
+
+        self.assertEqual(reference.notes, converted.notes)
+        self.assertEqual(reference.cleaned_excel_report.sheetnames, converted.cleaned_excel_report.sheetnames)
+        self.assertEqual(reference.convert_to_json(), converted.convert_to_json())
+
+    def test_built_workbook_parsed_json_matches(self):
+        buffer = build_workbook(report_workbook)
+
+        reference = cleaned_json(buffer, 'openpyxl')
+        self.assertEqual(reference, cleaned_json(buffer, 'xml'))
+        self.assertEqual(['Document and Entity Information', 'Consolidated Balance Sheets1',
+                          'Consolidated Balance Sheets'], list(reference.keys()))
+
+    def test_bold_empty_label_fails_on_both(self):
+        def bold_empty_label(workbook):
+            report_workbook(workbook)
+            workbook['CONSOLIDATED BALANCE SHEETS']['A5'].font = Font(bold=True)
+            workbook['CONSOLIDATED BALANCE SHEETS']['A5'].value = None
+
+        buffer = build_workbook(bold_empty_label)
+
+        # openpyxl fonts are immutable, so the cleaner cannot unbold the cell
+        for reader in readers.READERS:
+            with self.assertRaises(AttributeError):
+                cleaned_json(buffer, reader)
+
+    def test_formulas_are_read_by_openpyxl(self):
+        def formula(workbook):
+            report_workbook(workbook)
+            workbook['CONSOLIDATED BALANCE SHEETS']['B5'] = '=B4+1'
+
+        buffer = build_workbook(formula)
+
+        self.assertIsInstance(readers.read_workbook(buffer, 'xml'), pyxl.Workbook)
+
+    def test_unused_sheets_are_not_parsed(self):
+        with mock.patch.object(readers, 'read_worksheet', wraps=readers.read_worksheet) as read_worksheet:
+            workbook = readers.read_workbook(file_path, 'xml', select=ten_k_sheets_to_keep)
+
+        all_sheets = readers.read_workbook(file_path, 'xml').sheetnames
+        self.assertEqual(97, len(all_sheets))
+        self.assertEqual(ten_k_sheets_to_keep(all_sheets), workbook.sheetnames)
+        self.assertEqual(len(workbook.sheetnames), read_worksheet.call_count)
+        self.assertEqual(cleaned_json(file_path, 'openpyxl'), object_conversions.dataframes_dict_to_json_dict(
+            ten_k_workbook_to_dataframes_dict(*ten_k_excel_cleaning(workbook))))
+
+    def test_ten_k_sheets_to_keep(self):
+        self.assertEqual(['Cover', 'CONSOLIDATED BALANCE SHEETS', 'Consolidated Statements of Income'],
+                         ten_k_sheets_to_keep(['Cover', 'CONSOLIDATED BALANCE SHEETS', 'Notes', 'Details',
+                                               'Consolidated Statements of Income']))
@@ -0,0 +1,73 @@
+from report_schema.raw_report.report_cleaner.excelToPandasToJson import (
+    ConvertCleanSave
+)
+from report_schema import frame_storage, object_conversions
+from os.path import dirname, realpath, join
+import pandas as pd
+import numpy as np
+import unittest
+import json
+
+file_path = join(dirname(dirname(dirname(realpath(__file__)))), 'downloaded_reports', '10-K-20.xlsx')
+
+
+class FrameStorageTests(unittest.TestCase):
+    def assertDataframesDictEqual(self, expected: dict, loaded: dict):
+        self.assertEqual(list(expected), list(loaded))
+        for sheet_name in expected:
+            pd.testing.assert_frame_equal(expected[sheet_name], loaded[sheet_name], check_exact=True,
+                                          check_index_type=True, check_column_type=True)
+
+    def test_loads_the_dataframes_of_the_json(self):
+        parsed_json = json.dumps(ConvertCleanSave(file_path).convert_to_json())
+        expected = object_conversions.json_dict_to_dataframes_dict(parsed_json)
+
+        blob = frame_storage.dumps(expected)
+
+        self.assertDataframesDictEqual(expected, frame_storage.loads(blob))
+        self.assertDataframesDictEqual(expected, frame_storage.loads(memoryview(blob)))
+
+    def test_mixed_and_empty_sheets(self):
+        expected = {
+            'Mixed': pd.DataFrame({'Dec. 31, 2020': [1.5, np.nan, 3], 'Dec. 31, 2019': ['10-K', None, 2.5],
+                                   2018: [1, 2, 3], 'Filed': pd.to_datetime(['2020-01-01', None, '2019-05-31'])},
+                                  index=pd.Index(['Revenues', 'Net income', None], name='label')),
+            'Dates': pd.DataFrame([[1, 2]], index=['Shares'],
+                                  columns=pd.DatetimeIndex(['2020-12-31', '2019-12-31'])),
+            'Empty': pd.DataFrame(index=['Revenues', 'Net income']),
+        }
+
+        self.assertDataframesDictEqual(expected, frame_storage.loads(frame_storage.dumps(expected)))
+
+    def test_numeric_sheets_are_views_of_the_blob(self):
+        df = pd.DataFrame({'2020': [1.0, 2.0], '2019': [3.0, 4.0]}, index=['Revenues', 'Net income'])
+        blob = frame_storage.dumps({'Income': df})
+
+        loaded = frame_storage.loads(blob)['Income']
+
+        self.assertTrue(np.shares_memory(loaded.to_numpy(), np.frombuffer(blob, dtype=np.uint8)))
+        pd.testing.assert_frame_equal(df, loaded)
+
+    def test_stored_frames_read_row_labels_without_loading_sheets(self):
+        expected = {
+            'Income': pd.DataFrame({'2020': [1.0, 2.0]}, index=['Revenues', 'Net income']),
+            'Cover': pd.DataFrame({'2020': ['10-K']}, index=['Document Type']),
+        }
+        frames = frame_storage.StoredFrames(frame_storage.dumps(expected))
+
+        self.assertEqual(['Income', 'Cover'], list(frames))
+        pd.testing.assert_index_equal(expected['Income'].index, frames.index('Income'))
+        self.assertEqual({}, frames._dataframes)
+
+        self.assertDataframesDictEqual(expected, frames)
+        self.assertIs(frames['Income'], frames['Income'])
+
+    def test_unsupported_values_raise(self):
+        df = pd.DataFrame({'2020': [{'nested': 1}]}, index=['Revenues'])
+
+        with self.assertRaises(frame_storage.UnsupportedFrameError):
+            frame_storage.dumps({'Income': df})
+
+    def test_rejects_other_blobs(self):
+        with self.assertRaises(ValueError):
+            frame_storage.loads(b'{"Income": {}}')
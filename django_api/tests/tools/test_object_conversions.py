@@ -0,0 +1,167 @@
+from report_schema import object_conversions
+import pandas as pd
+import unittest
+import random
+import json
+
+
+class DeduplicateLabelsTests(unittest.TestCase):
+    def test_deduplicate_labels(self):
+        labels = pd.Index(['Total', 'Other', 'Total', 'Total', 'Other'], name='index')
+
+        deduplicated = object_conversions.deduplicate_labels(labels)
+
+        self.assertEqual(
+            ['Total', 'Other', 'Total dp_1', 'Total dp_1 dp_2', 'Other dp_1'], deduplicated.tolist())
+        self.assertEqual('index', deduplicated.name)
+
+    def test_unique_labels_are_returned_as_is(self):
+        labels = pd.Index(['Total', 'Other'])
+        self.assertIs(labels, object_conversions.deduplicate_labels(labels))
+
+    def test_matches_renaming_by_rounds(self):
+        rng = random.Random(13)
+        words = ['Total', 'Other', 'Net', 'Total dp_1', 'Other dp_1 dp_2', 'Net dp_2']
+
+        for _ in range(200):
+            # Labels that already end with a dp suffix take the slow path.
+            pool = words if rng.random() < 0.5 else words[:3]
+            labels = pd.Index([rng.choice(pool) for _ in range(rng.randint(1, 40))], dtype=object)
+            expected = object_conversions._deduplicate_labels_by_rounds(labels)
+            deduplicated = object_conversions.deduplicate_labels(labels)
+
+            self.assertTrue(expected.equals(deduplicated), labels.tolist())
+            self.assertFalse(deduplicated.has_duplicates)
+
+    def test_dataframe_to_dict_deduplicates_columns(self):
+        df = pd.DataFrame([[1, 2, 3]], columns=['2019', '2019', '2020'])
+
+        self.assertEqual(
+            ['2019', '2019 dp_1', '2020'], list(object_conversions.dataframe_to_dict(df).keys()))
+
+
+class DictToDataframeTests(unittest.TestCase):
+    labels = ['Revenues', 'Net income (in dollars per share)', 'Nov. 28, 2020', 'Nov. 28, 2020 - 12 Months Ended',
+              '2020-12-31', '2019', '1.5', '-3', '1609459200', '1609459200000', 'nan', 'NaT', '', 'inf',
+              'date', 'modified', 'created_at', 'Timestamp of filing']
+    values = [None, 0, 1, -25, 2019, 1609459200000, 0.5, -0.47, 1e-12, 123456.789, float('nan'), True,
+              'Dec. 31, 2020', '2020-12-31', '10-K', '12.5', '']
+
+    def random_dict(self, rng: random.Random) -> dict:
+        index = rng.sample(self.labels, rng.randint(0, 6))
+        json_dict = {}
+        for column in rng.sample(self.labels, rng.randint(0, 5)):
+            # Columns mostly hold values of one kind, like the sheets of a report do
+            pool = rng.choice([self.values[:10], self.values[10:], self.values])
+            rows = rng.sample(index, rng.randint(0, len(index))) if rng.random() < 0.2 else index
+            json_dict[column] = {row: rng.choice(pool) for row in rows}
+
+        return json_dict
+
+    def assertReadsLikeJson(self, json_dict: dict):
+        expected = pd.read_json(json.dumps(json_dict, ensure_ascii=False))
+        # pd.read_json parses floats with up to one ulp of error, the dictionary's floats are kept as they are
+        pd.testing.assert_frame_equal(expected, object_conversions.dict_to_dataframe(json_dict),
+                                      check_exact=False, rtol=1e-15, atol=0,
+                                      check_index_type=True, check_column_type=True, obj=repr(json_dict))
+
+    def test_matches_read_json(self):
+        rng = random.Random(7)
+        for _ in range(500):
+            self.assertReadsLikeJson(self.random_dict(rng))
+
+    def test_report_sheets(self):
+        self.assertReadsLikeJson({
+            'Nov. 28, 2020 - 12 Months Ended': {'Document Type': '10-K', 'Entity Public Float': 2500000000.0,
+                                                'Amendment Flag': False},
+            'Jan. 15, 2021': {'Entity Common Stock, Shares Outstanding': 9934000, 'Document Type': None},
+        })
+        self.assertReadsLikeJson({'Nov. 28, 2020': {'Cash': 1.5, 'Inventories': None},
+                                  'Nov. 30, 2019': {'Cash': 2, 'Inventories': 3}})
+        self.assertReadsLikeJson({'2019': {'Cash': 1}, 2020: {'Cash': 2, 3: 4}})
+        self.assertReadsLikeJson({})
+
+    def test_raises_like_read_json(self):
+        for json_dict in ['line1', {'2019': 'line1'}]:
+            with self.assertRaises(ValueError):
+                pd.read_json(json.dumps(json_dict))
+            with self.assertRaises(ValueError):
+                object_conversions.dict_to_dataframe(json_dict)
+
+
+class DataframeToDictTests(unittest.TestCase):
+    labels = ['Revenues', 'Nov. 28, 2020', '2020-12-31', '2019', '1.5', '', 'nan', 'date', 'created_at']
+    floats = [0.0, -0.0, float('nan'), float('inf'), 0.5, 1.5e-10, 2.5e-10, 0.99999999995, 1e-15, 1e-16, 1e16,
+              1e17, -0.47, 0.1 + 0.2, 123456789.123456789, 2500000000.0, -6.5e-13]
+    objects = [None, 'x', '10-K', 1, 2.5, -0.47, True, float('nan'), pd.NaT, pd.Timestamp('2020-12-31')]
+
+    def random_float(self, rng: random.Random) -> float:
+        kind = rng.random()
+        if kind < 0.2:
+            return rng.choice(self.floats)
+        if kind < 0.5:
+            return round(rng.uniform(-1e4, 1e4), rng.randint(0, 4))
+        if kind < 0.8:
+            return rng.uniform(-1, 1) * 10 ** rng.randint(-14, 17)
+        return float(rng.randint(-10 ** 12, 10 ** 12))
+
+    def random_dataframe(self, rng: random.Random) -> pd.DataFrame:
+        size = rng.randint(1, 8)
+        kind = rng.random()
+        if kind < 0.6:
+            index = rng.sample(self.labels, min(size, len(self.labels)))
+        elif kind < 0.75:
+            index = list(range(size))
+        elif kind < 0.85:
+            index = pd.to_datetime([f'{2010 + year}-12-31' for year in range(size)])
+        else:
+            index = [1.5, 2.0, None, 3][:size]
+        size = len(index)
+
+        columns = {}
+        for column in rng.sample(self.labels, rng.randint(1, 5)):
+            kind = rng.random()
+            if kind < 0.5:
+                columns[column] = [self.random_float(rng) for _ in range(size)]
+            elif kind < 0.6:
+                columns[column] = [rng.randint(-10 ** 6, 10 ** 13) for _ in range(size)]
+            elif kind < 0.65:
+                columns[column] = [rng.random() < 0.5 for _ in range(size)]
+            elif kind < 0.75:
+                columns[column] = pd.to_datetime([rng.randint(-10 ** 17, 10 ** 18) for _ in range(size)])
+            else:
+                columns[column] = pd.Series([rng.choice(self.objects) for _ in range(size)], dtype=object)
+
+        return pd.DataFrame(columns, index=index)
+
+    def test_matches_to_json(self):
+        rng = random.Random(11)
+        for _ in range(500):
+            df = self.random_dataframe(rng)
+            expected = json.loads(df.to_json(force_ascii=False))
+
+            # Compared as JSON, so the order of the keys and the sign of zeros count too
+            self.assertEqual(json.dumps(expected), json.dumps(object_conversions.dataframe_to_dict(df)), repr(df))
+
+    def test_json_dataframe_matches_read_json(self):
+        rng = random.Random(17)
+        for _ in range(300):
+            df = self.random_dataframe(rng)
+            expected = pd.read_json(df.to_json(force_ascii=False))
+
+            # pd.read_json parses floats with up to one ulp of error
+            pd.testing.assert_frame_equal(expected, object_conversions.dataframe_to_json_dataframe(df),
+                                          check_exact=False, rtol=1e-15, atol=0, obj=repr(df))
+
+    def test_raises_on_duplicate_labels_like_to_json(self):
+        df = pd.DataFrame({'2019': [1, 2]}, index=['Total', 'Total'])
+
+        with self.assertRaises(ValueError):
+            df.to_json()
+        with self.assertRaises(ValueError):
+            object_conversions.dataframe_to_dict(df)
+
+    def test_unsupported_values_are_written_by_to_json(self):
+        df = pd.DataFrame({'2019': pd.to_datetime(['2020-12-31']).tz_localize('UTC'), '2020': [{'a': 1}]})
+
+        self.assertEqual(json.loads(df.to_json(force_ascii=False)), object_conversions.dataframe_to_dict(df))